@@ -7,6 +7,7 @@ from tortoise import Tortoise
 from app.api import api_router
 from fastapi.openapi.utils import get_openapi
 from app.core.init_app import register_scheduled_jobs, start_scheduler, shutdown_scheduler
+from app.core.execution_queue import execution_queue
 
 from app.core.init_app import (
     init_data,
@@ -27,7 +28,11 @@ async def lifespan(app: FastAPI):
     register_scheduled_jobs()
     # 启动定时任务调度器
     await start_scheduler()
+    # 恢复中断的测试单，启动测试单执行队列
+    await execution_queue.start()
     yield
+    # 停止执行队列，执行中的测试单下次启动时继续执行
+    await execution_queue.stop()
     # 关闭定时任务
     await shutdown_scheduler()
     await Tortoise.close_connections()
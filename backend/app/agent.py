@@ -0,0 +1,297 @@
+"""
+分布式执行代理
+向后端注册后循环领取用例（分布式执行队列，见 app/core/agent_queue.py），在本机执行并回传执行日志、截图和录制的 HAR；
+执行期间定时心跳续租。代理退出或失联后，其正在执行的用例在租约到期后由其他代理重新领取
+
+每个代理使用自己的工作目录（<work-dir>/<name>），同一台机器上可以启动多个代理（在 backend 目录下）：
+    AGENT_TOKEN=xxx python -m app.agent --server http://127.0.0.1:9998 --name agent-1 --capacity 2
+    AGENT_TOKEN=xxx python -m app.agent --server http://127.0.0.1:9998 --name agent-2 --capacity 2
+
+后端需要配置相同的 AGENT_TOKEN 环境变量；代理需要安装 Playwright 和浏览器，不需要访问数据库
+"""
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import signal
+import socket
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+from app.core import case_log
+from app.core.case_executor import CaseExecutor
+from app.core.execution_control import ExecutionControl
+from app.log import logger
+
+
+PLAN_RUNNER = Path(__file__).parent / 'core' / 'plan_runner.py'
+
+# 没有领到用例时再次领取的间隔（秒）
+LEASE_POLL_INTERVAL = 2
+
+# 回传结果失败时的重试次数
+COMPLETE_RETRIES = 3
+
+# 回传的错误信息最大长度（脚本失败时错误信息可能包含完整的 stderr）
+ERROR_MESSAGE_LIMIT = 4000
+
+
+class AgentAPIError(Exception):
+    """代理接口返回的业务错误"""
+
+    def __init__(self, code: int, msg: str):
+        super().__init__(f"[{code}] {msg}")
+        self.code = code
+
+
+class ExecutionAgent:
+    """执行代理"""
+
+    def __init__(self, server: str, name: str, capacity: int, work_root: Path, token: Optional[str] = None):
+        self.name = name
+        self.capacity = capacity
+        self.work_root = work_root
+        self.client = httpx.AsyncClient(
+            base_url=server.rstrip('/') + '/api/ui-test/agents',
+            headers={'X-Agent-Token': token} if token else {},
+            timeout=60
+        )
+        self.executor = CaseExecutor()
+        self.agent_id: Optional[int] = None
+        self.heartbeat_interval = 10
+        # 正在执行的用例：租约ID -> 执行控制句柄（用于结束被撤回用例的进程）
+        self.running: Dict[int, ExecutionControl] = {}
+        self._jobs = set()
+        self._slot_freed = asyncio.Event()
+
+    async def _call(self, path: str, payload: Dict):
+        response = await self.client.post(path, json=payload)
+        response.raise_for_status()
+        body = response.json()
+        if body.get('code') != 200:
+            raise AgentAPIError(body.get('code'), body.get('msg'))
+        return body.get('data')
+
+    async def register(self):
+        data = await self._call('/register', {
+            'name': self.name,
+            'hostname': socket.gethostname(),
+            'capacity': self.capacity
+        })
+        self.agent_id = data['agent_id']
+        self.heartbeat_interval = data['heartbeat_interval']
+        logger.info(f"执行代理已注册: {self.name}, agent_id={self.agent_id}, 并发数: {self.capacity}")
+
+    async def register_until_ready(self):
+        """注册直到成功（后端未启动或重启中时按间隔重试）"""
+        while True:
+            try:
+                await self.register()
+                return
+            except (AgentAPIError, httpx.HTTPError) as e:
+                logger.warn(f"注册执行代理失败，{LEASE_POLL_INTERVAL} 秒后重试: {e}")
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+
+    async def run(self):
+        """注册并持续领取、执行用例，直到进程被结束"""
+        if os.name == 'posix':
+            # SIGTERM 时走正常退出流程，结束正在执行的用例进程
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        await self.register_until_ready()
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        try:
+            while True:
+                self._slot_freed.clear()
+                free = self.capacity - len(self.running)
+                jobs = []
+                if free > 0:
+                    try:
+                        jobs = await self._call(f'/{self.agent_id}/lease', {'max_cases': free})
+                    except AgentAPIError as e:
+                        logger.warn(f"领取用例失败: {e}")
+                        if e.code == 404:
+                            await self.register_until_ready()
+                    except httpx.HTTPError as e:
+                        logger.warn(f"领取用例失败，后端不可用: {e}")
+                for job in jobs:
+                    # 领取后立即登记，保证下一次心跳就能续租
+                    self.running[job['lease_id']] = ExecutionControl(job['task_id'])
+                    task = asyncio.create_task(self._execute(job))
+                    self._jobs.add(task)
+                    task.add_done_callback(self._jobs.discard)
+                if jobs and len(self.running) < self.capacity:
+                    continue
+                # 有用例执行完成时立即领取下一个，否则按间隔轮询
+                try:
+                    await asyncio.wait_for(self._slot_freed.wait(), timeout=LEASE_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            heartbeat.cancel()
+            # 结束正在执行的用例，租约到期后由其他代理重新领取
+            await asyncio.gather(*[control.cancel() for control in self.running.values()])
+            await self.client.aclose()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                data = await self._call(f'/{self.agent_id}/heartbeat', {'lease_ids': list(self.running)})
+            except AgentAPIError as e:
+                logger.warn(f"心跳失败: {e}")
+                if e.code == 404:
+                    await self.register_until_ready()
+                continue
+            except httpx.HTTPError as e:
+                logger.warn(f"心跳失败，后端不可用: {e}")
+                continue
+            for lease_id in data['revoked']:
+                control = self.running.get(lease_id)
+                if control and not control.cancelled:
+                    logger.info(f"用例已被撤回（测试单已取消或租约已重新分配），停止执行: lease_id={lease_id}")
+                    await control.cancel()
+
+    async def _execute(self, job: Dict):
+        """执行一个领取到的用例并回传结果"""
+        lease_id = job['lease_id']
+        control = self.running[lease_id]
+        try:
+            work_dir = self.work_root / job['work_dir_name']
+            self._write_files(work_dir, job['files'])
+            har_path = self._prepare_har(work_dir, job)
+            target = (work_dir / job['path']).resolve()
+            log_path = work_dir / 'logs' / f"{target.stem}{case_log.LOG_SUFFIX}"
+            # 清理上一次执行留下的日志，避免脚本启动前失败时回传旧日志
+            log_path.unlink(missing_ok=True)
+
+            logger.info(f"开始执行用例: case_id={job['case_id']}, attempt={job['attempt']}, lease_id={lease_id}")
+            if job['kind'] == 'plan':
+                result = await self.executor.execute_case_script_async(
+                    str(PLAN_RUNNER), str(work_dir), job['timeout'], job['attempt'], control, args=[str(target)]
+                )
+            else:
+                result = await self.executor.execute_case_script_async(
+                    str(target), str(work_dir), job['timeout'], job['attempt'], control
+                )
+            if control.cancelled:
+                return
+
+            log = log_path.read_text(encoding='utf-8') if log_path.exists() else None
+            await self._complete(job, result, log, self._read_screenshots(work_dir, log_path),
+                                 self._read_har(har_path, log_path))
+        except Exception as e:
+            logger.error(f"执行用例失败: lease_id={lease_id}, {e}")
+        finally:
+            self.running.pop(lease_id, None)
+            self._slot_freed.set()
+
+    def _write_files(self, work_dir: Path, files: Dict[str, str]):
+        """写入执行所需的文件；本地已有的登录态可能已被用例刷新，不再覆盖"""
+        root = work_dir.resolve()
+        for relative_path, content in files.items():
+            target = (work_dir / relative_path).resolve()
+            if root not in target.parents:
+                raise ValueError(f"文件路径超出工作目录: {relative_path}")
+            if relative_path.startswith('auth/') and target.exists():
+                continue
+            self._write_text(target, content)
+
+    @staticmethod
+    def _write_text(target: Path, content: str):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(content, encoding='utf-8')
+        os.replace(tmp_path, target)
+
+    def _prepare_har(self, work_dir: Path, job: Dict) -> Optional[Path]:
+        """
+        写入后端下发的用例 HAR（network_mode=replay），没有下发时删除本地旧的 HAR，由用例重新录制
+
+        HAR 目录与后端一样位于工作目录之外（<work-dir>/<name>/.har/<环境>），只允许写入代理自己的目录
+
+        Returns:
+            用例的 HAR 路径，未启用 HAR 时返回 None
+        """
+        if not job.get('har_path'):
+            return None
+        target = (work_dir / job['har_path']).resolve()
+        if self.work_root.resolve() not in target.parents:
+            raise ValueError(f"HAR 路径超出代理工作目录: {job['har_path']}")
+        if job.get('har') is not None:
+            self._write_text(target, job['har'])
+        else:
+            target.unlink(missing_ok=True)
+        return target
+
+    @staticmethod
+    def _read_har(har_path: Optional[Path], log_path: Path) -> Optional[str]:
+        """本次录制并保存的 HAR（用例通过时），回传后端供之后的回放使用"""
+        if not har_path or not har_path.is_file():
+            return None
+        log_data = case_log.load_case_log(log_path) or {}
+        if not ((log_data.get('execution_info') or {}).get('har') or {}).get('recorded'):
+            return None
+        return har_path.read_text(encoding='utf-8')
+
+    @staticmethod
+    def _read_screenshots(work_dir: Path, log_path: Path) -> Dict[str, str]:
+        log_data = case_log.load_case_log(log_path) or {}
+        screenshots = {}
+        # 失败 trace 与截图一起回传
+        trace_path = (log_data.get('execution_info') or {}).get('trace_path')
+        for relative_path in log_data.get('screenshots', []) + ([trace_path] if trace_path else []):
+            screenshot_path = work_dir / relative_path
+            if screenshot_path.is_file():
+                screenshots[relative_path] = base64.b64encode(screenshot_path.read_bytes()).decode('ascii')
+        return screenshots
+
+    async def _complete(self, job: Dict, result: Dict, log: Optional[str], screenshots: Dict[str, str],
+                        har: Optional[str] = None):
+        payload = {
+            'lease_token': job['lease_token'],
+            'status': result.get('status', 'failed'),
+            'error': (result.get('error') or '')[-ERROR_MESSAGE_LIMIT:] or None,
+            'log': log,
+            'screenshots': screenshots,
+            'har': har
+        }
+        for retry in range(COMPLETE_RETRIES):
+            try:
+                await self._call(f"/leases/{job['lease_id']}/complete", payload)
+                logger.info(f"用例执行结果已回传: case_id={job['case_id']}, 结果: {payload['status']}")
+                return
+            except AgentAPIError as e:
+                # 租约已失效（过期被重新分配或测试单已取消），结果不再需要
+                logger.warn(f"执行结果未被接收: case_id={job['case_id']}, {e}")
+                return
+            except httpx.HTTPError as e:
+                logger.warn(f"回传执行结果失败（第 {retry + 1} 次）: case_id={job['case_id']}, {e}")
+                await asyncio.sleep(2 ** retry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UI 测试分布式执行代理')
+    parser.add_argument('--server', default=os.getenv('AGENT_SERVER', 'http://127.0.0.1:9998'), help='后端地址')
+    parser.add_argument('--name', default=f"{socket.gethostname()}-{os.getpid()}", help='代理名称（唯一）')
+    parser.add_argument('--capacity', type=int, default=1, help='同时执行的用例数')
+    parser.add_argument('--work-dir', default='agent_executions', help='工作目录根路径')
+    parser.add_argument('--token', default=os.getenv('AGENT_TOKEN'), help='代理令牌（默认读取 AGENT_TOKEN 环境变量）')
+    args = parser.parse_args()
+
+    # 屏蔽 HTTP 客户端的逐条请求日志（心跳、领取轮询）
+    for name in ('httpx', 'httpcore'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    agent = ExecutionAgent(args.server, args.name, max(1, args.capacity),
+                           Path(args.work_dir) / args.name, args.token)
+    try:
+        asyncio.run(agent.run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logger.info(f"执行代理已退出: {args.name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ from .ui_test_case import router as ui_test_case_router
 from .ui_test_suite import router as ui_test_suite_router
 from .ui_test_task import router as ui_test_task_router
 from .ui_test_report import router as ui_test_report_router
+from .ui_test_agent import router as ui_test_agent_router
 from .menu_permission import router as menu_permission_router
 
 api_router = APIRouter()
@@ -22,6 +23,7 @@ api_router.include_router(ui_test_case_router, prefix="/ui-test/test-cases", tag
 api_router.include_router(ui_test_suite_router, prefix="/ui-test/test-suites", tags=["UI测试-测试套件"])
 api_router.include_router(ui_test_task_router, prefix="/ui-test/test-tasks", tags=["UI测试-测试单"])
 api_router.include_router(ui_test_report_router, prefix="/ui-test/test-reports", tags=["UI测试-测试报告"])
+api_router.include_router(ui_test_agent_router, prefix="/ui-test/agents", tags=["UI测试-执行代理"])
 api_router.include_router(menu_permission_router, prefix="/menu-permissions", tags=["菜单权限管理"])
 
 __all__ = ["api_router"]
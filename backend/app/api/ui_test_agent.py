@@ -0,0 +1,95 @@
+"""
+UI测试执行代理API
+执行代理（python -m app.agent）通过这些接口注册、心跳续租、领取用例和回传执行结果
+"""
+from fastapi import APIRouter
+from app.schemas.response import ResponseSchema
+from app.schemas.ui_test import (
+    AgentRegisterSchema,
+    AgentHeartbeatSchema,
+    AgentLeaseSchema,
+    AgentCompleteSchema
+)
+from app.models.ui_test import TestUIAgent
+from app.core.agent_queue import AgentBroker, HEARTBEAT_INTERVAL, LEASE_TIMEOUT
+
+router = APIRouter()
+broker = AgentBroker()
+
+
+@router.get("", summary="获取执行代理列表")
+async def get_agents():
+    """获取执行代理列表及在线状态"""
+    try:
+        return ResponseSchema.success(data=await broker.list_agents())
+    except Exception as e:
+        return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
+
+
+@router.post("/register", summary="注册执行代理")
+async def register_agent(data: AgentRegisterSchema):
+    """
+    注册执行代理
+
+    返回:
+    - agent_id: 代理ID
+    - heartbeat_interval: 心跳间隔（秒）
+    - lease_timeout: 租约时长（秒），超过该时长未心跳的用例会被重新分配
+    """
+    try:
+        agent = await broker.register(data.name, data.hostname, data.capacity)
+        return ResponseSchema.success(data={
+            "agent_id": agent.id,
+            "heartbeat_interval": HEARTBEAT_INTERVAL,
+            "lease_timeout": LEASE_TIMEOUT
+        })
+    except Exception as e:
+        return ResponseSchema.error(msg=f"注册执行代理失败: {str(e)}", code=500)
+
+
+@router.post("/{agent_id}/heartbeat", summary="执行代理心跳")
+async def agent_heartbeat(agent_id: int, data: AgentHeartbeatSchema):
+    """
+    执行代理心跳，续租正在执行的用例
+
+    返回:
+    - revoked: 需要停止执行的租约ID（测试单已取消或租约已被重新分配）
+    """
+    try:
+        if not await TestUIAgent.exists(id=agent_id):
+            return ResponseSchema.error(msg="执行代理不存在，请重新注册", code=404)
+        revoked = await broker.heartbeat(agent_id, data.lease_ids)
+        return ResponseSchema.success(data={"revoked": revoked})
+    except Exception as e:
+        return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
+
+
+@router.post("/{agent_id}/lease", summary="领取用例")
+async def lease_cases(agent_id: int, data: AgentLeaseSchema):
+    """领取最多 max_cases 个待执行的用例，返回执行所需的文件内容"""
+    try:
+        if not await TestUIAgent.exists(id=agent_id):
+            return ResponseSchema.error(msg="执行代理不存在，请重新注册", code=404)
+        jobs = await broker.lease(agent_id, data.max_cases)
+        return ResponseSchema.success(data=jobs)
+    except Exception as e:
+        return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
+
+
+@router.post("/leases/{lease_id}/complete", summary="回传执行结果")
+async def complete_lease(lease_id: int, data: AgentCompleteSchema):
+    """回传用例执行结果、执行日志、截图和录制的 HAR"""
+    try:
+        accepted = await broker.complete(
+            lease_id,
+            data.lease_token,
+            {"status": data.status, "error": data.error},
+            data.log,
+            data.screenshots,
+            data.har
+        )
+        if not accepted:
+            return ResponseSchema.error(msg="租约已失效（已过期被重新分配或测试单已取消），结果已丢弃", code=409)
+        return ResponseSchema.success(msg="执行结果已接收")
+    except Exception as e:
+        return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
@@ -1,7 +1,7 @@
 """
 UI测试用例管理API
 """
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, Query, Request, Response
 from typing import List, Optional
 from datetime import datetime
 from app.schemas.response import ResponseSchema
@@ -22,6 +22,8 @@ from app.models.ui_test import (
     CaseStatus,
     CasePriority
 )
+from app.core.config_generator import ConfigGenerator
+from app.core.script_generator import ScriptGenerator
 from tortoise.expressions import Q
 
 router = APIRouter()
@@ -493,6 +495,33 @@ async def update_case_status(case_id: int, status: CaseStatus):
         return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
 
 
+@router.get("/{case_id}/script", summary="导出用例脚本")
+async def export_case_script(case_id: int, environment: str = Query("测试环境", description="测试环境")):
+    """
+    导出用例的独立 Playwright 脚本，用于本地调试
+    
+    下载 zip 包，包含用例脚本、运行时模块 case_runtime.py 和该环境的 config.json（含测试用户），
+    解压后在包目录下执行 python scripts/<脚本文件名>.py
+    """
+    try:
+        case = await TestUICase.get_or_none(id=case_id)
+        
+        if not case:
+            return ResponseSchema.error(msg="测试用例不存在", code=404)
+        
+        config = await ConfigGenerator().build_debug_config([case_id], environment)
+        bundle = await ScriptGenerator().export_script(case_id, config)
+        
+        return Response(
+            content=bundle['content'],
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{bundle["filename"]}"'}
+        )
+        
+    except Exception as e:
+        return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
+
+
 # ========== 测试步骤管理 ==========
 
 @router.get("/{case_id}/steps", summary="获取测试步骤列表")
@@ -757,7 +786,8 @@ async def get_case_executions(
                 "end_time": record.end_time,
                 "duration": record.duration,
                 "error_message": record.error_message,
-                "screenshot_path": record.screenshot_path
+                "screenshot_path": record.screenshot_path,
+                "trace_path": record.trace_path
             }
             for record in records
         ]
@@ -93,9 +93,10 @@ async def get_test_report(report_id: int):
         # 查询用例执行记录
         case_records = await TestUICaseExecutionRecord.filter(
             test_report_id=report_id
-        ).all()
+        ).order_by('id').all()
         
-        case_list = []
+        # 同一用例的多次执行（失败重试）合并展示：以最后一次执行为准，之前的执行放在 retries 中
+        case_map = {}
         for record in case_records:
             # 查询步骤执行记录
             step_records = await TestUICaseStepExecutionRecord.filter(
@@ -120,7 +121,7 @@ async def get_test_report(report_id: int):
                     "screenshot_path": step.screenshot_path
                 })
             
-            case_list.append({
+            case_item = {
                 "test_case_id": record.test_case_id,
                 "status": record.status,
                 "start_time": format_datetime(record.start_time),
@@ -128,8 +129,18 @@ async def get_test_report(report_id: int):
                 "duration": record.duration,
                 "error_message": record.error_message,
                 "screenshot_path": record.screenshot_path,
+                "trace_path": record.trace_path,
+                "attempt": record.attempt,
                 "steps": steps
-            })
+            }
+            case_map.setdefault(record.test_case_id, []).append(case_item)
+        
+        case_list = []
+        for attempts in case_map.values():
+            attempts.sort(key=lambda item: item["attempt"])
+            final_item = attempts[-1]
+            final_item["retries"] = attempts[:-1]
+            case_list.append(final_item)
         
         report_data = {
             "id": report.id,
@@ -19,8 +19,16 @@ from app.models.ui_test import (
     TestUICasesSuitesRelation,
     TestUICase,
     TestUICaseExecutionRecord,
-    TaskStatus
+    TestUIExecutionQueue,
+    TaskStatus,
+    QueueAction,
+    QueueStatus
 )
+from app.core import case_log
+from app.core.execution_control import execution_registry
+from app.core.execution_queue import execution_queue
+from app.core.task_eta import estimate_tasks, estimate_remaining, end_pause
+from app.core.slot_manager import slot_manager
 
 router = APIRouter()
 
@@ -32,6 +40,46 @@ def format_datetime(dt: datetime) -> str:
     return dt.strftime('%Y-%m-%d %H:%M:%S')
 
 
+# 已结束的测试单状态
+FINISHED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+
+def elapsed_seconds(task: TestUITask) -> Optional[int]:
+    """测试单已执行的时长（秒，不含暂停时间），未开始执行时返回 None"""
+    if not task.start_time:
+        return None
+    if task.status in FINISHED_STATUSES and task.end_time:
+        end_time = task.end_time
+    elif task.paused_time:
+        # 暂停中：执行时长停在暂停时
+        end_time = task.paused_time
+    else:
+        end_time = datetime.now()
+    seconds = int((end_time.replace(tzinfo=None) - task.start_time.replace(tzinfo=None)).total_seconds())
+    return max(0, seconds - (task.paused_seconds or 0))
+
+
+def needs_estimate(task: TestUITask) -> bool:
+    """调度器不在运行（没有实时剩余时间）且未结束的测试单需要按历史耗时预估"""
+    control = execution_registry.get(task.id)
+    return not (control and control.eta) and task.status not in FINISHED_STATUSES
+
+
+def estimated_time(task: TestUITask, remaining_estimate: Optional[int]) -> Optional[int]:
+    """
+    测试单预估总执行时长（秒）
+    
+    执行中的测试单为已执行时长 + 按实际吞吐修正的剩余时间，已结束的测试单为实际执行时长，
+    其余（未执行、已暂停且调度器已退出、中断）为已执行时长 + 未完成用例按历史耗时的预估（estimate_remaining）
+    """
+    control = execution_registry.get(task.id)
+    if control and control.eta:
+        return (elapsed_seconds(task) or 0) + control.eta.remaining_time()
+    if task.status in FINISHED_STATUSES or remaining_estimate is None:
+        return elapsed_seconds(task)
+    return (elapsed_seconds(task) or 0) + remaining_estimate
+
+
 @router.post("", summary="创建测试单", response_model=ResponseSchema[TestTaskResponseSchema])
 async def create_test_task(data: TestTaskCreateSchema, request: Request):
     """
@@ -89,6 +137,7 @@ async def create_test_task(data: TestTaskCreateSchema, request: Request):
             passed_cases=0,
             failed_cases=0,
             progress=0.0,
+            estimated_time=(await estimate_tasks([task]))[task.id],
             suites=data.suites or [],
             cases=data.cases or []
         )
@@ -126,6 +175,8 @@ async def get_test_tasks(
         total = await query.count()
         offset = (page - 1) * page_size
         tasks = await query.offset(offset).limit(page_size).order_by('-created_time')
+        # 调度器不在运行的测试单按历史耗时和并发数批量预估剩余执行时长
+        remaining_estimates = await estimate_remaining([t for t in tasks if needs_estimate(t)])
         
         task_list = []
         for task in tasks:
@@ -159,7 +210,8 @@ async def get_test_tasks(
                 executed_cases=task.executed_cases or 0,
                 passed_cases=task.passed_cases or 0,
                 failed_cases=task.failed_cases or 0,
-                progress=float(task.progress or 0.0)
+                progress=float(task.progress or 0.0),
+                estimated_time=estimated_time(task, remaining_estimates.get(task.id))
             )
             task_list.append(task_data)
         
@@ -177,6 +229,53 @@ async def get_test_tasks(
         return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
 
 
+@router.get("/slots", summary="获取本机执行槽位使用情况")
+async def get_execution_slots():
+    """
+    获取本机全局执行槽位（同时执行的用例/浏览器数上限）的使用情况
+    
+    返回:
+    - capacity: 槽位总数
+    - in_use: 已占用的槽位数
+    - tasks: 各测试单占用的槽位数 held、排队中的用例数 waiting、配置的并发数 max_workers，
+      queued 表示测试单一个槽位都没有分到、仍在排队
+    """
+    try:
+        return ResponseSchema.success(data=slot_manager.usage())
+    except Exception as e:
+        return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
+
+
+@router.get("/queue", summary="获取执行队列")
+async def get_execution_queue(limit: int = Query(50, ge=1, le=500)):
+    """
+    获取测试单执行队列中最近的请求
+    
+    返回每条请求的动作 action（execute/resume）、状态 status、执行进程 owner、
+    最近心跳时间和被恢复执行的次数 recovered_count
+    """
+    try:
+        entries = await TestUIExecutionQueue.all().order_by('-id').limit(limit)
+        return ResponseSchema.success(data=[
+            {
+                "id": entry.id,
+                "task_id": entry.test_task_id,
+                "action": entry.action,
+                "status": entry.status,
+                "owner": entry.owner,
+                "heartbeat_time": format_datetime(entry.heartbeat_time),
+                "recovered_count": entry.recovered_count,
+                "started_time": format_datetime(entry.started_time),
+                "finished_time": format_datetime(entry.finished_time),
+                "error_message": entry.error_message,
+                "created_time": format_datetime(entry.created_time)
+            }
+            for entry in entries
+        ])
+    except Exception as e:
+        return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
+
+
 @router.get("/{task_id}", summary="获取测试单详情")
 async def get_test_task(task_id: int):
     """
@@ -222,6 +321,9 @@ async def get_test_task(task_id: int):
             passed_cases=task.passed_cases or 0,
             failed_cases=task.failed_cases or 0,
             progress=float(task.progress or 0.0),
+            estimated_time=estimated_time(
+                task, (await estimate_remaining([task]))[task.id] if needs_estimate(task) else None
+            ),
             suites=selected_suites,
             cases=selected_cases
         )
@@ -315,9 +417,6 @@ async def execute_test_task(task_id: int, request: Request):
     立即执行测试单
     """
     try:
-        from app.core.task_execution_scheduler import TaskExecutionScheduler
-        import asyncio
-        
         task = await TestUITask.get_or_none(id=task_id)
         
         if not task:
@@ -330,13 +429,12 @@ async def execute_test_task(task_id: int, request: Request):
         # 更新状态为执行中
         task.status = TaskStatus.RUNNING
         task.start_time = datetime.now()
+        task.paused_time = None
+        task.paused_seconds = 0
         await task.save()
         
-        # 创建执行调度器
-        scheduler = TaskExecutionScheduler()
-        
-        # 在后台执行（不阻塞 API 响应）
-        asyncio.create_task(scheduler.execute_task(task_id))
+        # 写入执行队列，由后台调度协程执行（不阻塞 API 响应，服务重启后可恢复）
+        await execution_queue.enqueue(task_id, QueueAction.EXECUTE)
         
         return ResponseSchema.success(
             msg="测试单已开始执行",
@@ -367,8 +465,17 @@ async def cancel_test_task(task_id: int):
         
         task.status = TaskStatus.CANCELLED
         task.end_time = datetime.now()
+        end_pause(task)
         await task.save()
         
+        # 尚未开始执行的队列请求不再执行
+        await execution_queue.cancel_queued(task_id)
+        
+        # 通知正在运行的调度器停止派发，并结束正在执行的用例进程
+        control = execution_registry.get(task_id)
+        if control:
+            await control.cancel()
+        
         return ResponseSchema.success(msg="已取消执行")
         
     except Exception as e:
@@ -390,8 +497,14 @@ async def pause_test_task(task_id: int):
             return ResponseSchema.error(msg="测试单未在执行中", code=400)
         
         task.status = TaskStatus.PAUSED
+        task.paused_time = datetime.now()
         await task.save()
         
+        # 正在执行的用例继续跑完，之后暂停派发
+        control = execution_registry.get(task_id)
+        if control:
+            control.pause()
+        
         return ResponseSchema.success(msg="已暂停执行")
         
     except Exception as e:
@@ -401,29 +514,42 @@ async def pause_test_task(task_id: int):
 @router.post("/{task_id}/resume", summary="继续执行")
 async def resume_test_task(task_id: int):
     """
-    继续执行已暂停的测试单
+    继续执行已暂停（或中断）的测试单
+    
+    调度器仍在运行时直接恢复派发；否则从上一次执行的检查点继续，
+    复用原工作目录、脚本和报告，只执行尚未完成的用例
     """
     try:
-        from app.core.task_execution_scheduler import TaskExecutionScheduler
-        import asyncio
-        
         task = await TestUITask.get_or_none(id=task_id)
         
         if not task:
             return ResponseSchema.error(msg="测试单不存在", code=404)
         
-        if task.status != TaskStatus.PAUSED:
-            return ResponseSchema.error(msg="测试单未处于暂停状态", code=400)
+        control = execution_registry.get(task_id)
+        if control and control.cancelled:
+            return ResponseSchema.error(msg="测试单正在取消，请稍后再试", code=400)
+        
+        # 暂停的测试单可以继续；执行中但调度器已不存在（服务重启等）、执行失败或已取消的测试单可以断点续跑
+        queued = await TestUIExecutionQueue.filter(
+            test_task_id=task_id, status__in=[QueueStatus.QUEUED, QueueStatus.RUNNING]
+        ).exists()
+        resumable = task.status in [TaskStatus.PAUSED, TaskStatus.FAILED, TaskStatus.CANCELLED] or (
+            task.status == TaskStatus.RUNNING and not control and not queued
+        )
+        if not resumable:
+            return ResponseSchema.error(msg="测试单未处于可继续执行的状态", code=400)
         
         # 更新状态为执行中
         task.status = TaskStatus.RUNNING
+        end_pause(task)
         await task.save()
         
-        # 创建执行调度器
-        scheduler = TaskExecutionScheduler()
-        
-        # 在后台继续执行（不阻塞 API 响应）
-        asyncio.create_task(scheduler.execute_task(task_id))
+        if control:
+            # 调度器仍在运行（暂停派发中），直接恢复派发
+            control.resume()
+        else:
+            # 写入执行队列，由后台调度协程从检查点继续执行
+            await execution_queue.enqueue(task_id, QueueAction.RESUME)
         
         return ResponseSchema.success(
             msg="已继续执行",
@@ -443,9 +569,6 @@ async def restart_test_task(task_id: int):
     重新执行测试单（清理已有结果，从头开始）
     """
     try:
-        from app.core.task_execution_scheduler import TaskExecutionScheduler
-        import asyncio
-        
         task = await TestUITask.get_or_none(id=task_id)
         
         if not task:
@@ -463,18 +586,17 @@ async def restart_test_task(task_id: int):
         # 重置任务状态和统计
         task.status = TaskStatus.RUNNING
         task.start_time = datetime.now()
+        task.paused_time = None
+        task.paused_seconds = 0
         # end_time 设置为 null 需要直接更新数据库
         task.executed_cases = 0
         task.passed_cases = 0
         task.failed_cases = 0
         task.progress = Decimal('0.0')
-        await task.save(update_fields=['status', 'start_time', 'executed_cases', 'passed_cases', 'failed_cases', 'progress'])
+        await task.save(update_fields=['status', 'start_time', 'paused_time', 'paused_seconds', 'executed_cases', 'passed_cases', 'failed_cases', 'progress'])
         
-        # 创建执行调度器
-        scheduler = TaskExecutionScheduler()
-        
-        # 在后台执行（不阻塞 API 响应）
-        asyncio.create_task(scheduler.execute_task(task_id))
+        # 写入执行队列，由后台调度协程执行（不阻塞 API 响应）
+        await execution_queue.enqueue(task_id, QueueAction.EXECUTE)
         
         return ResponseSchema.success(
             msg="测试单已开始重新执行",
@@ -500,6 +622,19 @@ async def get_task_progress(task_id: int):
         if not task:
             return ResponseSchema.error(msg="测试单不存在", code=404)
         
+        elapsed_time = elapsed_seconds(task)
+        control = execution_registry.get(task_id)
+        if control and control.eta:
+            remaining_time = control.eta.remaining_time()
+            estimated_total_time = (elapsed_time or 0) + remaining_time
+        elif task.status in FINISHED_STATUSES:
+            remaining_time = 0
+            estimated_total_time = elapsed_time
+        else:
+            # 未执行、暂停后调度器已退出或中断时，按历史耗时预估未完成的用例
+            remaining_time = (await estimate_remaining([task]))[task_id]
+            estimated_total_time = estimated_time(task, remaining_time)
+        
         progress_data = {
             "status": task.status,
             "total_cases": task.total_cases or 0,
@@ -509,9 +644,10 @@ async def get_task_progress(task_id: int):
             "skipped_cases": 0,
             "progress": task.progress or 0.0,
             "start_time": task.start_time,
-            "elapsed_time": None,
-            "estimated_total_time": None,
-            "remaining_time": None
+            "elapsed_time": elapsed_time,
+            "estimated_total_time": estimated_total_time,
+            "remaining_time": remaining_time,
+            "slots": slot_manager.usage(task_id) if control else None
         }
         
         return ResponseSchema.success(data=progress_data)
@@ -582,6 +718,59 @@ async def get_task_log(task_id: int, offset: int = 0):
         return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
 
 
+@router.get("/{task_id}/cases/{case_id}/log", summary="获取用例执行日志")
+async def get_case_log(task_id: int, case_id: int, offset: int = 0):
+    """
+    获取测试单中单个用例的执行日志事件（支持增量读取）
+    
+    参数:
+    - task_id: 测试单ID
+    - case_id: 用例ID
+    - offset: 读取偏移量（字节），默认为0表示从头读取
+    
+    返回:
+    - events: 新增的日志事件（case_start / step / screenshot / case_end）
+    - next_offset: 下次读取的偏移量
+    - is_complete: 任务是否已完成
+    
+    失败重试时日志会被归档并重新写入，偏移量超过文件长度时从头读取
+    """
+    try:
+        task = await TestUITask.get_or_none(id=task_id)
+        
+        if not task:
+            return ResponseSchema.error(msg="测试单不存在", code=404)
+        if not task.log_file_path:
+            return ResponseSchema.error(msg="暂无执行日志，测试尚未开始", code=404)
+        
+        from pathlib import Path
+        logs_dir = Path(task.log_file_path).parent
+        log_files = sorted(logs_dir.glob(f"case_{case_id:03d}_*{case_log.LOG_SUFFIX}"))
+        if not log_files:
+            return ResponseSchema.error(msg="用例执行日志不存在，用例可能尚未开始执行", code=404)
+        
+        log_path = log_files[0]
+        if offset > log_path.stat().st_size:
+            offset = 0
+        try:
+            events, next_offset = case_log.read_events(log_path, offset)
+        except Exception as e:
+            return ResponseSchema.error(msg=f"读取日志文件失败: {str(e)}", code=500)
+        
+        is_complete = task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED]
+        
+        return ResponseSchema.success(data={
+            "task_id": task_id,
+            "case_id": case_id,
+            "events": events,
+            "next_offset": next_offset,
+            "is_complete": is_complete
+        })
+        
+    except Exception as e:
+        return ResponseSchema.error(msg=f"服务器错误: {str(e)}", code=500)
+
+
 @router.get("/{task_id}/contents", summary="获取测试内容")
 async def get_task_contents(task_id: int):
     """
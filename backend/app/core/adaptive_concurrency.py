@@ -0,0 +1,204 @@
+"""
+自适应并发控制
+max_workers='auto' 时从较低的并发数开始，CPU、可用内存和用例耗时正常时逐步增加并发，
+资源紧张或用例明显变慢时降低并发；每次调整都记录到执行日志
+"""
+import asyncio
+import multiprocessing
+import os
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.log import logger
+
+try:
+    import psutil
+except ImportError:  # 未安装 psutil 时从 /proc 读取（Linux），或按系统负载估算 CPU 使用率
+    psutil = None
+
+
+# 初始并发数
+INITIAL_WORKERS = 2
+
+# 每增加一个浏览器预留的内存（MB），以及始终保留给系统的可用内存（MB）
+MEMORY_PER_BROWSER_MB = 400
+MEMORY_RESERVE_MB = 512
+
+# CPU 使用率（%）低于 CPU_LOW 才增加并发，高于 CPU_HIGH 降低并发
+CPU_LOW = 70
+CPU_HIGH = 90
+
+# 用例耗时（实际耗时 / 历史估算耗时）相对基线的比值：超过 LATENCY_SLOW 不再增加并发，超过 LATENCY_DEGRADED 降低并发
+LATENCY_SLOW = 1.5
+LATENCY_DEGRADED = 2.0
+
+
+class SystemSampler:
+    """采集 CPU 使用率和可用内存"""
+
+    def __init__(self):
+        self._last_cpu_times = None
+        if psutil:
+            psutil.cpu_percent(None)
+        else:
+            self._last_cpu_times = self._read_proc_stat()
+
+    def cpu_percent(self) -> Optional[float]:
+        """距上一次采样的 CPU 使用率（%），无法获取时返回 None"""
+        if psutil:
+            return psutil.cpu_percent(None)
+        times = self._read_proc_stat()
+        if times and self._last_cpu_times:
+            idle = times[0] - self._last_cpu_times[0]
+            total = times[1] - self._last_cpu_times[1]
+            self._last_cpu_times = times
+            if total > 0:
+                return (1 - idle / total) * 100
+        if hasattr(os, 'getloadavg'):
+            return min(100.0, os.getloadavg()[0] / multiprocessing.cpu_count() * 100)
+        return None
+
+    @staticmethod
+    def available_memory_mb() -> Optional[float]:
+        """可用内存（MB），无法获取时返回 None"""
+        if psutil:
+            return psutil.virtual_memory().available / 1024 / 1024
+        try:
+            with open('/proc/meminfo', 'r') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    @staticmethod
+    def _read_proc_stat():
+        """/proc/stat 中的 (空闲时间, 总时间)"""
+        try:
+            with open('/proc/stat', 'r') as f:
+                values = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        # idle + iowait
+        return values[3] + (values[4] if len(values) > 4 else 0), sum(values)
+
+
+def max_adaptive_workers(capacity: Optional[int] = None) -> int:
+    """自适应并发的上限：CPU 核数、按当前可用内存能再启动的浏览器数、本机执行槽位数中的最小值"""
+    maximum = multiprocessing.cpu_count()
+    available = SystemSampler.available_memory_mb()
+    if available is not None:
+        maximum = min(maximum, max(1, int((available - MEMORY_RESERVE_MB) // MEMORY_PER_BROWSER_MB)))
+    if capacity:
+        maximum = min(maximum, capacity)
+    return max(1, maximum)
+
+
+class AdaptiveConcurrency:
+    """
+    自适应并发限制器，用法与 asyncio.Semaphore 相同（async with）
+
+    - 可用内存低于预留值时立即减半
+    - 其余指标每完成一轮（不少于当前并发数个用例）评估一次：CPU 使用率高于 CPU_HIGH 或用例耗时超过基线 LATENCY_DEGRADED 倍时减一；
+      并发已用满、CPU 低于 CPU_LOW、可用内存足够再启动一个浏览器且用例耗时未超过基线 LATENCY_SLOW 倍时加一
+    - 降低后正在执行的用例继续跑完，只是空出的位置暂不派发
+    - 用例耗时按 实际耗时 / 历史估算耗时 计算，基线取第一轮（初始并发下）完成的用例
+    """
+
+    def __init__(self, maximum: int, initial: int = INITIAL_WORKERS, estimates: Optional[Dict[int, float]] = None,
+                 notify: Optional[Callable[[str], None]] = None,
+                 on_change: Optional[Callable[[int], None]] = None):
+        self.maximum = max(1, maximum)
+        self.limit = max(1, min(initial, self.maximum))
+        self.initial = self.limit
+        self.peak = self.limit
+        self.active = 0
+        self.estimates = estimates or {}
+        self.notify = notify
+        self.on_change = on_change
+        self.sampler = SystemSampler()
+        self.decisions: List[Dict] = []
+        self._condition = asyncio.Condition()
+        self._baseline: Optional[float] = None
+        self._window: List[float] = []
+        self._completed = 0
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    async def record(self, case_id: int, duration: float):
+        """记录一个完成的用例耗时并评估是否调整并发（在 async with 内调用）"""
+        estimate = self.estimates.get(case_id)
+        if estimate and duration > 0:
+            self._window.append(duration / estimate)
+        self._completed += 1
+        await self._evaluate()
+
+    async def _evaluate(self):
+        memory = self.sampler.available_memory_mb()
+        # 上一次减半后超出限制的用例还没有执行完时不再继续减半
+        if memory is not None and memory < MEMORY_RESERVE_MB and 1 < self.limit and self.active <= self.limit:
+            await self._scale(max(1, self.limit // 2), f"可用内存 {memory:.0f}MB 低于预留 {MEMORY_RESERVE_MB}MB",
+                              {'cpu': None, 'memory_mb': memory, 'latency': None})
+            return
+
+        # 其余指标按轮评估：每完成不少于当前并发数个用例评估一次，CPU 使用率为这一轮的平均值
+        if self._completed < max(2, self.limit):
+            return
+        cpu = self.sampler.cpu_percent()
+        window = statistics.median(self._window) if self._window else None
+        if self._baseline is None:
+            self._baseline = window
+        latency = window / self._baseline if window and self._baseline else None
+        metrics = {'cpu': cpu, 'memory_mb': memory, 'latency': latency}
+        saturated = self.active >= self.limit
+        self._window = []
+        self._completed = 0
+
+        if cpu is not None and cpu > CPU_HIGH and self.limit > 1:
+            await self._scale(self.limit - 1, f"CPU 使用率 {cpu:.0f}% 高于 {CPU_HIGH}%", metrics)
+        elif latency is not None and latency > LATENCY_DEGRADED and self.limit > 1:
+            await self._scale(self.limit - 1, f"用例耗时为基线的 {latency:.1f} 倍", metrics)
+        elif (self.limit < self.maximum and saturated
+              and (cpu is None or cpu < CPU_LOW)
+              and (memory is None or memory > MEMORY_RESERVE_MB + MEMORY_PER_BROWSER_MB)
+              and (latency is None or latency < LATENCY_SLOW)):
+            await self._scale(self.limit + 1, "CPU、内存和用例耗时正常", metrics)
+
+    async def _scale(self, limit: int, reason: str, metrics: Dict):
+        previous, self.limit = self.limit, limit
+        self.peak = max(self.peak, limit)
+        self._window = []
+        self._completed = 0
+        self.decisions.append({'time': time.strftime('%H:%M:%S'), 'from': previous, 'to': limit, 'reason': reason})
+        cpu = f"{metrics['cpu']:.0f}%" if metrics['cpu'] is not None else '-'
+        memory = f"{metrics['memory_mb']:.0f}MB" if metrics['memory_mb'] is not None else '-'
+        latency = f"{metrics['latency']:.2f}" if metrics['latency'] is not None else '-'
+        message = (f"自适应并发: {previous} -> {limit}，{reason}"
+                   f"（CPU {cpu}，可用内存 {memory}，耗时/基线 {latency}）")
+        logger.info(message)
+        if self.notify:
+            self.notify(message)
+        if self.on_change:
+            self.on_change(limit)
+        async with self._condition:
+            self._condition.notify_all()
+
+    def summary(self) -> Dict:
+        return {
+            'initial': self.initial,
+            'maximum': self.maximum,
+            'peak': self.peak,
+            'final': self.limit,
+            'decisions': self.decisions
+        }
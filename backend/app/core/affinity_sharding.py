@@ -0,0 +1,131 @@
+"""
+按角色和模块分片派发
+schedule_policy='affinity' 时，按 (权限角色, 模块) 把用例分成分片，分片按历史耗时分配给各执行通道（并发槽位），
+同一分片的用例在同一通道上依次执行：常驻浏览器进程池中优先交给上一次执行该分片的工作进程，
+同一角色的登录态只由一个通道刷新，模块相关的页面和缓存也更容易命中。
+通道自己的分片执行完后，从剩余预估耗时最多的通道队尾（耗时最短的用例）窃取用例，避免收尾阶段通道空闲
+"""
+import heapq
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.auth_state_manager import DEFAULT_AUTH_ROLE
+
+
+def shard_key(script_info: Dict) -> str:
+    """用例所属分片：第一个权限角色（未配置时为默认账号）+ 模块"""
+    return f"{script_info.get('role') or DEFAULT_AUTH_ROLE}/{script_info.get('module') or '-'}"
+
+
+class Shard:
+    """同一角色、同一模块的用例"""
+
+    def __init__(self, key: str, scripts: List[Dict], estimates: Dict[int, float]):
+        self.key = key
+        # 分片内耗时长的用例先执行，被窃取的是队尾耗时短的用例
+        self.queue: Deque[Dict] = deque(sorted(scripts, key=lambda s: estimates.get(s['case_id'], 0), reverse=True))
+        self.total = len(scripts)
+        self.estimated = sum(estimates.get(s['case_id'], 0) for s in scripts)
+        self.lane: Optional[int] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = 0
+        self.stolen = 0
+        self.busy = 0.0
+
+    def summary(self, origin: float) -> Dict:
+        return {
+            'shard': self.key,
+            'lane': self.lane,
+            'cases': self.total,
+            'finished_cases': self.done,
+            'stolen_cases': self.stolen,
+            'estimated': round(self.estimated, 1),
+            'busy': round(self.busy, 1),
+            'start': round(self.started - origin, 1) if self.started is not None else None,
+            'end': round(self.finished - origin, 1) if self.finished is not None else None
+        }
+
+
+class ShardPlan:
+    """
+    分片派发计划
+
+    - 分片按预估耗时从大到小分配给当前预估负载最小的通道
+    - 通道按分配顺序逐个执行自己的分片，next() 返回通道的下一个用例
+    - 通道没有剩余用例时，从剩余预估耗时最多的通道的最后一个分片队尾窃取
+    """
+
+    def __init__(self, scripts: List[Dict], lanes: int, estimates: Dict[int, float],
+                 notify: Optional[Callable[[str], None]] = None):
+        self.estimates = estimates
+        self.notify = notify
+        self.origin = time.monotonic()
+
+        groups: Dict[str, List[Dict]] = {}
+        for script_info in scripts:
+            groups.setdefault(shard_key(script_info), []).append(script_info)
+        self.shards = [Shard(key, group, estimates) for key, group in groups.items()]
+
+        # 分片比用例少时多余的通道一开始就靠窃取工作
+        self.lanes: List[Deque[Shard]] = [deque() for _ in range(max(1, min(lanes, len(scripts))))]
+        self.loads = [0.0] * len(self.lanes)
+        heap = [(0.0, lane) for lane in range(len(self.lanes))]
+        for shard in sorted(self.shards, key=lambda s: s.estimated, reverse=True):
+            load, lane = heapq.heappop(heap)
+            shard.lane = lane
+            self.lanes[lane].append(shard)
+            self.loads[lane] += shard.estimated
+            heapq.heappush(heap, (load + shard.estimated, lane))
+
+    def describe(self) -> str:
+        lanes = '；'.join(
+            f"通道{lane + 1}: {', '.join(s.key for s in shards) or '（窃取）'} 预估 {self.loads[lane]:.0f} 秒"
+            for lane, shards in enumerate(self.lanes)
+        )
+        return f"按角色和模块分片派发: {len(self.shards)} 个分片分配到 {len(self.lanes)} 个执行通道（{lanes}）"
+
+    def next(self, lane: int) -> Optional[Tuple[Dict, Shard]]:
+        """通道的下一个用例；没有可执行的用例时返回 None"""
+        own = self.lanes[lane]
+        while own and not own[0].queue:
+            own.popleft()
+        if own:
+            script_info = own[0].queue.popleft()
+            self.loads[lane] -= self.estimates.get(script_info['case_id'], 0)
+            return script_info, own[0]
+
+        victims = [(self.loads[other], other) for other, shards in enumerate(self.lanes)
+                   if other != lane and any(shard.queue for shard in shards)]
+        if not victims:
+            return None
+        _, victim = max(victims)
+        shard = next(shard for shard in reversed(self.lanes[victim]) if shard.queue)
+        script_info = shard.queue.pop()
+        shard.stolen += 1
+        self.loads[victim] -= self.estimates.get(script_info['case_id'], 0)
+        return script_info, shard
+
+    def case_started(self, shard: Shard):
+        if shard.started is None:
+            shard.started = time.monotonic()
+
+    def case_finished(self, shard: Shard, duration: float):
+        """记录用例耗时；分片的用例全部执行完时在执行日志中输出分片耗时"""
+        shard.done += 1
+        shard.busy += duration
+        if shard.done == shard.total:
+            shard.finished = time.monotonic()
+            if self.notify:
+                self.notify(f"分片 {shard.key} 执行完成: {shard.total} 个用例，"
+                            f"耗时 {shard.finished - shard.started:.0f} 秒（用例累计 {shard.busy:.0f} 秒，"
+                            f"预估 {shard.estimated:.0f} 秒），其中 {shard.stolen} 个由其他通道窃取执行")
+
+    def summary(self) -> Dict:
+        return {
+            'policy': 'affinity',
+            'lanes': len(self.lanes),
+            'stolen_cases': sum(shard.stolen for shard in self.shards),
+            'shards': [shard.summary(self.origin) for shard in self.shards]
+        }
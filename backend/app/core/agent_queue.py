@@ -0,0 +1,358 @@
+"""
+分布式执行队列
+调度器把待执行的用例写入 test_ui_case_leases 表，由独立部署的执行代理（python -m app.agent）
+通过 HTTP 接口领取、执行并回传执行日志，一个测试单可以同时分发到所有在线的代理
+
+- 领取时生成新的租约令牌并设置到期时间，代理执行期间通过心跳续租
+- 租约到期仍未续租（代理崩溃或失联）的用例回到队列，由其他代理重新领取，旧令牌的回传会被拒绝
+- 同一用例被领取 MAX_LEASE_COUNT 次仍未完成时判定为失败，避免反复拖垮代理的用例无限重排
+"""
+import asyncio
+import base64
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from app.core import case_log
+from app.models.ui_test import LeaseStatus, TestUIAgent, TestUICaseLease, TestUIReport, TestUITask
+from app.log import logger
+
+
+# 租约时长（秒），代理每 HEARTBEAT_INTERVAL 秒心跳一次并续租
+LEASE_TIMEOUT = 60
+HEARTBEAT_INTERVAL = 10
+
+# 同一用例最多被领取的次数（每次租约过期都会重新领取）
+MAX_LEASE_COUNT = 3
+
+# 调度器检查执行结果的间隔（秒）
+POLL_INTERVAL = 1
+
+
+def _is_online(agent: TestUIAgent, now: datetime) -> bool:
+    return bool(agent.last_heartbeat) and agent.last_heartbeat.replace(tzinfo=None) >= now - timedelta(seconds=LEASE_TIMEOUT)
+
+
+class AgentBroker:
+    """执行代理接口侧：注册、心跳续租、领取用例、回传结果"""
+
+    async def register(self, name: str, hostname: Optional[str], capacity: int) -> TestUIAgent:
+        """注册执行代理（同名代理重启后复用原记录）"""
+        agent = await TestUIAgent.get_or_none(name=name)
+        if agent:
+            agent.hostname = hostname
+            agent.capacity = capacity
+            agent.running_cases = 0
+            agent.last_heartbeat = datetime.now()
+            await agent.save()
+        else:
+            agent = await TestUIAgent.create(name=name, hostname=hostname, capacity=capacity,
+                                             last_heartbeat=datetime.now())
+        logger.info(f"执行代理已注册: {name} ({hostname}), 并发数: {capacity}")
+        return agent
+
+    async def heartbeat(self, agent_id: int, lease_ids: List[int]) -> List[int]:
+        """
+        代理心跳：续租正在执行的用例
+
+        Returns:
+            需要代理停止执行的租约ID（测试单已取消，或租约已过期被其他代理领取）
+        """
+        now = datetime.now()
+        await TestUIAgent.filter(id=agent_id).update(last_heartbeat=now, running_cases=len(lease_ids))
+        if not lease_ids:
+            return []
+        await TestUICaseLease.filter(
+            id__in=lease_ids, agent_id=agent_id, status=LeaseStatus.LEASED
+        ).update(lease_expires_at=now + timedelta(seconds=LEASE_TIMEOUT))
+        held = set(await TestUICaseLease.filter(
+            id__in=lease_ids, agent_id=agent_id, status=LeaseStatus.LEASED
+        ).values_list('id', flat=True))
+        return [lease_id for lease_id in lease_ids if lease_id not in held]
+
+    async def lease(self, agent_id: int, max_cases: int) -> List[Dict]:
+        """
+        领取最多 max_cases 个用例（等待中的用例，以及租约已过期的用例）
+
+        Returns:
+            任务列表，包含执行所需的文件内容（配置、脚本或步骤计划、登录态）
+        """
+        now = datetime.now()
+        await TestUIAgent.filter(id=agent_id).update(last_heartbeat=now)
+        if max_cases <= 0:
+            return []
+
+        async with in_transaction() as conn:
+            leases = await TestUICaseLease.filter(
+                Q(status=LeaseStatus.PENDING) | Q(status=LeaseStatus.LEASED, lease_expires_at__lt=now),
+                lease_count__lt=MAX_LEASE_COUNT
+            ).order_by('id').limit(max_cases).select_for_update().using_db(conn)
+            for lease in leases:
+                if lease.status == LeaseStatus.LEASED:
+                    logger.warn(f"用例租约已过期，重新分配: lease_id={lease.id}, case_id={lease.case_id}")
+                lease.status = LeaseStatus.LEASED
+                lease.agent_id = agent_id
+                lease.lease_token = uuid.uuid4().hex
+                lease.lease_expires_at = now + timedelta(seconds=LEASE_TIMEOUT)
+                lease.lease_count += 1
+                await lease.save(using_db=conn, update_fields=[
+                    'status', 'agent_id', 'lease_token', 'lease_expires_at', 'lease_count'
+                ])
+
+        jobs = []
+        for lease in leases:
+            try:
+                jobs.append(self._build_job(lease))
+            except Exception as e:
+                logger.error(f"读取用例执行文件失败: lease_id={lease.id}, {e}")
+                await self._finish(lease.id, lease.lease_token, {'status': 'failed', 'error': f"读取执行文件失败: {e}"})
+        return jobs
+
+    def _build_job(self, lease: TestUICaseLease) -> Dict:
+        payload = lease.payload
+        work_dir = Path(payload['work_dir'])
+        with open(work_dir / 'config.json', 'r', encoding='utf-8') as f:
+            config_text = f.read()
+        config = json.loads(config_text)
+        files = {'config.json': config_text, payload['path']: (work_dir / payload['path']).read_text(encoding='utf-8')}
+        for state in (config.get('auth_states') or {}).values():
+            state_path = work_dir / state['path']
+            if state_path.exists():
+                files[state['path']] = state_path.read_text(encoding='utf-8')
+        if payload['kind'] == 'script':
+            # 生成的脚本从同目录导入运行时模块
+            runtime_path = Path(payload['path']).with_name('case_runtime.py')
+            files[runtime_path.as_posix()] = (work_dir / runtime_path).read_text(encoding='utf-8')
+        har_path, har = self._har_file(config, work_dir, lease.case_id)
+        return {
+            'lease_id': lease.id,
+            'lease_token': lease.lease_token,
+            'task_id': lease.test_task_id,
+            'case_id': lease.case_id,
+            'attempt': lease.attempt,
+            'work_dir_name': work_dir.name,
+            'kind': payload['kind'],
+            'path': payload['path'],
+            'timeout': payload['timeout'],
+            'files': files,
+            'har_path': har_path,
+            'har': har
+        }
+
+    @staticmethod
+    def _har_file(config: Dict, work_dir: Path, case_id: int) -> Tuple[Optional[str], Optional[str]]:
+        """
+        用例的 HAR 文件（network_mode=record/replay）
+
+        Returns:
+            (相对工作目录的路径, 需要回放时的 HAR 内容)；代理上没有本机的 HAR 目录，
+            回放的 HAR 随用例下发，内容为 None 时代理删除本地旧的 HAR 后录制
+        """
+        har = config.get('har')
+        if not har:
+            return None, None
+        har_path = f"{har['dir']}/case_{case_id}.har"
+        if har['mode'] != 'replay' or case_id in har['refresh'] or not (work_dir / har_path).exists():
+            return har_path, None
+        return har_path, (work_dir / har_path).read_text(encoding='utf-8')
+
+    async def complete(self, lease_id: int, lease_token: str, result: Dict, log: Optional[str],
+                       screenshots: Dict[str, str], har: Optional[str] = None) -> bool:
+        """
+        回传执行结果：写入执行日志、截图、失败 trace 和代理录制的 HAR，标记用例完成
+
+        Returns:
+            租约仍有效时返回 True；租约已过期被重新分配或测试单已取消时返回 False，结果被丢弃
+        """
+        lease = await TestUICaseLease.get_or_none(id=lease_id)
+        if not lease or lease.lease_token != lease_token or lease.status != LeaseStatus.LEASED:
+            return False
+
+        work_dir = Path(lease.payload['work_dir'])
+        if log is not None:
+            log_path = work_dir / 'logs' / f"{Path(lease.payload['path']).stem}{case_log.LOG_SUFFIX}"
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            log_path.write_text(log, encoding='utf-8')
+
+        # 截图和失败 trace 只能写入工作目录的 screenshots/ 和 traces/
+        allowed_dirs = {(work_dir / 'screenshots').resolve(), (work_dir / 'traces').resolve()}
+        for relative_path, content in (screenshots or {}).items():
+            target = (work_dir / relative_path).resolve()
+            if not allowed_dirs & set(target.parents):
+                logger.warn(f"忽略工作目录 screenshots/、traces/ 之外的文件: {relative_path}")
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(base64.b64decode(content))
+
+        if har is not None:
+            self._save_har(work_dir, lease.case_id, har)
+
+        return await self._finish(lease_id, lease_token, result)
+
+    @staticmethod
+    def _save_har(work_dir: Path, case_id: int, content: str):
+        """代理录制的 HAR 保存到本机的 HAR 目录，之后的回放（本机或其他代理）都使用它"""
+        with open(work_dir / 'config.json', 'r', encoding='utf-8') as f:
+            har = json.load(f).get('har')
+        if not har:
+            logger.warn(f"测试单未启用 HAR 录制，忽略代理回传的 HAR: case_id={case_id}")
+            return
+        target = work_dir / har['dir'] / f"case_{case_id}.har"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(content, encoding='utf-8')
+        os.replace(tmp_path, target)
+
+    async def _finish(self, lease_id: int, lease_token: str, result: Dict) -> bool:
+        updated = await TestUICaseLease.filter(
+            id=lease_id, lease_token=lease_token, status=LeaseStatus.LEASED
+        ).update(
+            status=LeaseStatus.DONE,
+            result={'status': result.get('status', 'failed'), 'error': result.get('error')},
+            finished_time=datetime.now()
+        )
+        return bool(updated)
+
+    async def list_agents(self) -> List[Dict]:
+        """执行代理列表（最近一个租约周期内有心跳的视为在线）"""
+        now = datetime.now()
+        return [
+            {
+                'id': agent.id,
+                'name': agent.name,
+                'hostname': agent.hostname,
+                'capacity': agent.capacity,
+                'running_cases': agent.running_cases,
+                'online': _is_online(agent, now),
+                'last_heartbeat': agent.last_heartbeat.strftime('%Y-%m-%d %H:%M:%S') if agent.last_heartbeat else None
+            }
+            for agent in await TestUIAgent.all().order_by('name')
+        ]
+
+
+class AgentDispatcher:
+    """
+    调度器侧：把用例写入分布式执行队列，等待执行代理回传结果
+
+    run() 与其他执行方式的 runner 签名一致，失败重试、执行日志簿、结果流式写入无需区分执行方式
+    """
+
+    def __init__(self, task: TestUITask, report: TestUIReport, work_dir: Path, timeout: int,
+                 notify: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            timeout: 单个用例的执行超时（秒），由代理执行时使用
+            notify: 写入测试单执行日志的回调 (message, level)
+        """
+        self.task = task
+        self.report = report
+        self.work_dir = work_dir
+        self.timeout = timeout
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._warned_no_agent = False
+        self._started_at = datetime.now()
+        self._notify = notify or (lambda message, level: logger.warn(message))
+
+    async def start(self):
+        """启动结果轮询；上一次执行遗留在队列中的用例（服务重启、断点续跑）不再执行"""
+        stale = await TestUICaseLease.filter(
+            test_task_id=self.task.id, status__in=[LeaseStatus.PENDING, LeaseStatus.LEASED]
+        ).update(status=LeaseStatus.CANCELLED)
+        if stale:
+            logger.info(f"清理上一次执行遗留的队列用例: task_id={self.task.id}, 数量: {stale}")
+        self._poller = asyncio.create_task(self._poll())
+
+    async def close(self):
+        if self._poller:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+
+    async def cancel(self):
+        """取消：撤回队列中的用例，代理在下次心跳时停止执行"""
+        if self._waiting:
+            await TestUICaseLease.filter(
+                id__in=list(self._waiting), status__in=[LeaseStatus.PENDING, LeaseStatus.LEASED]
+            ).update(status=LeaseStatus.CANCELLED)
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_result({'status': 'failed', 'error': '测试单已取消'})
+        self._waiting.clear()
+
+    async def run(self, script_info: Dict) -> Dict:
+        """把用例写入队列并等待执行结果"""
+        if 'plan_path' in script_info:
+            kind, path = 'plan', Path(script_info['plan_path'])
+        else:
+            kind, path = 'script', Path(script_info['script_path'])
+        lease = await TestUICaseLease.create(
+            test_task_id=self.task.id,
+            test_report_id=self.report.id,
+            case_id=script_info['case_id'],
+            sequence=script_info['sequence'],
+            attempt=script_info.get('attempt', 1),
+            payload={
+                'work_dir': str(self.work_dir),
+                'kind': kind,
+                'path': str(path.relative_to(self.work_dir)),
+                'timeout': script_info.get('timeout', self.timeout)
+            }
+        )
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[lease.id] = future
+        try:
+            return await future
+        finally:
+            self._waiting.pop(lease.id, None)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            if not self._waiting:
+                continue
+            try:
+                await self._collect_finished()
+            except Exception as e:
+                logger.error(f"检查分布式执行结果失败: task_id={self.task.id}, {e}")
+
+    async def _collect_finished(self):
+        lease_ids = list(self._waiting)
+        now = datetime.now()
+
+        # 多次租约过期的用例判定为失败
+        await TestUICaseLease.filter(
+            id__in=lease_ids, status=LeaseStatus.LEASED, lease_expires_at__lt=now,
+            lease_count__gte=MAX_LEASE_COUNT
+        ).update(
+            status=LeaseStatus.DONE,
+            result={'status': 'failed', 'error': f'执行代理失联，用例已被领取 {MAX_LEASE_COUNT} 次仍未完成'},
+            finished_time=now
+        )
+
+        rows = await TestUICaseLease.filter(
+            id__in=lease_ids, status=LeaseStatus.DONE
+        ).values_list('id', 'result')
+        for lease_id, result in rows:
+            future = self._waiting.get(lease_id)
+            if future and not future.done():
+                future.set_result(dict(result or {'status': 'failed', 'error': '执行结果缺失'}))
+
+        # 启动后一个租约周期内仍没有在线的代理时提示（代理启动需要时间）
+        if self._warned_no_agent or now - self._started_at < timedelta(seconds=LEASE_TIMEOUT):
+            return
+        pending = await TestUICaseLease.filter(id__in=lease_ids, status=LeaseStatus.PENDING).count()
+        if pending:
+            agents = await TestUIAgent.all()
+            if not any(_is_online(agent, now) for agent in agents):
+                self._warned_no_agent = True
+                self._notify(f"没有在线的执行代理，{pending} 个用例等待领取（python -m app.agent 启动代理）", "WARNING")
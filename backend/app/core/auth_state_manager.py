@@ -0,0 +1,150 @@
+"""
+登录态缓存管理器
+在执行用例前为每个角色登录一次，保存 Playwright storage_state，
+用例脚本直接从登录态启动 BrowserContext，避免每个用例都走一遍 UI 登录
+"""
+import asyncio
+import hashlib
+import re
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.log import logger
+
+
+# 未配置权限角色的用例使用的登录态键（对应环境变量中的默认管理员账号）
+DEFAULT_AUTH_ROLE = '_default'
+
+# 登录态默认有效期（秒）
+DEFAULT_AUTH_TTL = 1800
+
+
+class AuthStateManager:
+    """
+    登录态缓存管理器
+
+    通过 execute_config.auth_cache 启用：
+        {
+            "enabled": true,
+            "login_url": "{{host}}/login",
+            "username_selector": "#username",
+            "password_selector": "#password",
+            "submit_selector": "#submitBtn",
+            "landing_url": "{{host}}/",          # 可选，复用登录态后打开的页面
+            "logged_in_selector": ".user-info",  # 可选，登录成功的标志元素
+            "ttl": 1800                          # 可选，登录态有效期（秒）
+        }
+    """
+
+    async def prepare(self, config: Dict, work_dir: Path) -> Dict:
+        """
+        为配置中的每个角色登录一次并保存登录态
+
+        Args:
+            config: ConfigGenerator 生成的配置数据（会写入 auth_states 字段）
+            work_dir: 工作目录
+
+        Returns:
+            角色到登录态信息的映射 {role: {'path': 'auth/xxx.json', 'username': ...}}
+        """
+        execute_config = config['execute_config']
+        auth_cache = execute_config.get('auth_cache') or {}
+        if not auth_cache.get('enabled'):
+            return {}
+
+        missing = [key for key in ('login_url', 'username_selector', 'password_selector', 'submit_selector')
+                   if not auth_cache.get(key)]
+        if missing:
+            logger.warn(f"登录态缓存配置缺少字段 {missing}，已跳过预登录")
+            auth_cache['enabled'] = False
+            return {}
+
+        # 解析地址中的环境变量占位符，脚本中直接使用解析后的地址
+        env_vars = config.get('environment_variables', {})
+        for key in ('login_url', 'landing_url'):
+            if auth_cache.get(key):
+                auth_cache[key] = self._resolve_variables(auth_cache[key], env_vars)
+        auth_cache.setdefault('ttl', DEFAULT_AUTH_TTL)
+
+        users = dict(config.get('test_users', {}))
+        if env_vars.get('admin_username'):
+            users[DEFAULT_AUTH_ROLE] = {
+                'username': env_vars.get('admin_username'),
+                'password': env_vars.get('admin_password')
+            }
+
+        auth_dir = work_dir / 'auth'
+        auth_dir.mkdir(parents=True, exist_ok=True)
+
+        from playwright.async_api import async_playwright
+
+        start = time.perf_counter()
+        states = {}
+        try:
+            async with async_playwright() as p:
+                launcher = getattr(p, execute_config.get('browser', 'chromium'), None) or p.chromium
+                browser = await launcher.launch(headless=execute_config.get('headless', True))
+                try:
+                    results = await asyncio.gather(*[
+                        self._login_role(browser, auth_cache, role, user, auth_dir, execute_config)
+                        for role, user in users.items()
+                    ])
+                finally:
+                    await browser.close()
+        except Exception as e:
+            logger.warn(f"预登录启动浏览器失败，用例将自行登录: {type(e).__name__}: {e}")
+            return {}
+
+        for role, state in zip(users.keys(), results):
+            if state:
+                states[role] = state
+
+        config['auth_states'] = states
+        logger.info(
+            f"登录态预登录完成: {len(states)}/{len(users)} 个角色，"
+            f"用时 {time.perf_counter() - start:.2f} 秒"
+        )
+        return states
+
+    async def _login_role(self, browser, auth_cache: Dict, role: str, user: Dict,
+                          auth_dir: Path, execute_config: Dict) -> Optional[Dict]:
+        """登录单个角色并保存 storage_state，失败时返回 None（该角色的用例回退为 UI 登录）"""
+        state_file = auth_dir / f"{self._role_slug(role)}.json"
+        context = await browser.new_context(
+            viewport=execute_config.get('viewport', {'width': 1920, 'height': 1080})
+        )
+        try:
+            page = await context.new_page()
+            page.set_default_timeout(execute_config.get('timeout', 30000))
+            await page.goto(auth_cache['login_url'])
+            await page.fill(auth_cache['username_selector'], user['username'])
+            await page.fill(auth_cache['password_selector'], user['password'])
+            await page.click(auth_cache['submit_selector'])
+            if auth_cache.get('logged_in_selector'):
+                await page.wait_for_selector(auth_cache['logged_in_selector'])
+            else:
+                await page.wait_for_load_state('networkidle')
+                if await page.is_visible(auth_cache['password_selector']):
+                    raise RuntimeError('提交登录后仍停留在登录页')
+
+            await context.storage_state(path=str(state_file))
+            logger.info(f"角色 '{role}' 预登录成功: {user['username']}")
+            return {
+                'path': str(state_file.relative_to(auth_dir.parent)),
+                'username': user['username']
+            }
+        except Exception as e:
+            logger.warn(f"角色 '{role}' 预登录失败，相关用例将自行登录: {type(e).__name__}: {e}")
+            return None
+        finally:
+            await context.close()
+
+    @staticmethod
+    def _role_slug(role: str) -> str:
+        """角色名可能包含中文或特殊字符，使用哈希作为文件名"""
+        return hashlib.md5(role.encode('utf-8')).hexdigest()[:12]
+
+    @staticmethod
+    def _resolve_variables(value: str, env_vars: Dict) -> str:
+        return re.sub(r'\{\{(\w+)\}\}', lambda m: str(env_vars.get(m.group(1), m.group(0))), value)
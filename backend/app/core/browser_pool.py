@@ -0,0 +1,367 @@
+"""
+浏览器工作进程池
+常驻最多 N 个工作进程（可先启动一部分，不够用时按需扩容），每个进程持有一个预热的 Playwright 浏览器，
+从队列中领取用例脚本或步骤计划，并在独立的 BrowserContext 中执行
+
+工作进程是独立脚本（browser_worker.py），通过 asyncio 子进程启动，
+用 stdin/stdout 逐行交换 JSON，主进程不会被 fork，也不会阻塞事件循环
+
+指定测试单时每个工作进程在存活期间占用一个全局执行槽位（slot_manager）：只在有空闲槽位时启动和扩容，
+槽位不足时排队；其他测试单排队且本测试单占用更多时，结束空闲的工作进程让出槽位
+"""
+import asyncio
+import itertools
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from app.core.case_executor import START_NEW_SESSION, kill_process_tree
+from app.core.execution_queue import case_process_env
+from app.core.slot_manager import slot_manager
+from app.log import logger
+
+
+WORKER_SCRIPT = Path(__file__).parent / 'browser_worker.py'
+
+# 结果行可能携带用例的完整 stdout，放宽单行读取上限
+STREAM_LIMIT = 16 * 1024 * 1024
+
+# 主进程侧在用例超时基础上额外等待的时间（秒），覆盖浏览器重启等开销
+RESULT_GRACE_SECONDS = 30
+
+
+class BrowserWorker:
+    """单个浏览器工作进程的句柄"""
+
+    def __init__(self, worker_id: int, browser_config: Dict):
+        self.worker_id = worker_id
+        self.browser_config = browser_config
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.ready = False
+        self.error: Optional[str] = None
+
+    async def start(self) -> bool:
+        """启动工作进程并等待浏览器就绪"""
+        self.ready = False
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, str(WORKER_SCRIPT), json.dumps(self.browser_config),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=STREAM_LIMIT,
+            env=case_process_env(),
+            start_new_session=START_NEW_SESSION
+        )
+        message = await self._read_message()
+        if message and message.get('type') == 'ready':
+            self.ready = True
+            logger.info(f"浏览器工作进程就绪: worker={self.worker_id}, pid={self.process.pid}")
+        else:
+            self.error = (message or {}).get('error') or '工作进程启动失败'
+            logger.error(f"浏览器工作进程启动浏览器失败: worker={self.worker_id}, {self.error}")
+            await self.kill()
+        return self.ready
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def run(self, job: Dict) -> Dict:
+        """发送任务并等待结果；工作进程异常时返回失败结果"""
+        try:
+            self.process.stdin.write((json.dumps(job, ensure_ascii=False) + '\n').encode('utf-8'))
+            await self.process.stdin.drain()
+            message = await asyncio.wait_for(
+                self._read_message(),
+                timeout=job['timeout'] + RESULT_GRACE_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"浏览器工作进程无响应，强制结束: worker={self.worker_id}")
+            await self.kill()
+            return {'status': 'failed', 'error': f"执行超时（{job['timeout']} 秒）", 'timeout': job['timeout']}
+        except (BrokenPipeError, ConnectionResetError):
+            message = None
+
+        if not message or message.get('type') != 'result':
+            logger.error(f"浏览器工作进程异常退出: worker={self.worker_id}")
+            await self.kill()
+            return {'status': 'failed', 'error': '浏览器工作进程异常退出'}
+        return message['result']
+
+    async def _read_message(self) -> Optional[Dict]:
+        """读取下一条协议消息，忽略非 JSON 的杂项输出"""
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                return None
+            try:
+                return json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue
+
+    async def stop(self):
+        """通知工作进程退出，超时则强制结束"""
+        if not self.alive:
+            return
+        try:
+            self.process.stdin.write(b'\n')
+            await self.process.stdin.drain()
+            await asyncio.wait_for(self.process.wait(), timeout=10)
+        except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+            await self.kill()
+
+    async def kill(self):
+        """结束工作进程及其启动的浏览器"""
+        if self.alive:
+            await kill_process_tree(self.process)
+        self.ready = False
+
+
+class BrowserWorkerPool:
+    """
+    浏览器工作进程池
+    每个工作进程只启动一次浏览器，用例之间通过新建 BrowserContext 隔离
+    """
+
+    def __init__(self, size: int, execute_config: Dict, slot_task_id: Optional[int] = None):
+        """
+        Args:
+            size: 最多的工作进程数
+            slot_task_id: 占用全局执行槽位的测试单ID，为 None 时不占用槽位
+        """
+        self.size = max(1, int(size))
+        self.browser_config = {
+            'browser': execute_config.get('browser', 'chromium'),
+            'headless': execute_config.get('headless', True)
+        }
+        self._workers: List[BrowserWorker] = []
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._job_ids = itertools.count(1)
+        self._worker_ids = itertools.count()
+        self._starting = 0  # 已启动（含启动中）的工作进程数
+        self._last_error: Optional[str] = None
+        self._terminated = False
+        # 分片键 -> 上一次执行该分片用例的工作进程
+        self._affinity: Dict[str, BrowserWorker] = {}
+        self.affinity_hits = 0
+        self.slot_task_id = slot_task_id
+        # 排队领取槽位后扩容的后台任务、正在退出的工作进程
+        self._slot_request: Optional[asyncio.Task] = None
+        self._retiring: Set[asyncio.Task] = set()
+        if slot_task_id is not None:
+            slot_manager.watch(slot_task_id, self._reclaim)
+
+    async def start(self, initial: Optional[int] = None):
+        """
+        并发启动工作进程，等待浏览器就绪
+
+        Args:
+            initial: 先启动的工作进程数（默认全部启动），其余在没有空闲进程时按需启动，最多 size 个
+        """
+        count = self.size if initial is None else max(1, min(initial, self.size))
+        # 第一个工作进程排队等待槽位，其余只使用空闲的槽位，不够时执行中再按需扩容
+        granted = 0
+        if self.slot_task_id is None or await slot_manager.acquire(self.slot_task_id):
+            granted = 1
+            while granted < count and self._try_slot():
+                granted += 1
+        if not granted:
+            self._last_error = '执行已取消'
+            return
+        if granted < count:
+            logger.info(f"本机执行槽位不足，先启动 {granted}/{count} 个浏览器工作进程")
+
+        workers = [BrowserWorker(next(self._worker_ids), self.browser_config) for _ in range(granted)]
+        self._starting = granted
+        await asyncio.gather(*[worker.start() for worker in workers])
+
+        for worker in workers:
+            if worker.ready:
+                self._workers.append(worker)
+                self._idle.put_nowait(worker)
+            else:
+                self._starting -= 1
+                self._last_error = worker.error
+                self._return_slot()
+
+        logger.info(f"浏览器工作进程池已启动，可用进程数: {len(self._workers)}/{granted}")
+
+    def _try_slot(self) -> bool:
+        return self.slot_task_id is None or slot_manager.try_acquire(self.slot_task_id)
+
+    def _return_slot(self):
+        if self.slot_task_id is not None:
+            slot_manager.release(self.slot_task_id)
+
+    async def _grow(self):
+        """没有空闲进程且未达到 size 时再启动一个工作进程；没有空闲槽位时排队，领到槽位后再启动"""
+        if self._terminated or self._starting >= self.size or not self._idle.empty():
+            return
+        if not self._try_slot():
+            if self._slot_request is None or self._slot_request.done():
+                self._slot_request = asyncio.create_task(self._grow_when_granted())
+            return
+        await self._start_worker()
+
+    async def _grow_when_granted(self):
+        if not await slot_manager.acquire(self.slot_task_id):
+            return
+        if self._terminated or self._starting >= self.size:
+            self._return_slot()
+            return
+        await self._start_worker()
+
+    async def _start_worker(self):
+        """启动一个工作进程（已为其领取槽位）"""
+        self._starting += 1
+        worker = BrowserWorker(next(self._worker_ids), self.browser_config)
+        try:
+            started = await worker.start()
+        except asyncio.CancelledError:
+            await worker.kill()
+            self._starting -= 1
+            self._return_slot()
+            raise
+        if started and not self._terminated:
+            self._workers.append(worker)
+            self._idle.put_nowait(worker)
+            logger.info(f"浏览器工作进程池扩容，进程数: {len(self._workers)}/{self.size}")
+        else:
+            self._starting -= 1
+            self._return_slot()
+            if worker.alive:
+                await worker.kill()
+
+    def _reclaim(self):
+        """其他测试单开始排队等待槽位时，结束超出份额的空闲工作进程"""
+        while not self._terminated and not self._idle.empty() and self._should_yield():
+            worker = self._idle.get_nowait()
+            if worker is None:
+                self._idle.put_nowait(None)
+                return
+            self._retire(worker)
+
+    def _should_yield(self) -> bool:
+        return (self.slot_task_id is not None and len(self._workers) > 1
+                and slot_manager.should_yield(self.slot_task_id, releasing=len(self._retiring)))
+
+    def _retire(self, worker: BrowserWorker):
+        """结束一个工作进程，浏览器退出后归还其槽位"""
+        self._workers.remove(worker)
+        self._starting -= 1
+        self._affinity = {key: value for key, value in self._affinity.items() if value is not worker}
+        task = asyncio.create_task(self._stop_and_return(worker))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+        logger.info(f"其他测试单等待执行槽位，结束空闲的浏览器工作进程: worker={worker.worker_id}")
+
+    async def _stop_and_return(self, worker: BrowserWorker):
+        try:
+            await worker.stop()
+        finally:
+            self._return_slot()
+
+    async def run_case(self, script_path: str, timeout: int = 300, attempt: int = 1,
+                       affinity: Optional[str] = None) -> Dict:
+        """
+        提交用例脚本并等待执行结果
+
+        Args:
+            script_path: 脚本文件路径
+            timeout: 单个用例超时时间（秒）
+            attempt: 第几次执行（失败重试时大于 1）
+            affinity: 分片键，优先交给上一次执行同一分片用例的工作进程（空闲时）
+
+        Returns:
+            执行结果字典，格式与 CaseExecutor.execute_case_script_async 一致
+        """
+        return await self._submit({'script_path': script_path, 'timeout': timeout, 'attempt': attempt}, affinity)
+
+    async def run_plan(self, plan_path: str, timeout: int = 300, attempt: int = 1,
+                       affinity: Optional[str] = None) -> Dict:
+        """
+        提交用例步骤计划（见 plan_runner.py）并等待执行结果
+
+        Args:
+            plan_path: 步骤计划文件路径
+            timeout: 单个用例超时时间（秒）
+            attempt: 第几次执行（失败重试时大于 1）
+            affinity: 分片键，见 run_case
+        """
+        return await self._submit({'plan_path': plan_path, 'timeout': timeout, 'attempt': attempt}, affinity)
+
+    async def _submit(self, job: Dict, affinity: Optional[str] = None) -> Dict:
+        """领取空闲工作进程执行任务"""
+        if not self._workers:
+            return {'status': 'failed', 'error': f'浏览器初始化失败: {self._last_error}'}
+
+        await self._grow()
+        worker = self._take_preferred(affinity) or await self._idle.get()
+        if worker is None:
+            # 所有工作进程均不可用，继续唤醒其他等待者
+            self._idle.put_nowait(None)
+            return {'status': 'failed', 'error': f'浏览器工作进程池不可用: {self._last_error}'}
+
+        if affinity is not None:
+            self._affinity[affinity] = worker
+        try:
+            return await worker.run(dict(job, job_id=next(self._job_ids)))
+        finally:
+            await self._release(worker)
+
+    def _take_preferred(self, affinity: Optional[str]) -> Optional[BrowserWorker]:
+        """上一次执行该分片的工作进程空闲时直接取出，否则返回 None（由调用方领取任意空闲进程）"""
+        preferred = self._affinity.get(affinity) if affinity is not None else None
+        if preferred is None or self._idle.empty():
+            return None
+        # 队列非空时没有等待者，取出再放回不会改变其他调用方的领取顺序
+        idle = [self._idle.get_nowait() for _ in range(self._idle.qsize())]
+        found = preferred in idle
+        for worker in idle:
+            if worker is not preferred:
+                self._idle.put_nowait(worker)
+        if not found:
+            return None
+        self.affinity_hits += 1
+        return preferred
+
+    async def _release(self, worker: BrowserWorker):
+        """归还工作进程；进程已退出则重新拉起"""
+        if self._terminated:
+            return
+        if self._should_yield():
+            self._retire(worker)
+            return
+        if not worker.alive:
+            if not await worker.start():
+                self._workers.remove(worker)
+                self._starting -= 1
+                self._last_error = worker.error
+                self._return_slot()
+                if not self._workers:
+                    self._idle.put_nowait(None)
+                return
+        self._idle.put_nowait(worker)
+
+    async def terminate(self):
+        """立即结束所有工作进程（取消执行时使用），正在执行的用例返回失败"""
+        self._terminated = True
+        self._last_error = '执行已取消'
+        await asyncio.gather(*[worker.kill() for worker in self._workers])
+        # 唤醒仍在等待空闲进程的调用方
+        self._idle.put_nowait(None)
+        logger.info("浏览器工作进程池已终止")
+
+    async def shutdown(self):
+        """停止所有工作进程，归还占用的槽位"""
+        self._terminated = True
+        if self._slot_request:
+            self._slot_request.cancel()
+            await asyncio.gather(self._slot_request, return_exceptions=True)
+        await asyncio.gather(*[worker.stop() for worker in self._workers], *self._retiring)
+        for _ in self._workers:
+            self._return_slot()
+        self._workers = []
+        if self.slot_task_id is not None:
+            slot_manager.unwatch(self.slot_task_id)
+        logger.info("浏览器工作进程池已关闭")
@@ -0,0 +1,95 @@
+"""
+浏览器工作进程（独立脚本）
+由 BrowserWorkerPool 以子进程方式启动，不依赖 app 包，避免在工作进程中重复加载整个 FastAPI 应用
+
+协议：
+    启动参数: 浏览器配置 JSON（browser / headless）
+    stdout 首行: {"type": "ready"} 或 {"type": "launch_failed", "error": "..."}
+    stdin 每行一个任务: {"job_id": 1, "script_path": "...", "timeout": 300, "attempt": 1}
+        步骤计划任务以 "plan_path" 代替 "script_path"，由 plan_runner 解释执行
+    stdout 每行一个结果: {"type": "result", "job_id": 1, "result": {...}}
+    stdin 关闭或收到空行时退出
+"""
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import sys
+
+import plan_runner
+
+
+def _load_case_module(script_path, job_id):
+    """以独立模块名加载用例脚本，避免不同用例之间的全局变量互相覆盖"""
+    spec = importlib.util.spec_from_file_location(f"_pool_case_{job_id}", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def run_job(browser, job):
+    """在预热的浏览器中执行单个用例脚本或步骤计划"""
+    stdout = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(stdout):
+            if 'plan_path' in job:
+                case_run = plan_runner.run_plan(browser, job['plan_path'], job.get('attempt', 1))
+            else:
+                module = _load_case_module(job['script_path'], job['job_id'])
+                case_run = module.run_case(browser, job.get('attempt', 1))
+            result = await asyncio.wait_for(case_run, timeout=job.get('timeout', 300))
+    except asyncio.TimeoutError:
+        timeout = job.get('timeout', 300)
+        result = {'status': 'failed', 'error': f'执行超时（{timeout} 秒）', 'timeout': timeout}
+    except SystemExit as e:
+        # 脚本内部调用了 sys.exit（如配置加载失败）
+        result = {'status': 'failed', 'error': f'脚本异常退出，退出码: {e.code}'}
+    except Exception as e:
+        result = {'status': 'failed', 'error': f"{type(e).__name__}: {str(e)}"}
+    result['stdout'] = stdout.getvalue()
+    return result
+
+
+def send(protocol_out, message):
+    protocol_out.write(json.dumps(message, ensure_ascii=False) + '\n')
+    protocol_out.flush()
+
+
+async def main(browser_config):
+    from playwright.async_api import async_playwright
+
+    protocol_out = sys.stdout
+    loop = asyncio.get_running_loop()
+
+    async def launch(p):
+        launcher = getattr(p, browser_config.get('browser', 'chromium'), None) or p.chromium
+        return await launcher.launch(headless=browser_config.get('headless', True))
+
+    async with async_playwright() as p:
+        try:
+            browser = await launch(p)
+        except Exception as e:
+            send(protocol_out, {'type': 'launch_failed', 'error': f"{type(e).__name__}: {str(e)}"})
+            return
+        send(protocol_out, {'type': 'ready'})
+
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line.strip():
+                break
+
+            job = json.loads(line)
+
+            # 浏览器崩溃后重新启动，保证后续用例可以继续执行
+            if not browser.is_connected():
+                browser = await launch(p)
+
+            result = await run_job(browser, job)
+            send(protocol_out, {'type': 'result', 'job_id': job['job_id'], 'result': result})
+
+        await browser.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(json.loads(sys.argv[1]) if len(sys.argv) > 1 else {}))
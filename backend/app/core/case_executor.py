@@ -2,28 +2,68 @@
 用例执行器
 负责执行单个用例脚本
 """
-import subprocess
+import asyncio
+import os
+import signal
 import sys
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Sequence
 
+from app.core.execution_queue import case_process_env
 from app.log import logger
 
 
+# 用例脚本（及其启动的 Playwright driver）在独立进程组中运行，结束时整组终止
+START_NEW_SESSION = os.name == 'posix'
+
+
+async def kill_process_tree(process: asyncio.subprocess.Process, grace: float = 3):
+    """
+    结束子进程及其进程组
+    
+    先发送 SIGTERM，让 Playwright driver 有机会关闭它启动的浏览器；
+    超过 grace 秒仍未退出则 SIGKILL
+    """
+    if process.returncode is not None:
+        return
+    if not START_NEW_SESSION:
+        process.kill()
+        await process.wait()
+        return
+    
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        await asyncio.wait_for(process.wait(), timeout=grace)
+    except ProcessLookupError:
+        pass
+    except asyncio.TimeoutError:
+        pass
+    try:
+        # 进程组内可能还有残留的子进程，统一清理
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await process.wait()
+
+
 class CaseExecutor:
     """
     用例执行器
-    使用 subprocess 执行独立脚本文件
+    使用 asyncio 子进程执行独立脚本文件
     """
     
-    def execute_case_script(self, script_path: str, work_dir: str, timeout: int = 300) -> Dict:
+    async def execute_case_script_async(self, script_path: str, work_dir: str, timeout: int = 300,
+                                        attempt: int = 1, control=None, args: Sequence[str] = ()) -> Dict:
         """
-        执行单个用例脚本（在独立进程中运行）
+        异步执行单个用例脚本（基于 asyncio 子进程，不阻塞事件循环）
         
         Args:
             script_path: 脚本文件路径
             work_dir: 工作目录
             timeout: 超时时间（秒）
+            attempt: 第几次执行，通过 CASE_ATTEMPT 环境变量传给脚本
+            control: 执行控制句柄（ExecutionControl），登记子进程以便取消时结束
+            args: 传给脚本的命令行参数（如 plan_runner.py 的步骤计划路径）
         
         Returns:
             执行结果字典
@@ -31,50 +71,60 @@ class CaseExecutor:
         try:
             logger.info(f"开始执行脚本: {script_path}")
             
-            # 执行脚本（script_path 是绝对路径，不需要设置 cwd）
-            process = subprocess.Popen(
-                [sys.executable, script_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, script_path, *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=case_process_env(CASE_ATTEMPT=str(attempt)),
+                start_new_session=START_NEW_SESSION
             )
+            if control:
+                control.register_process(process)
             
-            # 等待执行完成
             try:
-                stdout, stderr = process.communicate(timeout=timeout)
-                exit_code = process.returncode
-                
-                # 解析结果
-                if exit_code == 0:
-                    logger.info(f"脚本执行成功: {script_path}")
-                    return {'status': 'passed', 'exit_code': exit_code, 'stdout': stdout}
-                else:
-                    # 收集错误信息：优先使用 stderr，如果为空则使用 stdout 的最后几行
-                    error_msg = stderr.strip() if stderr.strip() else ''
-                    if not error_msg and stdout.strip():
-                        # 从 stdout 中提取错误信息（最后 10 行）
-                        stdout_lines = stdout.strip().split('\n')
-                        error_msg = '\n'.join(stdout_lines[-10:])
-                    
-                    if not error_msg:
-                        error_msg = f'脚本执行失败，退出码: {exit_code}'
-                    
-                    logger.warn(f"脚本执行失败: {script_path}, exit_code={exit_code}")
-                    logger.warn(f"错误信息:\n{error_msg}")
-                    
-                    return {
-                        'status': 'failed',
-                        'exit_code': exit_code,
-                        'stdout': stdout,
-                        'stderr': stderr,
-                        'error': error_msg
-                    }
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await kill_process_tree(process)
+                logger.error(f"脚本执行超时: {script_path}, 超时时间 {timeout} 秒")
+                return {'status': 'failed', 'error': f'执行超时（{timeout} 秒）', 'timeout': timeout}
+            finally:
+                if control:
+                    control.unregister_process(process)
             
-            except subprocess.TimeoutExpired:
-                process.kill()
-                logger.error(f"脚本执行超时: {script_path}")
-                return {'status': 'failed', 'error': '执行超时'}
+            return self._build_result(
+                script_path,
+                process.returncode,
+                stdout.decode('utf-8', errors='replace'),
+                stderr.decode('utf-8', errors='replace')
+            )
         
         except Exception as e:
             logger.error(f"脚本执行异常: {script_path}, {e}")
             return {'status': 'failed', 'error': str(e)}
+    
+    def _build_result(self, script_path: str, exit_code: int, stdout: str, stderr: str) -> Dict:
+        """根据退出码和输出构建执行结果"""
+        if exit_code == 0:
+            logger.info(f"脚本执行成功: {script_path}")
+            return {'status': 'passed', 'exit_code': exit_code, 'stdout': stdout}
+        
+        # 收集错误信息：优先使用 stderr，如果为空则使用 stdout 的最后几行
+        error_msg = stderr.strip() if stderr.strip() else ''
+        if not error_msg and stdout.strip():
+            # 从 stdout 中提取错误信息（最后 10 行）
+            stdout_lines = stdout.strip().split('\n')
+            error_msg = '\n'.join(stdout_lines[-10:])
+        
+        if not error_msg:
+            error_msg = f'脚本执行失败，退出码: {exit_code}'
+        
+        logger.warn(f"脚本执行失败: {script_path}, exit_code={exit_code}")
+        logger.warn(f"错误信息:\n{error_msg}")
+        
+        return {
+            'status': 'failed',
+            'exit_code': exit_code,
+            'stdout': stdout,
+            'stderr': stderr,
+            'error': error_msg
+        }
@@ -0,0 +1,127 @@
+"""
+用例历史耗时
+按用例最近若干次执行记录（test_ui_case_execution_records.duration）估算本次执行耗时，
+用于按最长耗时优先排序派发用例、预估测试单的总执行时长（makespan），以及计算每个用例的超时时间
+"""
+import heapq
+import math
+import statistics
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tortoise.expressions import Q
+
+from app.models.ui_test import TestUICaseExecutionRecord
+
+
+# 参与估算的最近执行次数
+DEFAULT_HISTORY_RUNS = 10
+
+# 估算使用的分位数（p75：偶发的慢执行不会拉高估算，又比中位数更保守）
+DEFAULT_PERCENTILE = 75
+
+# 没有任何历史记录时的默认估算耗时（秒）
+DEFAULT_CASE_DURATION = 60
+
+# 每次查询的用例数
+QUERY_BATCH_SIZE = 500
+
+# 超时的执行记录的错误信息前缀；超时记录的耗时是超时时间而不是用例的实际耗时，不参与估算
+TIMEOUT_ERROR = '执行超时'
+
+# 自适应超时：历史耗时 p99 × TIMEOUT_FACTOR，不低于 TIMEOUT_FLOOR 秒；
+# 历史记录少于 TIMEOUT_MIN_SAMPLES 次的用例使用配置的固定超时
+TIMEOUT_PERCENTILE = 99
+TIMEOUT_FACTOR = 3
+TIMEOUT_FLOOR = 30
+TIMEOUT_MIN_SAMPLES = 3
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """最近秩法分位数（q 取 0-100），values 为空时返回 0"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def simulate_makespan(durations: Iterable[float], workers: int, busy: Iterable[float] = ()) -> float:
+    """
+    按给定顺序派发到 workers 个并发槽位（空出即派发下一个）时的总执行时长
+
+    Args:
+        busy: 正在执行的用例的剩余耗时，各占一个槽位
+    """
+    slots = sorted(busy)[:max(1, workers)]
+    slots += [0.0] * (max(1, workers) - len(slots))
+    heapq.heapify(slots)
+    for duration in durations:
+        heapq.heapreplace(slots, slots[0] + duration)
+    return max(slots)
+
+
+class CaseDurationHistory:
+    """用例历史耗时估算"""
+
+    def __init__(self, history_runs: int = DEFAULT_HISTORY_RUNS, quantile: float = DEFAULT_PERCENTILE,
+                 default_duration: Optional[float] = None):
+        self.history_runs = max(1, history_runs)
+        self.quantile = quantile
+        self.default_duration = default_duration
+        self.history: Dict[int, List[int]] = {}
+
+    async def load(self, case_ids: List[int]):
+        """批量加载用例最近 history_runs 次执行的耗时（只统计有耗时、未超时的执行记录）"""
+        self.history = {}
+        unique_ids = list(dict.fromkeys(case_ids))
+        for offset in range(0, len(unique_ids), QUERY_BATCH_SIZE):
+            rows = await TestUICaseExecutionRecord.filter(
+                Q(error_message__isnull=True) | ~Q(error_message__startswith=TIMEOUT_ERROR),
+                test_case_id__in=unique_ids[offset:offset + QUERY_BATCH_SIZE],
+                duration__gt=0
+            ).order_by('-id').values_list('test_case_id', 'duration')
+            for case_id, duration in rows:
+                durations = self.history.setdefault(case_id, [])
+                if len(durations) < self.history_runs:
+                    durations.append(duration)
+        return self
+
+    @property
+    def known_cases(self) -> int:
+        return len(self.history)
+
+    def fallback_duration(self) -> float:
+        """没有历史记录的用例的估算耗时：配置值 > 已知用例估算的中位数 > DEFAULT_CASE_DURATION"""
+        if self.default_duration:
+            return self.default_duration
+        known = [percentile(durations, self.quantile) for durations in self.history.values()]
+        return statistics.median(known) if known else DEFAULT_CASE_DURATION
+
+    def estimates(self, case_ids: Iterable[int]) -> Dict[int, float]:
+        """用例ID -> 估算耗时（秒）"""
+        fallback = self.fallback_duration()
+        return {
+            case_id: percentile(self.history[case_id], self.quantile) if case_id in self.history else fallback
+            for case_id in case_ids
+        }
+
+    def timeouts(self, case_ids: Iterable[int], default: int, factor: float = TIMEOUT_FACTOR,
+                 floor: int = TIMEOUT_FLOOR, ceiling: Optional[int] = None,
+                 min_samples: int = TIMEOUT_MIN_SAMPLES) -> Dict[int, Tuple[int, str]]:
+        """
+        用例ID -> (超时时间（秒）, 依据)
+
+        历史记录不少于 min_samples 次的用例取 p99 × factor，限制在 [floor, ceiling] 之间（ceiling 默认为 default）；
+        其余用例使用 default
+        """
+        ceiling = ceiling or default
+        result = {}
+        for case_id in case_ids:
+            durations = self.history.get(case_id) or []
+            if len(durations) < min_samples:
+                result[case_id] = (default, f"历史记录 {len(durations)} 次，使用默认超时")
+                continue
+            p99 = percentile(durations, TIMEOUT_PERCENTILE)
+            timeout = int(min(ceiling, max(floor, math.ceil(p99 * factor))))
+            result[case_id] = (timeout, f"最近 {len(durations)} 次 p{TIMEOUT_PERCENTILE} {p99:g} 秒 × {factor:g}")
+        return result
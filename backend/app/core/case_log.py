@@ -0,0 +1,150 @@
+"""
+用例执行日志读取
+生成脚本和步骤计划执行器以 JSONL 事件流追加写入执行日志（logs/case_<用例ID>_<序号>.jsonl），
+每行一个事件：
+
+    {"event": "case_start", "time": ..., "case_info": {...}, "attempt": 1, "retry_count": 0}
+    {"event": "step", "step_number": 1, "action": ..., "status": ..., ...}
+    {"event": "screenshot", "path": ...}
+    {"event": "case_end", "time": ..., "duration": ..., "status": ..., "error_message": ...}
+
+每个事件只追加一行，写入量与步骤数成正比；进程在写入过程中崩溃时最多留下一行不完整的内容，
+读取时忽略没有换行符结尾的最后一行，已写入的事件仍可正常解析
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.log import logger
+
+
+LOG_SUFFIX = '.jsonl'
+
+EVENT_CASE_START = 'case_start'
+EVENT_STEP = 'step'
+EVENT_SCREENSHOT = 'screenshot'
+EVENT_CASE_END = 'case_end'
+
+# case_end 事件中的执行统计（计数字典），汇总到 execution_info 并由结果写入按测试单累加：
+# smart_wait 智能等待（steps/budget/waited 毫秒），blocked_requests 按拦截规则被拦截的请求数，
+# har HAR 回放/录制的用例数（replayed/recorded/discarded），screenshots 截图数、重复截图数、文件大小和截图耗时
+RUN_STATS = ('smart_wait', 'blocked_requests', 'har', 'screenshots')
+
+
+def read_events(log_path: Path, offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    从指定字节偏移量开始读取完整的事件行
+
+    Args:
+        log_path: 日志文件路径
+        offset: 读取偏移量（字节），应为上一次返回的偏移量
+
+    Returns:
+        (事件列表, 下次读取的偏移量)，偏移量只前进到最后一个完整行之后
+    """
+    with open(log_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    # 最后一行没有换行符说明仍在写入（或写入时进程崩溃），留到下次读取
+    complete = data[:data.rfind(b'\n') + 1]
+    events = []
+    for line in complete.splitlines():
+        if not line.strip():
+            continue
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            logger.warn(f"跳过无法解析的执行日志行: {log_path.name}")
+    return events, offset + len(complete)
+
+
+def summarize(events: List[Dict]) -> Optional[Dict]:
+    """
+    将事件流汇总为用例执行日志
+
+    Returns:
+        {'case_info', 'execution_info', 'steps', 'attempt', 'retry_count', 'screenshots'}，
+        没有 case_start 事件时返回 None；未执行完的用例 execution_info['end_time'] 为 None
+    """
+    log_data = None
+    for event in events:
+        event_type = event.get('event')
+        if event_type == EVENT_CASE_START:
+            log_data = {
+                'case_info': event['case_info'],
+                'execution_info': {
+                    'start_time': event['time'],
+                    'end_time': None,
+                    'duration': 0,
+                    'status': '执行中',
+                    'error_message': None,
+                    'trace_path': None
+                },
+                'steps': [],
+                'attempt': event.get('attempt', 1),
+                'retry_count': event.get('retry_count', 0),
+                'screenshots': []
+            }
+        elif log_data is None:
+            continue
+        elif event_type == EVENT_STEP:
+            step = {key: value for key, value in event.items() if key != 'event'}
+            log_data['steps'].append(step)
+            if step.get('screenshot_path'):
+                log_data['screenshots'].append(step['screenshot_path'])
+        elif event_type == EVENT_SCREENSHOT:
+            log_data['screenshots'].append(event['path'])
+        elif event_type == EVENT_CASE_END:
+            log_data['execution_info'].update(
+                end_time=event['time'],
+                duration=event.get('duration', 0),
+                status=event['status'],
+                error_message=event.get('error_message'),
+                trace_path=event.get('trace_path')
+            )
+            for key in RUN_STATS:
+                if event.get(key):
+                    log_data['execution_info'][key] = event[key]
+    return log_data
+
+
+def close_case_log(log_path: Path, status: str, error_message: str) -> bool:
+    """
+    为未执行完（进程被超时结束）的用例日志补写 case_end 事件，使其生成执行记录
+
+    Returns:
+        是否写入；日志不存在、没有开始记录或已结束时不写入
+    """
+    log_data = load_case_log(log_path)
+    if not log_data or log_data['execution_info'].get('end_time'):
+        return False
+    end_time = datetime.now()
+    start_time = datetime.strptime(log_data['execution_info']['start_time'], '%Y-%m-%d %H:%M:%S')
+    event = {
+        'event': EVENT_CASE_END,
+        'time': end_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'duration': int((end_time - start_time).total_seconds()),
+        'status': status,
+        'error_message': error_message
+    }
+    with open(log_path, 'rb+') as f:
+        # 进程在写入过程中被结束时最后一行不完整，另起一行写入
+        f.seek(0, 2)
+        if f.tell():
+            f.seek(-1, 2)
+            prefix = b'' if f.read(1) == b'\n' else b'\n'
+        else:
+            prefix = b''
+        f.write(prefix + (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+    return True
+
+
+def load_case_log(log_path: Path) -> Optional[Dict]:
+    """读取并汇总整个执行日志文件，文件不存在或没有 case_start 事件时返回 None"""
+    try:
+        events, _ = read_events(log_path)
+    except FileNotFoundError:
+        return None
+    return summarize(events)
@@ -0,0 +1,634 @@
+"""
+用例执行运行时（独立模块）
+生成的用例脚本和步骤计划执行器（plan_runner.py）共用的执行逻辑：执行日志、测试用户和登录态复用、请求拦截、
+HAR 录制与回放、失败 trace、截图和步骤等待。用例脚本只包含步骤代码，其余都由本模块完成，
+两种执行方式的日志格式和行为保持一致
+
+不依赖 app 包：生成脚本时复制到工作目录的 scripts/ 下，与用例脚本一起执行（执行代理上同样随脚本下发）；
+浏览器工作进程和 plan_runner 从 app/core 目录直接导入
+"""
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+import traceback
+from datetime import datetime, timedelta
+from fnmatch import fnmatch
+from urllib.parse import urlparse
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时 webp 截图改用 jpeg
+    Image = None
+
+# 未配置权限角色的用例使用的登录态键（与 auth_state_manager.DEFAULT_AUTH_ROLE 一致）
+DEFAULT_AUTH_ROLE = '_default'
+
+# 环境变量配置
+DEBUG = os.getenv('DEBUG', '0') == '1'
+HEADLESS = os.getenv('HEADLESS', '1') == '1'
+SLOW_MO = int(os.getenv('SLOW_MO', '0'))
+ATTEMPT = int(os.getenv('CASE_ATTEMPT', '1'))
+
+
+# ==================== 日志记录 ====================
+
+class ExecutionLogger:
+    """
+    执行日志记录器
+
+    以 JSONL 事件流追加写入（用例开始、每个步骤一行、用例结束），
+    每个事件只写一行，进程中途崩溃时已写入的事件仍可解析
+    """
+
+    def __init__(self, log_path, case_info, attempt=1):
+        """
+        Args:
+            log_path: 日志文件路径（工作目录/logs/case_<用例ID>_<序号>.jsonl）
+            case_info: 用例信息 {'id', 'name', 'priority', 'module'}
+            attempt: 第几次执行（失败重试时大于 1）
+        """
+        self.log_path = log_path
+        self.case_info = {
+            "case_id": case_info['id'],
+            "case_name": case_info['name'],
+            "priority": case_info['priority'],
+            "module": case_info['module']
+        }
+        self.attempt = attempt
+        self.start_time = None
+        self.status = None
+        # HAR 模式（replay/record），由 CaseRun.use_har 设置
+        self.har_mode = None
+        # 截图服务，由 CaseRun 设置
+        self.screenshots = None
+        # 智能等待统计：等待次数、原固定等待总时长和实际等待总时长（毫秒）
+        self.wait_stats = {'steps': 0, 'budget': 0, 'waited': 0}
+        # 被拦截的请求数（按规则）
+        self.block_stats = {}
+
+    def start_execution(self):
+        """记录执行开始（覆盖同名的旧日志）"""
+        self.start_time = datetime.now()
+        os.makedirs(self.log_path.parent, exist_ok=True)
+        self._write_event({
+            "event": "case_start",
+            "time": self.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "case_info": self.case_info,
+            "attempt": self.attempt,
+            "retry_count": self.attempt - 1
+        }, mode='w')
+
+    def end_execution(self, status, error_message=None, trace_path=None):
+        """记录执行结束（附带本次执行的统计和失败 trace 路径）"""
+        end_time = datetime.now()
+        self.status = status
+        self._write_event({
+            "event": "case_end",
+            "time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration": int((end_time - self.start_time).total_seconds()),
+            "status": status,
+            "error_message": error_message,
+            "trace_path": trace_path,
+            "smart_wait": dict(self.wait_stats) if self.wait_stats['steps'] else None,
+            "blocked_requests": dict(self.block_stats) or None,
+            "har": self.har_stats(status),
+            "screenshots": self.screenshots.summary() if self.screenshots else None
+        })
+
+    def log_step(self, step_number, action, description, status, duration, error_message=None,
+                 screenshot_path=None, step_start_time=None):
+        """记录步骤执行（没有传入开始时间时通过 duration 回推）"""
+        end_time = datetime.now()
+        start_time = step_start_time or end_time - timedelta(milliseconds=duration)
+
+        self._write_event({
+            "event": "step",
+            "step_number": step_number,
+            "action": action,
+            "description": description,
+            "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "end_time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration": duration,
+            "status": status,
+            "error_message": error_message,
+            "screenshot_path": screenshot_path
+        })
+
+    def har_stats(self, status):
+        """执行日志中的 HAR 统计"""
+        if self.har_mode == 'replay':
+            return {'replayed': 1}
+        if self.har_mode == 'record':
+            return {'recorded': 1} if status == "通过" else {'discarded': 1}
+        return None
+
+    def add_screenshot(self, screenshot_path):
+        """记录不属于某个步骤的截图（如失败截图）"""
+        self._write_event({"event": "screenshot", "path": screenshot_path})
+
+    def _write_event(self, event, mode='a'):
+        """追加写入一行事件（整行一次写入，读取方忽略没有换行符结尾的不完整行）"""
+        with open(self.log_path, mode, encoding='utf-8') as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+# ==================== 配置加载 ====================
+
+def load_config(work_dir):
+    """加载工作目录下的配置文件"""
+    with open(work_dir / 'config.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ==================== 测试用户与登录态缓存 ====================
+
+def resolve_test_user(config, role_name):
+    """按用例的权限角色选择测试用户，没有对应用户时回退到环境变量中的默认用户"""
+    if role_name and role_name in config.get('test_users', {}):
+        return role_name, config['test_users'][role_name]
+    env_vars = config.get('environment_variables', {})
+    return DEFAULT_AUTH_ROLE, {
+        'username': env_vars.get('admin_username'),
+        'password': env_vars.get('admin_password')
+    }
+
+
+def get_auth_cache(config, auth_role, work_dir):
+    """
+    获取角色的登录态缓存配置
+
+    Returns:
+        (auth_cache, state_path)，未启用或该角色没有预登录时返回 (None, None)
+    """
+    auth_cache = config['execute_config'].get('auth_cache') or {}
+    state = config.get('auth_states', {}).get(auth_role)
+    if not auth_cache.get('enabled') or not state:
+        return None, None
+    return auth_cache, work_dir / state['path']
+
+
+def is_auth_state_valid(auth_cache, state_path):
+    """登录态文件存在且未过期"""
+    if not auth_cache or not state_path.exists():
+        return False
+    return time.time() - state_path.stat().st_mtime < auth_cache.get('ttl', 1800)
+
+
+async def save_auth_state(context, state_path, case_id):
+    """保存登录态（先写临时文件再替换，避免并发执行的用例读到不完整的文件）"""
+    tmp_path = state_path.with_name(f"{state_path.name}.{os.getpid()}_{case_id}.tmp")
+    await context.storage_state(path=str(tmp_path))
+    os.replace(tmp_path, state_path)
+
+
+async def perform_login(page, auth_cache, test_user):
+    """按登录态缓存配置执行一次 UI 登录"""
+    await page.goto(auth_cache['login_url'])
+    await page.fill(auth_cache['username_selector'], test_user['username'])
+    await page.fill(auth_cache['password_selector'], test_user['password'])
+    await page.click(auth_cache['submit_selector'])
+    if auth_cache.get('logged_in_selector'):
+        await page.wait_for_selector(auth_cache['logged_in_selector'])
+    else:
+        await page.wait_for_load_state('networkidle')
+
+
+async def is_logged_out(page, auth_cache):
+    """检测当前页面是否已退出登录（被重定向回登录页）"""
+    from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+    if auth_cache.get('logged_in_selector'):
+        try:
+            await page.wait_for_selector(auth_cache['logged_in_selector'], timeout=5000)
+            return False
+        except PlaywrightTimeout:
+            return True
+    await page.wait_for_load_state('networkidle')
+    return await page.is_visible(auth_cache['password_selector'])
+
+
+# ==================== 请求拦截 ====================
+
+# 按资源类型拦截的规则
+BLOCK_RESOURCE_TYPES = {
+    'media': {'image', 'media'},
+    'fonts': {'font'}
+}
+
+
+def blocking_rules(config, case_id):
+    """
+    用例生效的拦截规则（execute_config.block_resources）
+
+    Returns:
+        (profiles, patterns, first_party)；用例在某个规则的 opt_out 名单中时不启用该规则
+    """
+    block = config['execute_config'].get('block_resources') or {}
+    opt_out = block.get('opt_out') or {}
+    profiles = list(block.get('profiles') or [])
+    if block.get('patterns'):
+        profiles.append('custom')
+    profiles = [profile for profile in profiles if case_id not in opt_out.get(profile, [])]
+    # 被测系统的域名：环境变量中的地址 + allowed_domains，其余域名视为第三方
+    first_party = {
+        urlparse(value).hostname for value in config.get('environment_variables', {}).values()
+        if isinstance(value, str) and value.startswith(('http://', 'https://'))
+    }
+    first_party.update(block.get('allowed_domains') or [])
+    first_party.discard(None)
+    return profiles, block.get('patterns') or [], first_party
+
+
+def blocked_by(request, profiles, patterns, first_party):
+    """请求命中的拦截规则，不拦截时返回 None"""
+    for profile in profiles:
+        if profile in BLOCK_RESOURCE_TYPES:
+            if request.resource_type in BLOCK_RESOURCE_TYPES[profile]:
+                return profile
+        elif profile == 'third_party':
+            # 只拦截第三方的子资源，不拦截页面导航（如单点登录跳转）
+            host = urlparse(request.url).hostname or ''
+            if request.resource_type != 'document' and first_party and not any(
+                host == domain or host.endswith('.' + domain) for domain in first_party
+            ):
+                return profile
+        elif profile == 'custom':
+            if any(fnmatch(request.url, pattern) for pattern in patterns):
+                return profile
+    return None
+
+
+async def block_resources(context, config, case_id, stats):
+    """按配置拦截请求，被拦截的请求数累计到 stats"""
+    profiles, patterns, first_party = blocking_rules(config, case_id)
+    if not profiles:
+        return
+
+    async def handle(route):
+        profile = blocked_by(route.request, profiles, patterns, first_party)
+        if profile is None:
+            await route.fallback()
+            return
+        stats[profile] = stats.get(profile, 0) + 1
+        await route.abort('blockedbyclient')
+
+    await context.route('**/*', handle)
+
+
+# ==================== 截图工具 ====================
+
+SCREENSHOT_EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'webp': 'webp'}
+
+
+class ScreenshotService:
+    """
+    截图服务（execute_config.screenshot）
+
+    - 格式 jpeg（默认）/webp/png，默认只截取视口；webp 由 PNG 转换，需要 Pillow
+    - 页面上只截取图像数据，编码和写文件在线程中执行，不阻塞后续步骤
+    - 同一次执行中内容相同的截图只保存一次，文件名包含执行次数和序号，不会互相覆盖
+    """
+
+    def __init__(self, work_dir, case_id, execute_config, attempt):
+        options = execute_config.get('screenshot') or {}
+        self.screenshot_dir = work_dir / 'screenshots'
+        self.work_dir = work_dir
+        self.case_id = case_id
+        self.format = options.get('format', 'jpeg')
+        if self.format not in SCREENSHOT_EXTENSIONS or (self.format == 'webp' and Image is None):
+            self.format = 'jpeg'
+        self.quality = options.get('quality', 70)
+        self.full_page = options.get('full_page', False)
+        self.timeout = options.get('timeout', 5000)
+        self.attempt = attempt
+        self.saved = {}
+        self.writes = []
+        self.sequence = 0
+        self.failure_captured = False
+        self.stats = {'count': 0, 'deduped': 0, 'bytes': 0, 'capture_ms': 0}
+
+    async def take(self, page, step_number, failure=False):
+        """截图并返回相对工作目录的路径；截图失败时返回 None，不影响步骤的错误信息"""
+        started = time.monotonic()
+        try:
+            if self.format == 'jpeg':
+                data = await page.screenshot(type='jpeg', quality=self.quality,
+                                             full_page=self.full_page, timeout=self.timeout)
+            else:
+                data = await page.screenshot(type='png', full_page=self.full_page, timeout=self.timeout)
+        except Exception as e:
+            print(f"  截图失败: {type(e).__name__}: {e}")
+            return None
+        finally:
+            self.stats['capture_ms'] += int((time.monotonic() - started) * 1000)
+        self.failure_captured = self.failure_captured or failure
+
+        digest = hashlib.sha1(data).hexdigest()
+        if digest in self.saved:
+            self.stats['deduped'] += 1
+            return self.saved[digest]
+        self.sequence += 1
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        filename = (f"case_{self.case_id:03d}_a{self.attempt}_step_{step_number:03d}_{timestamp}_"
+                    f"{self.sequence:02d}.{SCREENSHOT_EXTENSIONS[self.format]}")
+        screenshot_path = self.screenshot_dir / filename
+        self.saved[digest] = str(screenshot_path.relative_to(self.work_dir))
+        self.writes.append(asyncio.create_task(asyncio.to_thread(self._write, screenshot_path, data)))
+        return self.saved[digest]
+
+    def _write(self, screenshot_path, data):
+        if self.format == 'webp':
+            with Image.open(io.BytesIO(data)) as image:
+                buffer = io.BytesIO()
+                image.save(buffer, format='WEBP', quality=self.quality)
+                data = buffer.getvalue()
+        os.makedirs(self.screenshot_dir, exist_ok=True)
+        screenshot_path.write_bytes(data)
+        return len(data)
+
+    async def flush(self):
+        """等待截图全部写入文件"""
+        for size in await asyncio.gather(*self.writes, return_exceptions=True):
+            if isinstance(size, Exception):
+                print(f"  保存截图失败: {size}")
+                continue
+            self.stats['count'] += 1
+            self.stats['bytes'] += size
+        self.writes = []
+
+    def summary(self):
+        return dict(self.stats) if self.stats['count'] or self.stats['deduped'] else None
+
+
+# ==================== 单个用例的执行上下文 ====================
+
+# 智能等待时需要等待元素的动作及元素应处于的状态
+ELEMENT_WAIT_STATES = {
+    'click': 'visible', 'type': 'visible', 'select': 'visible', 'hover': 'visible', 'clear': 'visible',
+    'wait_for_element': 'visible', 'assert_exists': 'visible', 'assert_text': 'attached'
+}
+
+
+class CaseRun:
+    """一次用例执行的上下文：浏览器上下文和页面、配置、测试用户、日志和本次执行的统计"""
+
+    def __init__(self, work_dir, case_info, role, config, logger):
+        self.work_dir = work_dir
+        self.case_id = case_info['id']
+        self.config = config
+        self.execute_config = config['execute_config']
+        self.logger = logger
+        self.auth_role, self.test_user = resolve_test_user(config, role)
+        self.auth_cache, self.auth_state_path = get_auth_cache(config, self.auth_role, work_dir)
+        # 登录态缓存：优先复用调度器预登录保存的 storage_state
+        self.auth_restored = is_auth_state_valid(self.auth_cache, self.auth_state_path)
+        self.context = None
+        self.page = None
+        self.last_url = None
+        self.har_recording = None
+        self.har_target = None
+        self.tracing = False
+        self.screenshots = ScreenshotService(work_dir, self.case_id, self.execute_config, logger.attempt)
+        logger.screenshots = self.screenshots
+
+    async def open(self, browser):
+        """创建独立的浏览器上下文和页面，按配置启用 HAR、请求拦截和 trace"""
+        self.context = await browser.new_context(
+            viewport=self.execute_config.get('viewport', {'width': 1920, 'height': 1080}),
+            storage_state=str(self.auth_state_path) if self.auth_restored else None
+        )
+        await self.use_har()
+        await block_resources(self.context, self.config, self.case_id, self.logger.block_stats)
+        self.tracing = await self.start_trace()
+        self.page = await self.context.new_page()
+        self.page.set_default_timeout(self.execute_config.get('timeout', 30000))
+
+    async def close(self):
+        """关闭浏览器上下文（HAR 在此时写入文件）"""
+        await self.context.close()
+        self.save_har()
+
+    async def take_screenshot(self, step_number, failure=False):
+        """截取屏幕截图（步骤失败时 failure=True），返回相对工作目录的路径"""
+        return await self.screenshots.take(self.page, step_number, failure)
+
+    async def step_wait(self, action, selector, wait_time):
+        """
+        步骤的等待时间（毫秒）
+
+        wait_mode='smart' 时改为条件等待，wait_time 为上限：上一个步骤后页面 URL 发生变化时先等待新页面 domcontentloaded，
+        元素操作再等待元素可见，其他动作等待 networkidle；条件满足立即继续，到达上限仍未满足时照常执行步骤
+        """
+        from playwright.async_api import TimeoutError as PlaywrightTimeout
+
+        wait_time = float(wait_time or 0)
+        if wait_time <= 0:
+            return
+        if self.execute_config.get('wait_mode', 'fixed') != 'smart':
+            await self.page.wait_for_timeout(wait_time)
+            return
+
+        page = self.page
+        started = time.monotonic()
+
+        def remaining():
+            # Playwright 的 timeout=0 表示不限时，至少保留 1 毫秒
+            return max(1, wait_time - (time.monotonic() - started) * 1000)
+
+        try:
+            if page.url != self.last_url:
+                await page.wait_for_load_state('domcontentloaded', timeout=remaining())
+            state = ELEMENT_WAIT_STATES.get(action)
+            if selector and state:
+                await page.wait_for_selector(selector, state=state, timeout=remaining())
+            else:
+                await page.wait_for_load_state('networkidle', timeout=remaining())
+        except PlaywrightTimeout:
+            pass
+        self.last_url = page.url
+        stats = self.logger.wait_stats
+        stats['steps'] += 1
+        stats['budget'] += int(wait_time)
+        stats['waited'] += min(int(wait_time), int((time.monotonic() - started) * 1000))
+
+    async def restore_session(self):
+        """使用缓存的登录态进入系统；检测到登录已失效时重新登录并刷新缓存"""
+        page, auth_cache = self.page, self.auth_cache
+        landing_url = auth_cache.get('landing_url') or auth_cache['login_url']
+        await page.goto(landing_url)
+        if await is_logged_out(page, auth_cache):
+            print("  登录态已失效，重新登录并刷新缓存")
+            await perform_login(page, auth_cache, self.test_user)
+            await self.save_auth_state()
+            if auth_cache.get('landing_url'):
+                await page.goto(landing_url)
+
+    async def save_auth_state(self):
+        """登录后刷新缓存的登录态，供其他用例使用"""
+        await save_auth_state(self.context, self.auth_state_path, self.case_id)
+
+    async def use_har(self):
+        """
+        network_mode=record/replay 时按用例录制或回放 HAR（config['har']）
+
+        已有 HAR 且不在 refresh 名单中时回放，否则录制到工作目录，用例通过后由 save_har 保存
+        """
+        har = self.config.get('har')
+        if not har:
+            return
+        target = self.work_dir / har['dir'] / f"case_{self.case_id}.har"
+        if har['mode'] == 'replay' and target.exists() and self.case_id not in har['refresh']:
+            await self.context.route_from_har(target, url=har['url'], not_found=har['not_found'])
+            self.logger.har_mode = 'replay'
+            return
+        recording = self.work_dir / 'har' / f"{self.logger.log_path.stem}.har"
+        os.makedirs(recording.parent, exist_ok=True)
+        await self.context.route_from_har(recording, url=har['url'], update=True)
+        self.logger.har_mode = 'record'
+        self.har_recording, self.har_target = recording, target
+
+    def save_har(self):
+        """context 关闭时 HAR 才写入文件：用例通过时保存为该用例的 HAR，失败时丢弃"""
+        if self.logger.har_mode != 'record' or not self.har_recording.exists():
+            return
+        if self.logger.status == "通过":
+            os.makedirs(self.har_target.parent, exist_ok=True)
+            shutil.move(str(self.har_recording), str(self.har_target))
+        else:
+            self.har_recording.unlink()
+
+    async def start_trace(self):
+        """
+        trace='on_failure' 时每次执行都记录 Playwright trace（截图和 DOM 快照），'on_retry' 时只在失败重试时记录
+
+        Returns:
+            是否开始记录
+        """
+        mode = self.execute_config.get('trace', 'off')
+        if mode != 'on_failure' and not (mode == 'on_retry' and self.logger.attempt > 1):
+            return False
+        await self.context.tracing.start(screenshots=True, snapshots=True)
+        return True
+
+    async def stop_trace(self, passed):
+        """停止记录：用例通过时丢弃，失败时保存并返回相对工作目录的路径"""
+        if not self.tracing:
+            return None
+        try:
+            if passed:
+                await self.context.tracing.stop()
+                return None
+            trace_path = self.work_dir / 'traces' / f"{self.logger.log_path.stem}_a{self.logger.attempt}.zip"
+            os.makedirs(trace_path.parent, exist_ok=True)
+            await self.context.tracing.stop(path=str(trace_path))
+            return str(trace_path.relative_to(self.work_dir))
+        except Exception as e:
+            print(f"  保存 trace 失败: {type(e).__name__}: {e}")
+            return None
+
+
+# ==================== 执行入口 ====================
+
+async def run_case(browser, work_dir, case_info, role, log_path, steps, attempt=1):
+    """
+    在给定的浏览器中执行一个用例
+
+    每次执行都会创建独立的 BrowserContext，执行结束后关闭；
+    浏览器本身由调用方管理，可被常驻的浏览器工作进程复用
+
+    Args:
+        browser: 已启动的浏览器
+        work_dir: 工作目录（包含 config.json）
+        case_info: 用例信息 {'id', 'name', 'priority', 'module'}
+        role: 用例的权限角色（没有对应测试用户时使用默认用户）
+        log_path: 执行日志路径
+        steps: 执行用例步骤的协程函数 steps(run)，步骤失败时抛出异常
+        attempt: 第几次执行（1 为首次执行，大于 1 为失败重试）
+
+    Returns:
+        执行结果字典 {'status': 'passed'/'failed', 'error': ...}
+    """
+    logger = ExecutionLogger(log_path, case_info, attempt)
+    logger.start_execution()
+
+    try:
+        config = load_config(work_dir)
+    except Exception as e:
+        error_msg = f"加载配置文件失败: {e}"
+        logger.end_execution("失败", error_msg)
+        print(f"✗ {error_msg}")
+        return {'status': 'failed', 'error': error_msg}
+
+    run = CaseRun(work_dir, case_info, role, config, logger)
+    await run.open(browser)
+
+    try:
+        await steps(run)
+        await run.screenshots.flush()
+        await run.stop_trace(True)
+        logger.end_execution("通过")
+        print(f"✓ 用例执行成功: {case_info['name']}")
+        return {'status': 'passed'}
+
+    except Exception as step_error:
+        error_msg = f"{type(step_error).__name__}: {str(step_error)}"
+
+        # 失败截图（失败的步骤已截图时不再重复截图）
+        if run.execute_config.get('auto_screenshot', True) and not run.screenshots.failure_captured:
+            screenshot_path = await run.take_screenshot(999, failure=True)
+            if screenshot_path:
+                logger.add_screenshot(screenshot_path)
+        await run.screenshots.flush()
+        logger.end_execution("失败", error_msg, await run.stop_trace(False))
+
+        print(f"✗ 用例执行失败: {case_info['name']}")
+        print(f"  错误信息: {error_msg}")
+        if DEBUG:
+            traceback.print_exc()
+        return {'status': 'failed', 'error': error_msg}
+
+    finally:
+        await run.close()
+
+
+async def launch_browser(p, execute_config, headless=True, slow_mo=0):
+    """按配置启动浏览器"""
+    launcher = getattr(p, execute_config.get('browser', 'chromium'), None) or p.chromium
+    return await launcher.launch(headless=headless, slow_mo=slow_mo)
+
+
+async def run_standalone(work_dir, case_info, log_path, run):
+    """
+    独立执行入口：自行启动浏览器执行用例，进程退出码 0 表示通过
+
+    Args:
+        run: 在给定浏览器中执行用例的协程函数 run(browser, attempt)
+    """
+    from playwright.async_api import async_playwright
+
+    try:
+        execute_config = load_config(work_dir)['execute_config']
+        async with async_playwright() as p:
+            browser = await launch_browser(p, execute_config, headless=HEADLESS and not DEBUG, slow_mo=SLOW_MO)
+            try:
+                result = await run(browser, ATTEMPT)
+            finally:
+                await browser.close()
+
+    except Exception as e:
+        # 浏览器启动失败
+        error_msg = f"浏览器初始化失败: {str(e)}"
+        logger = ExecutionLogger(log_path, case_info, ATTEMPT)
+        logger.start_execution()
+        logger.end_execution("失败", error_msg)
+        print(f"✗ {error_msg}")
+        if DEBUG:
+            traceback.print_exc()
+        sys.exit(1)
+
+    sys.exit(0 if result['status'] == 'passed' else 1)
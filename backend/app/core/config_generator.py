@@ -54,32 +54,10 @@ class ConfigGenerator:
                 'environment_variables': self._get_environment_variables(task.environment)
             }
             
-            # 确保 execute_config 包含必要的默认值
-            if 'browser' not in config['execute_config']:
-                config['execute_config']['browser'] = 'chromium'
-            if 'headless' not in config['execute_config']:
-                config['execute_config']['headless'] = True
-            if 'timeout' not in config['execute_config']:
-                config['execute_config']['timeout'] = 30000  # 默认 30 秒
-            else:
-                # 将用户设置的超时时间（秒）转换为毫秒
-                timeout_value = config['execute_config']['timeout']
-                if isinstance(timeout_value, (int, float)) and timeout_value < 1000:
-                    # 如果值小于 1000，认为是秒，需要转换为毫秒
-                    config['execute_config']['timeout'] = int(timeout_value * 1000)
-            if 'continue_on_failure' not in config['execute_config']:
-                config['execute_config']['continue_on_failure'] = True
-            if 'retry_count' not in config['execute_config']:
-                config['execute_config']['retry_count'] = 2
-            if 'auto_screenshot' not in config['execute_config']:
-                config['execute_config']['auto_screenshot'] = True
-            if 'viewport' not in config['execute_config']:
-                config['execute_config']['viewport'] = {'width': 1920, 'height': 1080}
+            self._apply_defaults(config['execute_config'])
             
             # 4. 写入配置文件
-            config_path = work_dir / 'config.json'
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            config_path = self.write_config(config, work_dir)
             
             logger.info(f"配置文件生成成功: {config_path}")
             return config
@@ -88,6 +66,56 @@ class ConfigGenerator:
             logger.error(f"生成配置文件失败: {e}")
             raise
     
+    async def build_debug_config(self, case_ids: List[int], environment: str) -> Dict:
+        """
+        生成本地调试用的配置（不关联测试单，不写入文件），随导出的用例脚本一起下载
+        
+        Args:
+            case_ids: 用例ID列表
+            environment: 测试环境
+        
+        Returns:
+            配置数据字典（执行配置使用默认值）
+        """
+        role_names = await self._collect_role_names(case_ids)
+        return {
+            'task_info': {'environment': environment},
+            'execute_config': self._apply_defaults({}),
+            'test_users': await self._load_test_users(role_names, environment),
+            'environment_variables': self._get_environment_variables(environment)
+        }
+    
+    def _apply_defaults(self, execute_config: Dict) -> Dict:
+        """确保 execute_config 包含必要的默认值"""
+        if 'browser' not in execute_config:
+            execute_config['browser'] = 'chromium'
+        if 'headless' not in execute_config:
+            execute_config['headless'] = True
+        if 'timeout' not in execute_config:
+            execute_config['timeout'] = 30000  # 默认 30 秒
+        else:
+            # 将用户设置的超时时间（秒）转换为毫秒
+            timeout_value = execute_config['timeout']
+            if isinstance(timeout_value, (int, float)) and timeout_value < 1000:
+                # 如果值小于 1000，认为是秒，需要转换为毫秒
+                execute_config['timeout'] = int(timeout_value * 1000)
+        if 'continue_on_failure' not in execute_config:
+            execute_config['continue_on_failure'] = True
+        if 'retry_count' not in execute_config:
+            execute_config['retry_count'] = 2
+        if 'auto_screenshot' not in execute_config:
+            execute_config['auto_screenshot'] = True
+        if 'viewport' not in execute_config:
+            execute_config['viewport'] = {'width': 1920, 'height': 1080}
+        return execute_config
+    
+    def write_config(self, config: Dict, work_dir: Path) -> Path:
+        """将配置数据写入工作目录下的 config.json"""
+        config_path = work_dir / 'config.json'
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        return config_path
+    
     async def _collect_role_names(self, case_ids: List[int]) -> Set[str]:
         """收集所有用例的权限角色"""
         permissions = await TestUICasePermission.filter(
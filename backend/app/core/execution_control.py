@@ -0,0 +1,106 @@
+"""
+执行控制通道
+登记正在运行的测试单调度器（按 task_id），供取消/暂停/继续接口与调度器通信：
+调度器在用例之间检查控制状态，取消时结束正在执行的用例进程树
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from app.core.case_executor import kill_process_tree
+from app.log import logger
+
+
+class ExecutionControl:
+    """单个测试单的执行控制句柄"""
+
+    def __init__(self, task_id: int):
+        self.task_id = task_id
+        self.cancelled = False
+        self._running = asyncio.Event()
+        self._running.set()
+        self._cancel_event = asyncio.Event()
+        self._processes: Set[asyncio.subprocess.Process] = set()
+        self._cancel_callbacks: List[Callable[[], Awaitable[None]]] = []
+        # 剩余时间预估（TaskEta），调度器在每个用例完成时更新，进度接口读取
+        self.eta = None
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def pause(self):
+        """暂停：正在执行的用例继续跑完，之后不再派发新用例"""
+        self._running.clear()
+        logger.info(f"测试单已暂停派发: task_id={self.task_id}")
+
+    def resume(self):
+        """继续派发用例"""
+        self._running.set()
+        logger.info(f"测试单继续派发: task_id={self.task_id}")
+
+    async def cancel(self):
+        """取消：停止派发，并结束所有正在执行的用例进程树"""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self._cancel_event.set()
+        # 唤醒处于暂停等待中的派发协程，让它们看到取消状态后退出
+        self._running.set()
+
+        processes = list(self._processes)
+        await asyncio.gather(*[kill_process_tree(process) for process in processes])
+        for callback in self._cancel_callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"执行取消回调失败: task_id={self.task_id}, {e}")
+        logger.info(f"测试单已取消: task_id={self.task_id}, 结束进程数: {len(processes)}")
+
+    async def wait_until_runnable(self) -> bool:
+        """暂停时阻塞等待；返回 False 表示已取消，不应再派发用例"""
+        await self._running.wait()
+        return not self.cancelled
+
+    async def sleep(self, seconds: float):
+        """可被取消打断的等待"""
+        try:
+            await asyncio.wait_for(self._cancel_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def register_process(self, process: asyncio.subprocess.Process):
+        self._processes.add(process)
+
+    def unregister_process(self, process: asyncio.subprocess.Process):
+        self._processes.discard(process)
+
+    def add_cancel_callback(self, callback: Callable[[], Awaitable[None]]):
+        """注册取消时需要执行的清理（如终止浏览器工作进程池）"""
+        self._cancel_callbacks.append(callback)
+
+    def remove_cancel_callback(self, callback: Callable[[], Awaitable[None]]):
+        if callback in self._cancel_callbacks:
+            self._cancel_callbacks.remove(callback)
+
+
+class ExecutionRegistry:
+    """进程内正在执行的测试单登记表"""
+
+    def __init__(self):
+        self._controls: Dict[int, ExecutionControl] = {}
+
+    def register(self, task_id: int) -> ExecutionControl:
+        control = ExecutionControl(task_id)
+        self._controls[task_id] = control
+        return control
+
+    def unregister(self, task_id: int, control: ExecutionControl):
+        # 只移除自己登记的句柄，避免误删同一测试单新一轮执行的句柄
+        if self._controls.get(task_id) is control:
+            del self._controls[task_id]
+
+    def get(self, task_id: int) -> Optional[ExecutionControl]:
+        return self._controls.get(task_id)
+
+
+execution_registry = ExecutionRegistry()
@@ -0,0 +1,86 @@
+"""
+执行日志簿
+记录每个执行完成的用例（工作目录下的 journal.jsonl + 数据库 test_ui_execution_journals），
+继续执行时据此跳过已完成的用例
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from app.models.ui_test import TestUIExecutionJournal
+from app.log import logger
+
+
+class ExecutionJournal:
+    """
+    执行日志簿
+
+    工作目录中的文件保证数据库不可用时仍能续跑，数据库记录保证工作目录文件损坏时仍能续跑，
+    读取时两者合并，同一用例以执行次数最大的记录为准
+    """
+
+    FILE_NAME = 'journal.jsonl'
+
+    def __init__(self, work_dir: Path, task_id: int, report_id: int):
+        self.path = work_dir / self.FILE_NAME
+        self.task_id = task_id
+        self.report_id = report_id
+
+    async def record(self, script_info: Dict, result: Dict):
+        """记录一个执行完成的用例"""
+        entry = {
+            'case_id': script_info['case_id'],
+            'sequence': script_info['sequence'],
+            'status': result.get('status', 'failed'),
+            'attempt': result.get('attempt', 1),
+            'error': result.get('error'),
+            'finished_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+        try:
+            await TestUIExecutionJournal.create(
+                test_task_id=self.task_id,
+                test_report_id=self.report_id,
+                case_id=entry['case_id'],
+                sequence=entry['sequence'],
+                status=entry['status'],
+                attempt=entry['attempt'],
+                error_message=entry['error'],
+                finished_time=datetime.now()
+            )
+        except Exception as e:
+            logger.error(f"写入执行日志簿失败: case_id={entry['case_id']}, {e}")
+
+    async def load(self) -> List[Dict]:
+        """
+        读取已完成的用例
+
+        Returns:
+            每个用例最后一次执行的结果列表 [{'case_id', 'status', 'attempt', 'error'}]
+        """
+        entries: Dict[int, Dict] = {}
+
+        def merge(case_id: int, status: str, attempt: int, error):
+            current = entries.get(case_id)
+            if current is None or attempt >= current['attempt']:
+                entries[case_id] = {'case_id': case_id, 'status': status, 'attempt': attempt, 'error': error}
+
+        records = await TestUIExecutionJournal.filter(test_report_id=self.report_id).order_by('id').all()
+        for record in records:
+            merge(record.case_id, record.status, record.attempt, record.error_message)
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程崩溃时最后一行可能不完整
+                        continue
+                    merge(entry['case_id'], entry['status'], entry.get('attempt', 1), entry.get('error'))
+
+        return list(entries.values())
@@ -0,0 +1,251 @@
+"""
+测试单执行队列
+执行、继续执行、重新执行接口只把请求写入 test_ui_execution_queue 表，由服务进程内的调度协程领取并执行，
+服务重启（部署、崩溃）后中断的测试单会从检查点继续执行
+
+- 领取请求时记录执行进程（主机名:进程号），执行期间定时心跳
+- 执行进程已退出（同一主机上进程号不存在）或心跳超时的请求视为中断：
+  结束该进程遗留的用例进程和浏览器，测试单仍在执行中则重新排队并从检查点继续执行，已暂停的测试单等待手动继续
+- 同一请求被恢复 MAX_RECOVERIES 次仍未完成时判定为失败，避免反复拖垮服务的测试单无限重试
+"""
+import asyncio
+import os
+import signal
+import socket
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from app.models.ui_test import QueueAction, QueueStatus, TaskStatus, TestUIExecutionQueue, TestUITask
+from app.log import logger
+
+
+# 执行进程心跳间隔和超时时间（秒）
+HEARTBEAT_INTERVAL = 15
+HEARTBEAT_TIMEOUT = 90
+
+# 同一请求最多被恢复执行的次数
+MAX_RECOVERIES = 3
+
+# 用例脚本和浏览器工作进程（及其启动的浏览器）的环境变量中带有该标记，用于识别遗留进程；
+# 只设置在这些子进程的环境变量中，服务进程启动的其他子进程不受影响
+OWNER_ENV = 'UI_TEST_OWNER'
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def case_process_env(**extra: str) -> Dict[str, str]:
+    """用例脚本和浏览器工作进程的环境变量：附带执行进程标记（OWNER_ENV）"""
+    return {**os.environ, OWNER_ENV: OWNER, **extra}
+
+
+def _owner_alive(owner: str) -> Optional[bool]:
+    """执行进程是否仍存活；不在本机上时返回 None（只能按心跳判断）"""
+    hostname, _, pid = owner.rpartition(':')
+    if hostname != socket.gethostname() or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def kill_orphan_processes(owner: str) -> int:
+    """
+    结束本机上由 owner 启动的遗留用例进程（环境变量中带有 case_process_env 设置的标记，仅 Linux）
+
+    Returns:
+        结束的进程数
+    """
+    proc = Path('/proc')
+    if not proc.is_dir():
+        return 0
+    marker = b'\0' + f"{OWNER_ENV}={owner}".encode('utf-8') + b'\0'
+    killed = 0
+    for entry in proc.iterdir():
+        if not entry.name.isdigit() or int(entry.name) == os.getpid():
+            continue
+        try:
+            if marker not in b'\0' + (entry / 'environ').read_bytes() + b'\0':
+                continue
+            os.kill(int(entry.name), signal.SIGKILL)
+            killed += 1
+        except (OSError, ValueError):
+            continue
+    return killed
+
+
+class ExecutionQueue:
+    """测试单执行队列：持久化执行请求，由服务进程内的调度协程执行"""
+
+    def __init__(self):
+        self.owner = OWNER
+        self._wakeup = asyncio.Event()
+        self._runs: Dict[int, asyncio.Task] = {}
+        self._loops: Set[asyncio.Task] = set()
+
+    async def enqueue(self, task_id: int, action: QueueAction = QueueAction.EXECUTE) -> TestUIExecutionQueue:
+        """写入执行请求并唤醒调度协程"""
+        entry = await TestUIExecutionQueue.create(test_task_id=task_id, action=action)
+        logger.info(f"测试单已加入执行队列: task_id={task_id}, action={action.value}, queue_id={entry.id}")
+        self._wakeup.set()
+        return entry
+
+    async def cancel_queued(self, task_id: int) -> int:
+        """取消测试单尚未开始执行的请求"""
+        return await TestUIExecutionQueue.filter(
+            test_task_id=task_id, status=QueueStatus.QUEUED
+        ).update(status=QueueStatus.CANCELLED, finished_time=datetime.now())
+
+    async def start(self):
+        """服务启动时调用：恢复中断的测试单，启动调度和心跳协程"""
+        await self.recover(startup=True)
+        for loop in (self._dispatch_loop(), self._heartbeat_loop()):
+            self._loops.add(asyncio.create_task(loop))
+        logger.info(f"测试单执行队列已启动: owner={self.owner}")
+
+    async def stop(self):
+        """
+        服务关闭时调用：停止调度，结束正在执行的测试单和其子进程
+
+        执行中的请求保持 running 状态，服务再次启动时从检查点继续执行
+        """
+        for loop in self._loops:
+            loop.cancel()
+        runs = list(self._runs.values())
+        for run in runs:
+            run.cancel()
+        await asyncio.gather(*self._loops, *runs, return_exceptions=True)
+        self._loops.clear()
+        killed = kill_orphan_processes(self.owner)
+        logger.info(f"测试单执行队列已停止: 中断测试单 {len(runs)} 个，结束子进程 {killed} 个")
+
+    async def recover(self, startup: bool = False):
+        """
+        恢复中断的执行请求
+
+        Args:
+            startup: 服务启动时额外检查处于执行中、但没有正在执行的队列请求的测试单（如升级前启动的执行）
+        """
+        stale_before = datetime.now() - timedelta(seconds=HEARTBEAT_TIMEOUT)
+        for entry in await TestUIExecutionQueue.filter(status=QueueStatus.RUNNING):
+            if entry.owner == self.owner:
+                if not startup:
+                    continue
+                # 容器内重启后进程号可能相同，启动时登记为本进程的请求一定来自上一次运行
+                alive = False
+            else:
+                alive = _owner_alive(entry.owner or '')
+            heartbeat = entry.heartbeat_time.replace(tzinfo=None) if entry.heartbeat_time else None
+            if alive or (alive is None and heartbeat and heartbeat >= stale_before):
+                continue
+            await self._recover_entry(entry, kill_orphans=alive is False)
+
+        if startup:
+            active = await TestUIExecutionQueue.filter(
+                status__in=[QueueStatus.QUEUED, QueueStatus.RUNNING]
+            ).values_list('test_task_id', flat=True)
+            orphaned = await TestUITask.filter(status=TaskStatus.RUNNING).exclude(id__in=list(active) or [0])
+            for task in orphaned:
+                logger.warn(f"测试单处于执行中但没有执行进程，从检查点继续执行: task_id={task.id}")
+                await self.enqueue(task.id, QueueAction.RESUME)
+
+    async def _recover_entry(self, entry: TestUIExecutionQueue, kill_orphans: bool):
+        killed = kill_orphan_processes(entry.owner) if entry.owner and kill_orphans else 0
+        # 条件更新，多个服务进程同时恢复时只有一个生效
+        claimed = await TestUIExecutionQueue.filter(
+            id=entry.id, status=QueueStatus.RUNNING, owner=entry.owner
+        ).update(status=QueueStatus.FINISHED, finished_time=datetime.now(),
+                 error_message=f"执行进程 {entry.owner} 已退出，结束遗留进程 {killed} 个")
+        if not claimed:
+            return
+
+        task = await TestUITask.get_or_none(id=entry.test_task_id)
+        if not task:
+            return
+        if task.status == TaskStatus.PAUSED:
+            await TestUIExecutionQueue.filter(id=entry.id).update(status=QueueStatus.INTERRUPTED)
+            logger.warn(f"测试单暂停期间执行进程已退出，需要手动继续执行: task_id={task.id}")
+        elif task.status != TaskStatus.RUNNING:
+            logger.info(f"中断的测试单已不在执行中，不再恢复: task_id={task.id}, status={task.status.value}")
+        elif entry.recovered_count >= MAX_RECOVERIES:
+            task.status = TaskStatus.FAILED
+            task.end_time = datetime.now()
+            await task.save(update_fields=['status', 'end_time'])
+            logger.error(f"测试单已被恢复 {entry.recovered_count} 次仍未完成，判定为执行失败: task_id={task.id}")
+        else:
+            recovered = await TestUIExecutionQueue.create(
+                test_task_id=task.id, action=QueueAction.RESUME, recovered_count=entry.recovered_count + 1
+            )
+            logger.warn(f"测试单执行进程 {entry.owner} 已退出（结束遗留进程 {killed} 个），"
+                        f"重新排队从检查点继续执行: task_id={task.id}, queue_id={recovered.id}")
+            self._wakeup.set()
+
+    async def _dispatch_loop(self):
+        while True:
+            try:
+                await self._dispatch_queued()
+            except Exception as e:
+                logger.error(f"执行队列调度失败: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _dispatch_queued(self):
+        """领取等待中的请求并在后台执行"""
+        for entry in await TestUIExecutionQueue.filter(status=QueueStatus.QUEUED).order_by('id'):
+            now = datetime.now()
+            claimed = await TestUIExecutionQueue.filter(id=entry.id, status=QueueStatus.QUEUED).update(
+                status=QueueStatus.RUNNING, owner=self.owner, started_time=now, heartbeat_time=now
+            )
+            if not claimed:
+                continue
+            task = await TestUITask.get_or_none(id=entry.test_task_id)
+            if not task or task.status == TaskStatus.CANCELLED or entry.test_task_id in self._runs:
+                await TestUIExecutionQueue.filter(id=entry.id).update(
+                    status=QueueStatus.CANCELLED, finished_time=now
+                )
+                continue
+            run = asyncio.create_task(self._run(entry))
+            self._runs[entry.test_task_id] = run
+
+    async def _run(self, entry: TestUIExecutionQueue):
+        from app.core.task_execution_scheduler import TaskExecutionScheduler
+
+        status, error = QueueStatus.FINISHED, None
+        try:
+            await TaskExecutionScheduler().execute_task(entry.test_task_id, resume=entry.action == QueueAction.RESUME)
+        except asyncio.CancelledError:
+            # 服务关闭：保持 running 状态，下次启动时恢复
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self._runs.pop(entry.test_task_id, None)
+        await TestUIExecutionQueue.filter(id=entry.id).update(
+            status=status, finished_time=datetime.now(), error_message=error
+        )
+        self._wakeup.set()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await TestUIExecutionQueue.filter(
+                    status=QueueStatus.RUNNING, owner=self.owner
+                ).update(heartbeat_time=datetime.now())
+                # 其他服务进程（多实例部署）异常退出时，由仍在运行的进程接管其测试单
+                await self.recover()
+            except Exception as e:
+                logger.error(f"执行队列心跳失败: {e}")
+
+    def is_running(self, task_id: int) -> bool:
+        return task_id in self._runs
+
+
+execution_queue = ExecutionQueue()
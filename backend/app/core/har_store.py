@@ -0,0 +1,78 @@
+"""
+HAR 录制与回放
+execute_config.network_mode=record/replay 时，用例的网络请求按用例录制为 HAR 文件
+（test_executions/.har/<环境>/case_<用例ID>.har），回放时由 route_from_har 直接返回录制的响应，
+不再访问被测环境的接口，适合后端不在测试范围内的前端回归
+
+- record：全部用例重新录制
+- replay：已有 HAR 的用例回放；没有 HAR 或在 har_refresh 名单中的用例录制
+- 只有执行通过的用例才保存录制结果，避免把错误响应固化下来
+- 执行代理（parallel_mode=agent）上回放的 HAR 随用例下发，代理录制的 HAR 随执行结果回传并保存到本机的 HAR 目录，
+  HAR 始终以后端的目录为准
+"""
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from app.log import logger
+
+
+HAR_ROOT = Path('test_executions') / '.har'
+
+NETWORK_MODES = ('live', 'record', 'replay')
+
+
+def har_dir(environment: str) -> Path:
+    """环境的 HAR 目录（不同环境的接口响应不同，分开存放）"""
+    return HAR_ROOT / (re.sub(r'[^\w.-]', '_', environment or '') or 'default')
+
+
+def prepare(config: Dict, environment: str, work_dir: Path) -> Optional[Dict]:
+    """
+    按 network_mode 写入用例脚本使用的 HAR 配置（config['har']）
+
+    目录使用相对工作目录的路径，在执行代理上同样指向代理本地的 HAR 目录
+
+    Returns:
+        HAR 配置，network_mode=live 时返回 None
+    """
+    execute_config = config['execute_config']
+    mode = execute_config.get('network_mode', 'live')
+    if mode not in NETWORK_MODES:
+        logger.warn(f"不支持的 network_mode: {mode}，按 live 执行")
+        return None
+    if mode == 'live':
+        return None
+
+    refresh = execute_config.get('har_refresh') or []
+    if refresh is True:
+        mode, refresh = 'record', []
+
+    # 默认只录制和回放接口请求，页面和静态资源仍从被测环境加载
+    url = execute_config.get('har_url')
+    api_host = config.get('environment_variables', {}).get('api_host')
+    if url is None and api_host:
+        url = f"{api_host.rstrip('/')}/**"
+
+    config['har'] = {
+        'mode': mode,
+        'dir': os.path.relpath(har_dir(environment), work_dir),
+        'url': url,
+        'refresh': list(refresh),
+        'not_found': execute_config.get('har_not_found', 'fallback')
+    }
+    return config['har']
+
+
+def describe(har: Dict, case_ids: Iterable[int], environment: str) -> str:
+    """执行日志中的 HAR 说明（执行代理回放的也是后端目录中的 HAR）"""
+    case_ids = list(case_ids)
+    if har['mode'] == 'record':
+        return f"HAR 录制: 全部 {len(case_ids)} 个用例重新录制（{har['url'] or '全部请求'}）"
+    directory = har_dir(environment)
+    refresh = set(har['refresh'])
+    replay = sum(1 for case_id in case_ids
+                 if case_id not in refresh and (directory / f"case_{case_id}.har").exists())
+    return (f"HAR 回放: {replay} 个用例回放已录制的响应（{har['url'] or '全部请求'}），"
+            f"{len(case_ids) - replay} 个用例没有 HAR 或需要刷新，本次录制")
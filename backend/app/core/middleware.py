@@ -1,3 +1,4 @@
+import secrets
 from fastapi.responses import JSONResponse
 from jose import jwt, JWTError
 from app.models.user import User  # 假设 User 模型在这里
@@ -23,6 +24,12 @@ class AuthMiddleware(BaseHTTPMiddleware):
         if request.url.path in ["/api/logout", "/api/token", "/api/login", "/docs", "/openapi.json"]:
             return await call_next(request)
 
+        # 执行代理接口可使用共享令牌鉴权（settings.AGENT_TOKEN）
+        agent_token = request.headers.get("X-Agent-Token")
+        if (settings.AGENT_TOKEN and agent_token and request.url.path.startswith("/api/ui-test/agents/")
+                and secrets.compare_digest(agent_token, settings.AGENT_TOKEN)):
+            return await call_next(request)
+
         # 从请求头中获取 Authorization
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
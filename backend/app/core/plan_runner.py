@@ -0,0 +1,223 @@
+"""
+用例步骤计划执行器（独立脚本）
+解释执行 ScriptGenerator.generate_plans 生成的 JSON 步骤计划，不再为每个用例生成、编译 Python 脚本
+
+动作映射与 ScriptGenerator._generate_action_code 一一对应；执行日志、登录态复用、截图等执行逻辑
+与生成的脚本共用 case_runtime.py，结果收集、失败重试、断点续跑无需区分两种执行方式
+
+由浏览器工作进程（browser_worker.py）常驻加载，在预热的浏览器中连续执行多个用例；
+也可以单独执行一个计划用于调试（在 backend 目录下）：
+    python app/core/plan_runner.py test_executions/task_1_xxx/plans/case_001_001.json
+
+不依赖 app 包，避免在工作进程中加载整个 FastAPI 应用
+"""
+import asyncio
+import json
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from . import case_runtime as runtime
+except ImportError:  # 作为脚本执行或由浏览器工作进程导入时，case_runtime 在同一目录下
+    import case_runtime as runtime
+
+# 步骤计划格式版本
+PLAN_VERSION = 1
+
+VARIABLE_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+
+def resolve(run, value):
+    """替换输入中的 {{变量}}：username/password 取测试用户，其他取环境变量"""
+    if value is None:
+        return None
+    env_vars = run.config.get('environment_variables', {})
+
+    def replace(match):
+        name = match.group(1)
+        if name in ('username', 'password'):
+            return str(run.test_user.get(name))
+        return str(env_vars.get(name))
+
+    return VARIABLE_PATTERN.sub(replace, value)
+
+
+# ==================== 动作映射（与 ScriptGenerator._generate_action_code 对应） ====================
+
+async def _navigate(run, selector, value):
+    await run.page.goto(value)
+
+
+async def _click(run, selector, value):
+    await run.page.click(selector)
+
+
+async def _type(run, selector, value):
+    await run.page.fill(selector, value)
+
+
+async def _select(run, selector, value):
+    await run.page.select_option(selector, value)
+
+
+async def _wait(run, selector, value):
+    await run.step_wait('wait', '', value if value is not None else 1000)
+
+
+async def _wait_for_element(run, selector, value):
+    await run.page.wait_for_selector(selector)
+
+
+async def _assert_text(run, selector, value):
+    actual_text = await run.page.text_content(selector)
+    assert actual_text == value, f"期望文本 '{value}', 实际文本 '{actual_text}'"
+
+
+async def _assert_exists(run, selector, value):
+    is_visible = await run.page.is_visible(selector)
+    assert is_visible, f"元素 '{selector}' 不可见"
+
+
+async def _screenshot(run, selector, value):
+    await run.take_screenshot(0)
+
+
+async def _hover(run, selector, value):
+    await run.page.hover(selector)
+
+
+async def _clear(run, selector, value):
+    await run.page.fill(selector, "")
+
+
+async def _execute_script(run, selector, value):
+    await run.page.evaluate(value)
+
+
+async def _go_back(run, selector, value):
+    await run.page.go_back()
+
+
+async def _refresh(run, selector, value):
+    await run.page.reload()
+
+
+ACTIONS = {
+    'navigate': _navigate,
+    'click': _click,
+    'type': _type,
+    'select': _select,
+    'wait': _wait,
+    'wait_for_element': _wait_for_element,
+    'assert_text': _assert_text,
+    'assert_exists': _assert_exists,
+    'screenshot': _screenshot,
+    'hover': _hover,
+    'clear': _clear,
+    'execute_script': _execute_script,
+    'go_back': _go_back,
+    'refresh': _refresh,
+}
+
+# wait 动作本身就是等待，不再额外执行步骤的 wait_time
+NO_PRE_WAIT_ACTIONS = {'wait'}
+
+
+async def run_step(run, step):
+    """执行单个步骤并记录日志，失败时截图后抛出异常"""
+    number, action_name, description = step['number'], step['action'], step['description']
+    step_start = datetime.now()
+    try:
+        action = ACTIONS.get(action_name)
+        # 未知动作与生成脚本一致：不执行任何操作
+        if action is not None:
+            if step.get('wait_time') and action_name not in NO_PRE_WAIT_ACTIONS:
+                await run.step_wait(action_name, step.get('selector', ''), step['wait_time'])
+            await action(run, step.get('selector', ''), resolve(run, step.get('input')))
+        step_duration = int((datetime.now() - step_start).total_seconds() * 1000)
+        run.logger.log_step(number, action_name, description, "通过", step_duration, step_start_time=step_start)
+        if runtime.DEBUG:
+            print(f"  ✓ 步骤 {number}: {description}")
+    except Exception as e:
+        step_duration = int((datetime.now() - step_start).total_seconds() * 1000)
+        screenshot_path = None
+        if run.execute_config.get('auto_screenshot', True):
+            screenshot_path = await run.take_screenshot(number, failure=True)
+        run.logger.log_step(number, action_name, description, "失败", step_duration, str(e),
+                            screenshot_path, step_start)
+        raise
+
+
+def plan_steps(plan):
+    """按计划执行所有步骤的协程函数（传给 case_runtime.run_case）；登录步骤在复用缓存登录态时跳过"""
+    steps = plan['steps']
+    login_steps = plan.get('login_steps', 0)
+
+    async def run_steps(run):
+        if login_steps and run.auth_restored:
+            await run.restore_session()
+            for step in steps[:login_steps]:
+                run.logger.log_step(step['number'], step['action'], step['description'], "跳过", 0)
+        else:
+            for step in steps[:login_steps]:
+                await run_step(run, step)
+            if login_steps and run.auth_cache:
+                # 登录态缺失或已过期，登录后刷新缓存供其他用例使用
+                await run.save_auth_state()
+
+        for step in steps[login_steps:]:
+            await run_step(run, step)
+
+    return run_steps
+
+
+# ==================== 执行入口 ====================
+
+def load_plan(plan_path):
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"不支持的步骤计划版本: {plan.get('version')}")
+    return plan
+
+
+def plan_log_path(plan_path):
+    """步骤计划的执行日志路径（工作目录/logs/，与同名的生成脚本一致）"""
+    return plan_path.parent.parent / 'logs' / f"{plan_path.stem}.jsonl"
+
+
+async def run_plan(browser, plan_path, attempt=1):
+    """
+    在给定的浏览器中执行一个步骤计划
+
+    每次执行都会创建独立的 BrowserContext，执行结束后关闭
+
+    Args:
+        browser: 已启动的浏览器
+        plan_path: 步骤计划文件路径（工作目录/plans/case_xxx_xxx.json）
+        attempt: 第几次执行（1 为首次执行，大于 1 为失败重试）
+
+    Returns:
+        执行结果字典 {'status': 'passed'/'failed', 'error': ...}
+    """
+    plan_path = Path(plan_path)
+    plan = load_plan(plan_path)
+    return await runtime.run_case(browser, plan_path.parent.parent, plan['case'], plan.get('role'),
+                                  plan_log_path(plan_path), plan_steps(plan), attempt)
+
+
+async def main(plan_path):
+    """单独执行一个步骤计划（自行启动浏览器）"""
+    plan_path = Path(plan_path)
+    plan = load_plan(plan_path)
+    await runtime.run_standalone(plan_path.parent.parent, plan['case'], plan_log_path(plan_path),
+                                 lambda browser, attempt: run_plan(browser, plan_path, attempt))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("用法: python plan_runner.py <步骤计划文件>")
+        sys.exit(2)
+    asyncio.run(main(sys.argv[1]))
@@ -2,11 +2,14 @@
 结果收集器
 负责收集执行日志并写入数据库
 """
-import json
+import asyncio
 from pathlib import Path
 from datetime import datetime
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+from tortoise.transactions import in_transaction
+
+from app.core import case_log
 from app.models.ui_test import (
     TestUIReport,
     TestUICaseExecutionRecord,
@@ -17,79 +20,256 @@ from app.models.ui_test import (
 from app.log import logger
 
 
+# 加载步骤定义时每个 __in 条件包含的最大用例数
+IN_QUERY_CHUNK_SIZE = 1000
+
+# 每个事务写入的用例数
+INGEST_CHUNK_SIZE = 100
+
+# 步骤执行记录每条 INSERT 语句包含的行数
+STEP_BATCH_SIZE = 1000
+
+
 class ResultCollector:
     """
     结果收集器
     负责收集执行日志并写入数据库
     """
     
-    async def collect_results(self, work_dir: Path, report_id: int):
+    async def collect_results(self, work_dir: Path, report_id: int, case_ids: Optional[Set[int]] = None):
         """
         收集所有用例的执行结果
         
         Args:
             work_dir: 工作目录
             report_id: 测试报告ID
+            case_ids: 只收集这些用例的日志（断点续跑时重新收集已完成的用例），默认收集全部
         """
         logs_dir = work_dir / 'logs'
         if not logs_dir.exists():
             logger.warning(f"日志目录不存在: {logs_dir}")
             return
         
-        # 遍历所有日志文件
-        for log_file in logs_dir.glob('case_*.json'):
+        # 遍历所有日志文件（logs/attempts/ 下为失败重试前的历次执行日志）
+        log_files = (list(logs_dir.glob(f'case_*{case_log.LOG_SUFFIX}'))
+                     + list(logs_dir.glob(f'attempts/case_*{case_log.LOG_SUFFIX}')))
+        if case_ids is not None:
+            log_files = [log_file for log_file in log_files if self._case_id_of(log_file) in case_ids]
+        
+        step_defs = await self.load_step_definitions({self._case_id_of(log_file) for log_file in log_files})
+        await self.ingest_log_files(log_files, report_id, step_defs)
+    
+    async def load_step_definitions(self, case_ids: Iterable[int]) -> Dict[Tuple[int, int], Tuple]:
+        """
+        一次性加载用例的步骤定义
+        
+        Returns:
+            {(用例ID, 步骤序号): (element_id, input_data)}
+        """
+        ids = sorted(case_id for case_id in set(case_ids) if case_id is not None)
+        step_defs = {}
+        for start in range(0, len(ids), IN_QUERY_CHUNK_SIZE):
+            rows = await TestUIStep.filter(
+                test_case_id__in=ids[start:start + IN_QUERY_CHUNK_SIZE]
+            ).order_by('id').values_list('test_case_id', 'step_number', 'element_id', 'input_data')
+            for case_id, step_number, element_id, input_data in rows:
+                # 与逐条查询 .first() 一致，同一序号有多个步骤时取最早创建的
+                step_defs.setdefault((case_id, step_number), (element_id, input_data))
+        return step_defs
+    
+    async def ingest_log_files(self, log_files: List[Path], report_id: int,
+                               step_defs: Optional[Dict[Tuple[int, int], Tuple]] = None,
+                               run_stats: Optional[Dict[str, Dict[str, int]]] = None) -> int:
+        """
+        批量写入用例执行日志
+        
+        每 INGEST_CHUNK_SIZE 个用例一个事务：用例执行记录和步骤执行记录均使用 bulk_create 写入
+        
+        Args:
+            log_files: 日志文件列表
+            report_id: 测试报告ID
+            step_defs: 预先加载的步骤定义（load_step_definitions），未提供时按日志中的用例加载
+            run_stats: 累加各用例的执行统计（case_log.RUN_STATS）
+        
+        Returns:
+            写入的用例执行记录数
+        """
+        entries = [entry for entry in (self._read_log_file(log_file) for log_file in log_files) if entry]
+        if not entries:
+            return 0
+        if run_stats is not None:
+            for entry in entries:
+                for name, counts in entry['stats'].items():
+                    totals = run_stats.setdefault(name, {})
+                    for key, value in counts.items():
+                        totals[key] = totals.get(key, 0) + value
+        if step_defs is None:
+            step_defs = await self.load_step_definitions(entry['case_id'] for entry in entries)
+        
+        written = 0
+        for start in range(0, len(entries), INGEST_CHUNK_SIZE):
+            chunk = entries[start:start + INGEST_CHUNK_SIZE]
             try:
-                await self._process_log_file(log_file, report_id)
+                await self._write_chunk(chunk, report_id, step_defs)
+                written += len(chunk)
             except Exception as e:
-                logger.error(f"处理日志文件失败 {log_file}: {e}")
+                logger.error(f"写入执行记录失败: {', '.join(entry['name'] for entry in chunk)}, {e}")
+        return written
     
-    async def _process_log_file(self, log_file: Path, report_id: int):
-        """处理单个日志文件"""
+    @staticmethod
+    def _case_id_of(log_file: Path) -> Optional[int]:
+        """从日志文件名（case_<用例ID>_<序号>[_attempt<N>].jsonl）解析用例ID"""
         try:
-            # 1. 读取日志文件
-            with open(log_file, 'r', encoding='utf-8') as f:
-                log_data = json.load(f)
+            return int(log_file.stem.split('_')[1])
+        except (IndexError, ValueError):
+            return None
+    
+    def _read_log_file(self, log_file: Path) -> Optional[Dict]:
+        """读取并解析单个日志文件，未执行完或格式错误时返回 None"""
+        try:
+            log_data = case_log.load_case_log(log_file)
+            if log_data is None:
+                logger.info(f"跳过没有开始记录的执行日志: {log_file.name}")
+                return None
             
             case_info = log_data['case_info']
             execution_info = log_data['execution_info']
-            steps = log_data['steps']
             
-            # 2. 创建用例执行记录
-            case_record = await TestUICaseExecutionRecord.create(
-                test_case_id=case_info['case_id'],
-                test_report_id=report_id,
-                status=execution_info['status'],
-                start_time=datetime.strptime(execution_info['start_time'], '%Y-%m-%d %H:%M:%S'),
-                end_time=datetime.strptime(execution_info['end_time'], '%Y-%m-%d %H:%M:%S'),
-                duration=execution_info['duration'],
-                error_message=execution_info.get('error_message')
-            )
+            if not execution_info.get('end_time'):
+                # 用例未执行完（如测试单被取消时进程被结束），不生成执行记录
+                logger.info(f"跳过未完成的执行日志: {log_file.name}")
+                return None
             
-            # 3. 创建步骤执行记录
-            for step_data in steps:
-                # 查询步骤定义获取 element_id
-                step_def = await TestUIStep.filter(
-                    test_case_id=case_info['case_id'],
-                    step_number=step_data['step_number']
-                ).first()
-                
-                await TestUICaseStepExecutionRecord.create(
-                    case_execution_record_id=case_record.id,
-                    step_number=step_data['step_number'],
-                    action=step_data['action'],
-                    description=step_data.get('description'),  # 保存步骤描述
-                    element_id=step_def.element_id if step_def else None,
-                    input_data=step_def.input_data if step_def else None,
-                    status=step_data['status'],
-                    start_time=datetime.strptime(step_data['start_time'], '%Y-%m-%d %H:%M:%S'),
-                    end_time=datetime.strptime(step_data['end_time'], '%Y-%m-%d %H:%M:%S'),
-                    duration=step_data['duration'],
-                    error_message=step_data.get('error_message'),
-                    screenshot_path=step_data.get('screenshot_path')
-                )
+            return {
+                'name': log_file.name,
+                'case_id': case_info['case_id'],
+                'attempt': log_data.get('attempt', 1),
+                'stats': {key: execution_info[key] for key in case_log.RUN_STATS if execution_info.get(key)},
+                'case_record': {
+                    'test_case_id': case_info['case_id'],
+                    'status': execution_info['status'],
+                    'start_time': datetime.strptime(execution_info['start_time'], '%Y-%m-%d %H:%M:%S'),
+                    'end_time': datetime.strptime(execution_info['end_time'], '%Y-%m-%d %H:%M:%S'),
+                    'duration': execution_info['duration'],
+                    'error_message': execution_info.get('error_message'),
+                    'trace_path': execution_info.get('trace_path'),
+                    'attempt': log_data.get('attempt', 1)
+                },
+                'steps': [
+                    {
+                        'step_number': step_data['step_number'],
+                        'action': step_data['action'],
+                        'description': step_data.get('description'),  # 保存步骤描述
+                        'status': step_data['status'],
+                        'start_time': datetime.strptime(step_data['start_time'], '%Y-%m-%d %H:%M:%S'),
+                        'end_time': datetime.strptime(step_data['end_time'], '%Y-%m-%d %H:%M:%S'),
+                        'duration': step_data['duration'],
+                        'error_message': step_data.get('error_message'),
+                        'screenshot_path': step_data.get('screenshot_path')
+                    }
+                    for step_data in log_data['steps']
+                ]
+            }
+        
+        except Exception as e:
+            logger.error(f"处理日志文件异常 {log_file}: {e}")
+            return None
+    
+    async def _write_chunk(self, entries: List[Dict], report_id: int, step_defs: Dict[Tuple[int, int], Tuple]):
+        """在一个事务中写入一批用例及其步骤的执行记录"""
+        async with in_transaction() as conn:
+            await TestUICaseExecutionRecord.bulk_create([
+                TestUICaseExecutionRecord(test_report_id=report_id, **entry['case_record'])
+                for entry in entries
+            ], using_db=conn)
             
-            logger.info(f"处理日志文件成功: {log_file.name}")
+            # bulk_create 不回填主键，按 (用例ID, 执行次数) 查回本批记录的ID（同一键取最新写入的一条）
+            record_ids = {}
+            rows = await TestUICaseExecutionRecord.filter(
+                test_report_id=report_id,
+                test_case_id__in={entry['case_id'] for entry in entries}
+            ).using_db(conn).order_by('id').values_list('id', 'test_case_id', 'attempt')
+            for record_id, case_id, attempt in rows:
+                record_ids[(case_id, attempt)] = record_id
             
+            step_records = []
+            for entry in entries:
+                record_id = record_ids[(entry['case_id'], entry['attempt'])]
+                for step in entry['steps']:
+                    element_id, input_data = step_defs.get((entry['case_id'], step['step_number']), (None, None))
+                    step_records.append(TestUICaseStepExecutionRecord(
+                        case_execution_record_id=record_id,
+                        element_id=element_id,
+                        input_data=input_data,
+                        **step
+                    ))
+            await TestUICaseStepExecutionRecord.bulk_create(step_records, batch_size=STEP_BATCH_SIZE, using_db=conn)
+        
+        for entry in entries:
+            logger.info(f"处理日志文件成功: {entry['name']}")
+
+
+class ResultStream:
+    """
+    执行结果流式写入
+    
+    调度器在每个用例执行完成时提交日志文件，由单个写入协程按完成顺序依次写入数据库：
+    报告页面可以实时看到已完成用例的执行记录，执行结束时也不再集中解析整个 logs/ 目录
+    """
+    
+    def __init__(self, collector: ResultCollector, report_id: int, case_ids: Iterable[int] = ()):
+        self.collector = collector
+        self.report_id = report_id
+        self.case_ids = list(case_ids)
+        self.written = 0
+        # 已写入用例的执行统计合计（case_log.RUN_STATS）
+        self.run_stats: Dict[str, Dict[str, int]] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """启动写入协程"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run())
+    
+    def submit(self, log_file: Path):
+        """提交一个执行完成的用例日志"""
+        self._queue.put_nowait(log_file)
+    
+    async def flush(self):
+        """等待已提交的日志全部写入（日志文件被移动或覆盖前调用）"""
+        if self._writer is not None:
+            await self._queue.join()
+    
+    async def close(self):
+        """写完剩余日志后停止写入协程"""
+        if self._writer is None:
+            return
+        self._queue.put_nowait(None)
+        await self._writer
+        self._writer = None
+    
+    async def _run(self):
+        # 步骤定义在写入协程启动时一次性加载，之后每个用例只需写入，不再逐步骤查询
+        try:
+            step_defs = await self.collector.load_step_definitions(self.case_ids)
         except Exception as e:
-            logger.error(f"处理日志文件异常 {log_file}: {e}")
-            raise
+            logger.error(f"加载步骤定义失败，改为按批次加载: {e}")
+            step_defs = None
+        
+        while True:
+            batch = [await self._queue.get()]
+            # 上一批写入期间完成的用例合并为一批写入
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            log_files = [log_file for log_file in batch if log_file is not None]
+            try:
+                if log_files:
+                    self.written += await self.collector.ingest_log_files(
+                        log_files, self.report_id, step_defs, self.run_stats
+                    )
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(log_files) < len(batch):
+                return
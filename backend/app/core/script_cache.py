@@ -0,0 +1,157 @@
+"""
+用例脚本缓存
+按内容哈希（用例、步骤、元素选择器、模板版本）缓存生成的脚本及其字节码，
+内容未变化的用例直接复用缓存，不再重新渲染模板
+"""
+import importlib.util
+import os
+import py_compile
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.log import logger
+
+
+CACHE_DIR = Path('test_executions') / '.script_cache'
+
+# 超过 CACHE_MAX_AGE_DAYS 天未被使用的条目在生成脚本前清理；条目数超过 CACHE_MAX_ENTRIES 时再清理最久未使用的
+CACHE_MAX_AGE_DAYS = 30
+CACHE_MAX_ENTRIES = 20000
+
+
+class ScriptCache:
+    """
+    脚本缓存
+
+    缓存目录中每个条目包含 {key}.py 和 {key}.pyc，
+    字节码使用 CHECKED_HASH 方式编译，复制到工作目录后按源码哈希校验，不依赖文件修改时间；
+    源码文件的修改时间记录最近一次使用，用于清理模板或步骤修改后不再使用的条目
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        # 批量生成时在线程池中并发调用，计数需要加锁
+        self._lock = threading.Lock()
+
+    def _source_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.py"
+
+    def _bytecode_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pyc"
+
+    def contains(self, key: str) -> bool:
+        return self._source_path(key).exists()
+
+    def put(self, key: str, content: str):
+        """
+        写入缓存条目并预编译字节码（编译失败时只缓存源码）
+
+        多个测试单可能在各自的线程中同时写入同一条目：临时文件名包含进程号和线程号，
+        源码和字节码都先写入临时文件再原子替换，读取方只会看到完整的文件
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        source_path = self._source_path(key)
+        suffix = f"{os.getpid()}_{threading.get_ident()}"
+        tmp_path = source_path.with_name(f"{key}.{suffix}.py.tmp")
+        tmp_bytecode_path = source_path.with_name(f"{key}.{suffix}.pyc.tmp")
+        tmp_path.write_text(content, encoding='utf-8')
+
+        try:
+            try:
+                py_compile.compile(
+                    str(tmp_path),
+                    cfile=str(tmp_bytecode_path),
+                    doraise=True,
+                    invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH
+                )
+                os.replace(tmp_bytecode_path, self._bytecode_path(key))
+            except py_compile.PyCompileError as e:
+                logger.warn(f"脚本预编译失败，执行时将报错: {e.msg}")
+
+            # 先写字节码再替换源码，保证源码存在时字节码已就绪
+            os.replace(tmp_path, source_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+            tmp_bytecode_path.unlink(missing_ok=True)
+
+    def materialize(self, key: str, script_path: Path):
+        """将缓存条目复制到工作目录"""
+        script_path.parent.mkdir(parents=True, exist_ok=True)
+        source_path = self._source_path(key)
+        shutil.copyfile(source_path, script_path)
+        # 记录最近一次使用时间
+        os.utime(source_path)
+
+        bytecode_path = self._bytecode_path(key)
+        if bytecode_path.exists():
+            target = Path(importlib.util.cache_from_source(str(script_path)))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(bytecode_path, target)
+
+    def fetch(self, key: str, script_path: Path) -> bool:
+        """命中时复制到工作目录并返回 True"""
+        if self.contains(key):
+            try:
+                self.materialize(key, script_path)
+                with self._lock:
+                    self.hits += 1
+                return True
+            except OSError as e:
+                logger.warn(f"读取脚本缓存失败，重新生成: {key}, {e}")
+        with self._lock:
+            self.misses += 1
+        return False
+
+    def store(self, key: str, content: str, script_path: Path):
+        """写入缓存并复制到工作目录；缓存写入失败时直接写入工作目录，不影响本次执行"""
+        try:
+            self.put(key, content)
+            self.materialize(key, script_path)
+        except OSError as e:
+            logger.warn(f"写入脚本缓存失败，直接生成脚本: {key}, {e}")
+            script_path.parent.mkdir(parents=True, exist_ok=True)
+            script_path.write_text(content, encoding='utf-8')
+
+    def prune(self, max_age_days: float = CACHE_MAX_AGE_DAYS, max_entries: int = CACHE_MAX_ENTRIES) -> int:
+        """
+        清理长期未使用的缓存条目（含遗留的临时文件）
+
+        Returns:
+            删除的条目数
+        """
+        if not self.cache_dir.is_dir():
+            return 0
+        entries = []
+        expire_before = time.time() - max_age_days * 86400
+        for path in self.cache_dir.iterdir():
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if path.suffix == '.py':
+                entries.append((mtime, path.stem))
+            elif path.suffix == '.tmp' and mtime < time.time() - 3600:
+                path.unlink(missing_ok=True)
+        entries.sort()
+        stale = [key for mtime, key in entries if mtime < expire_before]
+        overflow = len(entries) - len(stale) - max_entries
+        if overflow > 0:
+            stale += [key for _, key in entries[len(stale):len(stale) + overflow]]
+        for key in stale:
+            self._source_path(key).unlink(missing_ok=True)
+            self._bytecode_path(key).unlink(missing_ok=True)
+        if stale:
+            logger.info(f"清理脚本缓存: 删除 {len(stale)} 个长期未使用的条目")
+        return len(stale)
+
+    def summary(self) -> Optional[str]:
+        """缓存命中情况摘要，没有生成过脚本时返回 None"""
+        total = self.hits + self.misses
+        if not total:
+            return None
+        return f"脚本缓存: 命中 {self.hits}, 未命中 {self.misses}（命中率 {self.hits / total * 100:.1f}%）"
@@ -1,22 +1,49 @@
 """
 脚本生成器
 负责为每个测试用例生成独立的 Playwright Python 脚本
+脚本只包含用例步骤，执行逻辑由 case_runtime.py 提供（生成时复制到工作目录的 scripts/ 下）
 """
+import asyncio
+import hashlib
+import io
 import json
+import shutil
+import textwrap
+import zipfile
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+from tortoise.exceptions import DoesNotExist
+
 from app.models.ui_test import (
     TestUICase,
     TestUIStep,
     TestUIElement,
     TestUICasePermission
 )
+from app.core import case_runtime, plan_runner, selector_builder
 from app.core.selector_builder import SelectorBuilder
+from app.core.script_cache import ScriptCache
 from app.log import logger
 
 
+# 识别登录前缀时最多检查的步骤数
+MAX_LOGIN_PREFIX_STEPS = 8
+
+# 批量查询时每个 __in 条件包含的最大 ID 数
+IN_QUERY_CHUNK_SIZE = 1000
+
+# 脚本使用的运行时模块
+RUNTIME_PATH = Path(case_runtime.__file__)
+
+# 模板版本：由脚本生成、选择器构建和运行时模块的源码计算，代码变化后缓存自动失效
+TEMPLATE_VERSION = hashlib.sha256(
+    Path(__file__).read_bytes() + Path(selector_builder.__file__).read_bytes() + RUNTIME_PATH.read_bytes()
+).hexdigest()[:16]
+
+
 class ScriptGenerator:
     """
     脚本生成器
@@ -25,6 +52,7 @@ class ScriptGenerator:
     
     def __init__(self):
         self.selector_builder = SelectorBuilder()
+        self.cache = ScriptCache()
     
     async def generate_script(self, case_id: int, work_dir: Path, sequence: int) -> Dict:
         """
@@ -44,85 +72,335 @@ class ScriptGenerator:
             
             # 2. 查询用例步骤及关联元素
             steps = await TestUIStep.filter(test_case_id=case_id).order_by('sort_order').all()
+            elements = await self._load_elements(steps)
             
             # 3. 查询用例权限角色
-            permissions = await TestUICasePermission.filter(test_case_id=case_id).all()
+            permissions = await TestUICasePermission.filter(test_case_id=case_id).order_by('id').all()
             role_names = [p.role_name for p in permissions]
             
-            # 4. 生成用户加载代码
-            user_loading_code = self._generate_user_loading_code(role_names)
-            
-            # 5. 生成步骤执行代码
-            steps_code = await self._generate_steps_code(steps)
+            self.install_runtime(work_dir)
+            return self._build_script(case, steps, elements, role_names, work_dir, sequence)
             
-            # 6. 使用模板生成完整脚本
-            script_content = self._render_template(
-                case_id=case_id,
-                case_name=case.name,
-                priority=case.priority,
-                module=case.module or '',
-                sequence=sequence,
-                user_loading_code=user_loading_code,
-                steps_execution_code=steps_code
+        except Exception as e:
+            logger.error(f"生成脚本失败 (case_id={case_id}): {e}")
+            raise
+    
+    async def generate_scripts(self, case_ids: List[int], work_dir: Path) -> List[Dict]:
+        """
+        批量生成测试单的所有用例脚本
+        
+        用少量 __in 查询一次性加载所有用例、步骤、权限和元素，
+        再在线程池中并发渲染、写入脚本，避免逐用例、逐步骤地查询数据库
+        
+        Args:
+            case_ids: 用例ID列表（按执行顺序，脚本序号从 1 开始）
+            work_dir: 工作目录
+        
+        Returns:
+            脚本信息列表（顺序与 case_ids 一致）
+        """
+        cases, steps_by_case, roles_by_case, elements = await self._prefetch(case_ids)
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.cache.prune)
+        self.install_runtime(work_dir)
+        return list(await asyncio.gather(*[
+            loop.run_in_executor(
+                None, self._build_script,
+                cases[case_id], steps_by_case[case_id], elements, roles_by_case[case_id], work_dir, sequence
             )
+            for sequence, case_id in enumerate(case_ids, 1)
+        ]))
+    
+    @staticmethod
+    def install_runtime(work_dir: Path):
+        """把运行时模块复制到工作目录的 scripts/ 下，脚本从同目录导入"""
+        scripts_dir = work_dir / 'scripts'
+        scripts_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(RUNTIME_PATH, scripts_dir / RUNTIME_PATH.name)
+    
+    async def generate_plans(self, case_ids: List[int], work_dir: Path) -> List[Dict]:
+        """
+        批量生成测试单的所有用例步骤计划（execute_config.runner = 'plan'）
+        
+        步骤计划是 JSON 格式的步骤列表，由常驻的 plan_runner 直接解释执行，
+        不需要渲染模板和编译脚本
+        
+        Args:
+            case_ids: 用例ID列表（按执行顺序，序号从 1 开始）
+            work_dir: 工作目录
+        
+        Returns:
+            计划信息列表 [{'case_id', 'case_name', 'plan_path', 'sequence', 'role', 'module'}]（顺序与 case_ids 一致）
+        """
+        cases, steps_by_case, roles_by_case, elements = await self._prefetch(case_ids)
+        
+        plan_dir = work_dir / 'plans'
+        plan_dir.mkdir(parents=True, exist_ok=True)
+        
+        plans = []
+        for sequence, case_id in enumerate(case_ids, 1):
+            case = cases[case_id]
+            plan = self._build_plan(case, steps_by_case[case_id], elements, roles_by_case[case_id])
+            plan_path = plan_dir / f'case_{case_id:03d}_{sequence:03d}.json'
+            with open(plan_path, 'w', encoding='utf-8') as f:
+                json.dump(plan, f, ensure_ascii=False)
+            plans.append({
+                'case_id': case_id,
+                'case_name': case.name,
+                'plan_path': str(plan_path),
+                'sequence': sequence,
+                'role': plan['role'],
+                'module': case.module or ''
+            })
+        return plans
+    
+    async def export_script(self, case_id: int, config: Dict) -> Dict:
+        """
+        导出用例的独立脚本（用于本地调试，不写入工作目录和缓存）
+        
+        打包为 zip：config.json、scripts/case_runtime.py 和用例脚本，与执行工作目录的结构一致，
+        解压后可直接执行 python scripts/<脚本文件名>.py
+        
+        Args:
+            case_id: 用例ID
+            config: 脚本使用的配置（ConfigGenerator.build_debug_config）
+        
+        Returns:
+            {'filename': zip 文件名, 'content': zip 内容}
+        """
+        cases, steps_by_case, roles_by_case, elements = await self._prefetch([case_id])
+        case = cases[case_id]
+        steps = steps_by_case[case_id]
+        content = self._render_template(
+            case_id=case.id,
+            case_name=case.name,
+            priority=case.priority,
+            module=case.module or '',
+            role=repr(roles_by_case[case_id][0] if roles_by_case[case_id] else None),
+            steps_execution_code=self._build_steps_code(steps, elements)
+        )
+        root = f'case_{case_id:03d}'
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr(f'{root}/config.json', json.dumps(config, ensure_ascii=False, indent=2))
+            bundle.write(RUNTIME_PATH, f'{root}/scripts/{RUNTIME_PATH.name}')
+            bundle.writestr(f'{root}/scripts/case_{case_id:03d}_001.py', content)
+        return {'filename': f'{root}.zip', 'content': buffer.getvalue()}
+    
+    async def _prefetch(self, case_ids: List[int]) -> Tuple[Dict[int, TestUICase], Dict[int, List[TestUIStep]],
+                                                          Dict[int, List[str]], Dict[int, TestUIElement]]:
+        """
+        用少量 __in 查询加载用例、步骤、权限角色和步骤引用的元素
+        
+        Returns:
+            (用例, 按用例分组的步骤, 按用例分组的角色, 元素)
+        """
+        cases: Dict[int, TestUICase] = {}
+        steps_by_case: Dict[int, List[TestUIStep]] = defaultdict(list)
+        roles_by_case: Dict[int, List[str]] = defaultdict(list)
+        
+        # 同一用例可能被多个用例集引用，去重后再分批查询，避免步骤被重复加载
+        for chunk in self._chunks(list(dict.fromkeys(case_ids))):
+            for case in await TestUICase.filter(id__in=chunk).all():
+                cases[case.id] = case
+            for step in await TestUIStep.filter(test_case_id__in=chunk).order_by('sort_order', 'id').all():
+                steps_by_case[step.test_case_id].append(step)
+            for permission in await TestUICasePermission.filter(test_case_id__in=chunk).order_by('id').all():
+                roles_by_case[permission.test_case_id].append(permission.role_name)
+        
+        missing = [case_id for case_id in case_ids if case_id not in cases]
+        if missing:
+            logger.error(f"加载用例失败，用例不存在: {missing}")
+            raise DoesNotExist(f"用例不存在: {missing}")
+        
+        all_steps = [step for steps in steps_by_case.values() for step in steps]
+        elements = await self._load_elements(all_steps)
+        return cases, steps_by_case, roles_by_case, elements
+    
+    async def _load_elements(self, steps: List[TestUIStep]) -> Dict[int, TestUIElement]:
+        """批量查询步骤引用的元素"""
+        element_ids = list({step.element_id for step in steps if step.element_id})
+        elements = {}
+        for chunk in self._chunks(element_ids):
+            for element in await TestUIElement.filter(id__in=chunk).all():
+                elements[element.id] = element
+        return elements
+    
+    @staticmethod
+    def _chunks(ids: List[int]):
+        for start in range(0, len(ids), IN_QUERY_CHUNK_SIZE):
+            yield ids[start:start + IN_QUERY_CHUNK_SIZE]
+    
+    def _build_script(self, case: TestUICase, steps: List[TestUIStep], elements: Dict[int, TestUIElement],
+                      role_names: List[str], work_dir: Path, sequence: int) -> Dict:
+        """
+        生成并写入单个用例脚本（不访问数据库，可在线程池中执行）
+        
+        内容未变化时直接复用缓存的脚本
+        """
+        try:
+            case_elements = {
+                step.element_id: elements[step.element_id]
+                for step in steps if step.element_id in elements
+            }
             
-            # 7. 写入脚本文件
-            script_path = work_dir / 'scripts' / f'case_{case_id:03d}_{sequence:03d}.py'
-            script_path.parent.mkdir(parents=True, exist_ok=True)
-            script_path.write_text(script_content, encoding='utf-8')
-            
-            logger.info(f"脚本文件生成成功: {script_path}")
+            script_path = work_dir / 'scripts' / f'case_{case.id:03d}_{sequence:03d}.py'
+            cache_key = self._cache_key(case, steps, case_elements, role_names)
+            if self.cache.fetch(cache_key, script_path):
+                logger.info(f"脚本缓存命中: {script_path}")
+            else:
+                # 生成步骤执行代码，使用模板生成完整脚本
+                script_content = self._render_template(
+                    case_id=case.id,
+                    case_name=case.name,
+                    priority=case.priority,
+                    module=case.module or '',
+                    role=repr(role_names[0] if role_names else None),
+                    steps_execution_code=self._build_steps_code(steps, case_elements)
+                )
+                
+                # 写入缓存和脚本文件
+                self.cache.store(cache_key, script_content, script_path)
+                logger.info(f"脚本文件生成成功: {script_path}")
             
             return {
-                'case_id': case_id,
+                'case_id': case.id,
                 'case_name': case.name,
                 'script_path': str(script_path),
-                'sequence': sequence
+                'sequence': sequence,
+                # 分片派发（schedule_policy='affinity'）按角色和模块分组
+                'role': role_names[0] if role_names else None,
+                'module': case.module or ''
             }
-            
+        
         except Exception as e:
-            logger.error(f"生成脚本失败 (case_id={case_id}): {e}")
+            logger.error(f"生成脚本失败 (case_id={case.id}): {e}")
             raise
     
-    def _generate_user_loading_code(self, role_names: List[str]) -> str:
-        """生成用户加载代码"""
-        if not role_names:
-            # 无权限配置，使用默认用户
-            return """    # 使用环境变量中的默认用户
-    test_user = {
-        'username': config['environment_variables'].get('admin_username'),
-        'password': config['environment_variables'].get('admin_password')
-    }"""
-        else:
-            # 有权限配置，使用指定角色的用户
-            role_name = role_names[0]  # 使用第一个角色
-            return f"""    # 从配置中获取指定角色的测试用户
-    role_name = "{role_name}"
-    if role_name in config['test_users']:
-        test_user = config['test_users'][role_name]
-    else:
-        # 回退到默认用户
-        test_user = {{
-            'username': config['environment_variables'].get('admin_username'),
-            'password': config['environment_variables'].get('admin_password')
-        }}"""
+    def _build_plan(self, case: TestUICase, steps: List[TestUIStep], elements: Dict[int, TestUIElement],
+                    role_names: List[str]) -> Dict:
+        """
+        构建用例步骤计划
+        
+        输入数据保留 {{变量}} 占位符，由 plan_runner 在执行时按测试用户和环境变量替换，
+        与生成脚本中的 f-string 替换规则一致
+        """
+        plan_steps = []
+        for idx, step in enumerate(steps, 1):
+            if step.action not in plan_runner.ACTIONS:
+                logger.warn(f"用例 {case.id} 步骤 {idx} 的操作类型未知，执行时将跳过: {step.action}")
+            element = elements.get(step.element_id) if step.element_id else None
+            plan_steps.append({
+                'number': idx,
+                'action': step.action,
+                'description': step.description,
+                'selector': self.selector_builder.build_selector(
+                    element.selector_type, element.selector_value
+                ) if element else '',
+                'input': step.input_data or None,
+                'wait_time': step.wait_time or 0
+            })
+        
+        return {
+            'version': plan_runner.PLAN_VERSION,
+            'case': {
+                'id': case.id,
+                'name': case.name,
+                'priority': getattr(case.priority, 'value', case.priority),
+                'module': case.module or ''
+            },
+            # 与生成脚本一致，只使用第一个权限角色
+            'role': role_names[0] if role_names else None,
+            'login_steps': self._detect_login_prefix(steps),
+            'steps': plan_steps
+        }
+    
+    def _cache_key(self, case: TestUICase, steps: List[TestUIStep],
+                   elements: Dict[int, TestUIElement], role_names: List[str]) -> str:
+        """计算脚本缓存键：用例、步骤、元素选择器、权限角色和模板版本的哈希"""
+        payload = {
+            'template_version': TEMPLATE_VERSION,
+            'case': [case.id, case.name, str(case.priority), case.module],
+            'roles': role_names,
+            'steps': [
+                [step.action, step.input_data, step.wait_time, step.description, step.element_id]
+                for step in steps
+            ],
+            'elements': {
+                str(element_id): [str(element.selector_type), element.selector_value]
+                for element_id, element in sorted(elements.items())
+            }
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
     
-    async def _generate_steps_code(self, steps: List[TestUIStep]) -> str:
-        """生成步骤执行代码"""
+    async def _generate_steps_code(self, steps: List[TestUIStep],
+                                   elements: Optional[Dict[int, TestUIElement]] = None) -> str:
+        """生成步骤执行代码（elements 为预先查询的元素，未提供时批量查询）"""
+        if elements is None:
+            elements = await self._load_elements(steps)
+        return self._build_steps_code(steps, elements)
+    
+    def _build_steps_code(self, steps: List[TestUIStep], elements: Dict[int, TestUIElement]) -> str:
+        """根据步骤和已查询的元素生成步骤执行代码"""
         steps_code_list = []
         
         for idx, step in enumerate(steps, 1):
-            step_code = await self._generate_single_step_code(step, idx)
+            step_code = self._generate_single_step_code(step, idx, elements)
             steps_code_list.append(step_code)
         
-        return '\n\n'.join(steps_code_list)
+        login_steps = self._detect_login_prefix(steps)
+        if not login_steps:
+            return '\n\n'.join(steps_code_list)
+        
+        # 登录步骤：复用缓存登录态时跳过，否则照常执行并刷新缓存
+        skipped_logs = '\n'.join(
+            f'        logger.log_step({idx}, "{step.action}", "{step.description}", "跳过", 0)'
+            for idx, step in enumerate(steps[:login_steps], 1)
+        )
+        login_code = textwrap.indent('\n\n'.join(steps_code_list[:login_steps]), '    ')
+        prefix_code = f"""    if run.auth_restored:
+        # 已复用缓存的登录态，跳过登录步骤 1-{login_steps}
+        await run.restore_session()
+{skipped_logs}
+    else:
+{login_code}
+        if run.auth_cache:
+            # 登录态缺失或已过期，登录后刷新缓存供其他用例使用
+            await run.save_auth_state()"""
+        
+        return '\n\n'.join([prefix_code] + steps_code_list[login_steps:])
+    
+    def _detect_login_prefix(self, steps: List[TestUIStep]) -> int:
+        """
+        识别用例开头的登录步骤
+        
+        规则：首个步骤为 navigate，且在前几个步骤内输入了 {{password}}，
+        其后的第一个 click 视为提交登录
+        
+        Returns:
+            登录步骤数量，未识别到时返回 0
+        """
+        if not steps or steps[0].action != 'navigate':
+            return 0
+        
+        candidates = steps[:MAX_LOGIN_PREFIX_STEPS]
+        for idx, step in enumerate(candidates):
+            if step.action == 'type' and '{{password}}' in (step.input_data or ''):
+                for submit_idx in range(idx + 1, len(candidates)):
+                    if candidates[submit_idx].action == 'click':
+                        return submit_idx + 1
+                return 0
+        return 0
     
-    async def _generate_single_step_code(self, step: TestUIStep, step_number: int) -> str:
+    def _generate_single_step_code(self, step: TestUIStep, step_number: int,
+                                   elements: Dict[int, TestUIElement]) -> str:
         """生成单个步骤的代码"""
         # 获取元素选择器
         selector = ""
         if step.element_id:
-            element = await TestUIElement.get_or_none(id=step.element_id)
+            element = elements.get(step.element_id)
             if element:
                 selector = self.selector_builder.build_selector(
                     element.selector_type,
@@ -141,21 +419,21 @@ class ScriptGenerator:
         )
         
         # 组装完整的步骤代码（包含异常处理和日志记录）
-        step_template = f"""                # 步骤 {step_number}: {step.description}
-                step_start = datetime.now()
-                try:
-                    {action_code}
-                    step_duration = int((datetime.now() - step_start).total_seconds() * 1000)
-                    logger.log_step({step_number}, "{step.action}", "{step.description}", "通过", step_duration, step_start_time=step_start)
-                    if DEBUG:
-                        print(f"  ✓ 步骤 {step_number}: {step.description}")
-                except Exception as e:
-                    step_duration = int((datetime.now() - step_start).total_seconds() * 1000)
-                    screenshot_path = None
-                    if execute_config.get('auto_screenshot', True):
-                        screenshot_path = await take_screenshot(page, {step_number})
-                    logger.log_step({step_number}, "{step.action}", "{step.description}", "失败", step_duration, str(e), screenshot_path, step_start)
-                    raise"""
+        step_template = f"""    # 步骤 {step_number}: {step.description}
+    step_start = datetime.now()
+    try:
+        {action_code}
+        step_duration = int((datetime.now() - step_start).total_seconds() * 1000)
+        logger.log_step({step_number}, "{step.action}", "{step.description}", "通过", step_duration, step_start_time=step_start)
+        if runtime.DEBUG:
+            print(f"  ✓ 步骤 {step_number}: {step.description}")
+    except Exception as e:
+        step_duration = int((datetime.now() - step_start).total_seconds() * 1000)
+        screenshot_path = None
+        if execute_config.get('auto_screenshot', True):
+            screenshot_path = await run.take_screenshot({step_number}, failure=True)
+        logger.log_step({step_number}, "{step.action}", "{step.description}", "失败", step_duration, str(e), screenshot_path, step_start)
+        raise"""
         
         return step_template
     
@@ -190,7 +468,7 @@ class ScriptGenerator:
         # 处理等待时间
         wait_code = ""
         if wait_time and wait_time > 0:
-            wait_code = f"await page.wait_for_timeout({wait_time})\n                    "
+            wait_code = f'await run.step_wait("{action}", "{selector}", {wait_time})\n        '
         
         # 根据操作类型生成代码
         action_map = {
@@ -198,11 +476,11 @@ class ScriptGenerator:
             'click': f'{wait_code}await page.click("{selector}")',
             'type': f'{wait_code}await page.fill("{selector}", {input_data})',
             'select': f'{wait_code}await page.select_option("{selector}", {input_data})',
-            'wait': f'await page.wait_for_timeout({input_data if input_data != "None" else 1000})',
+            'wait': f'await run.step_wait("wait", "", {input_data if input_data != "None" else 1000})',
             'wait_for_element': f'{wait_code}await page.wait_for_selector("{selector}")',
-            'assert_text': f'{wait_code}actual_text = await page.text_content("{selector}")\n                    expected_text = {input_data}\n                    assert actual_text == expected_text, f"期望文本 \'{{expected_text}}\', 实际文本 \'{{actual_text}}\'"',
-            'assert_exists': f'{wait_code}is_visible = await page.is_visible("{selector}")\n                    assert is_visible, f"元素 \'{selector}\' 不可见"',
-            'screenshot': f'{wait_code}await take_screenshot(page, 0)',
+            'assert_text': f'{wait_code}actual_text = await page.text_content("{selector}")\n        expected_text = {input_data}\n        assert actual_text == expected_text, f"期望文本 \'{{expected_text}}\', 实际文本 \'{{actual_text}}\'"',
+            'assert_exists': f'{wait_code}is_visible = await page.is_visible("{selector}")\n        assert is_visible, f"元素 \'{selector}\' 不可见"',
+            'screenshot': f'{wait_code}await run.take_screenshot(0)',
             'hover': f'{wait_code}await page.hover("{selector}")',
             'clear': f'{wait_code}await page.fill("{selector}", "")',
             'execute_script': f'{wait_code}await page.evaluate({input_data})',
@@ -213,7 +491,7 @@ class ScriptGenerator:
         return action_map.get(action, f'# Unknown action: {action}')
     
     def _render_template(self, **kwargs) -> str:
-        """渲染脚本模板"""
+        """渲染脚本模板（脚本只包含用例步骤，执行逻辑由同目录下的 case_runtime.py 提供）"""
         template = '''"""
 测试用例自动生成脚本
 用例ID: {case_id}
@@ -222,240 +500,70 @@ class ScriptGenerator:
 模块: {module}
 生成时间: {generated_time}
 
-执行方式：
-    python {script_filename}
+执行方式（case_runtime.py 需与脚本在同一目录下）：
+    python scripts/<脚本文件名>.py
     
 环境变量：
     DEBUG=1 启用详细日志
     HEADLESS=0 使用有头模式
     SLOW_MO=500 减慢操作速度
+    CASE_ATTEMPT=2 第几次执行（失败重试时由调度器设置）
 """
 
 import asyncio
-import json
-import os
-import sys
-import traceback
 from datetime import datetime
 from pathlib import Path
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+
+import case_runtime as runtime
 
 # ==================== 全局配置 ====================
 
 SCRIPT_DIR = Path(__file__).parent
 WORK_DIR = SCRIPT_DIR.parent
-CONFIG_PATH = WORK_DIR / "config.json"
-LOG_PATH = WORK_DIR / "logs" / "case_{case_id:03d}_{sequence:03d}.json"
-SCREENSHOT_DIR = WORK_DIR / "screenshots"
+# 日志文件与脚本同名（case_<用例ID>_<序号>），脚本内容与执行序号无关，可被缓存复用
+LOG_PATH = WORK_DIR / "logs" / f"{{Path(__file__).stem}}.jsonl"
 
 # 用例信息
-CASE_ID = {case_id}
-CASE_NAME = "{case_name}"
-CASE_PRIORITY = "{priority}"
-CASE_MODULE = "{module}"
+CASE = {{
+    'id': {case_id},
+    'name': "{case_name}",
+    'priority': "{priority}",
+    'module': "{module}"
+}}
 
-# 环境变量配置
-DEBUG = os.getenv('DEBUG', '0') == '1'
-HEADLESS = os.getenv('HEADLESS', '1') == '1'
-SLOW_MO = int(os.getenv('SLOW_MO', '0'))
+# 用例的权限角色（使用第一个角色，没有对应的测试用户时使用环境变量中的默认用户）
+ROLE = {role}
 
-# ==================== 日志记录 ====================
+# ==================== 用例步骤 ====================
 
-class ExecutionLogger:
-    """执行日志记录器"""
-    
-    def __init__(self, log_path):
-        self.log_path = log_path
-        self.log_data = {{
-            "case_info": {{
-                "case_id": CASE_ID,
-                "case_name": CASE_NAME,
-                "priority": CASE_PRIORITY,
-                "module": CASE_MODULE
-            }},
-            "execution_info": {{
-                "start_time": None,
-                "end_time": None,
-                "duration": 0,
-                "status": "执行中",
-                "error_message": None
-            }},
-            "steps": [],
-            "retry_count": 0,
-            "screenshots": []
-        }}
-    
-    def start_execution(self):
-        """记录执行开始"""
-        self.log_data["execution_info"]["start_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self._write_log()
-    
-    def end_execution(self, status, error_message=None):
-        """记录执行结束"""
-        end_time = datetime.now()
-        start_time = datetime.strptime(
-            self.log_data["execution_info"]["start_time"],
-            "%Y-%m-%d %H:%M:%S"
-        )
-        duration = int((end_time - start_time).total_seconds())
-        
-        self.log_data["execution_info"]["end_time"] = end_time.strftime("%Y-%m-%d %H:%M:%S")
-        self.log_data["execution_info"]["duration"] = duration
-        self.log_data["execution_info"]["status"] = status
-        self.log_data["execution_info"]["error_message"] = error_message
-        self._write_log()
-    
-    def log_step(self, step_number, action, description, status, duration, error_message=None, screenshot_path=None, step_start_time=None):
-        """记录步骤执行"""
-        # 计算结束时间
-        end_time = datetime.now()
-        if step_start_time:
-            start_time = step_start_time
-        else:
-            # 如果没有传入开始时间，通过 duration 回推
-            from datetime import timedelta
-            start_time = end_time - timedelta(milliseconds=duration)
-        
-        step_log = {{
-            "step_number": step_number,
-            "action": action,
-            "description": description,
-            "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "end_time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "duration": duration,
-            "status": status,
-            "error_message": error_message,
-            "screenshot_path": screenshot_path
-        }}
-        self.log_data["steps"].append(step_log)
-        
-        if screenshot_path:
-            self.log_data["screenshots"].append(screenshot_path)
-        
-        self._write_log()
-    
-    def increment_retry(self):
-        """增加重试计数"""
-        self.log_data["retry_count"] += 1
-        self._write_log()
-    
-    def _write_log(self):
-        """写入日志文件"""
-        os.makedirs(self.log_path.parent, exist_ok=True)
-        with open(self.log_path, 'w', encoding='utf-8') as f:
-            json.dump(self.log_data, f, ensure_ascii=False, indent=2)
-
-# ==================== 配置加载 ====================
-
-def load_config():
-    """加载配置文件"""
-    try:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"加载配置文件失败: {{e}}")
-        sys.exit(1)
-
-# ==================== 截图工具 ====================
+async def steps(run):
+    """按顺序执行用例步骤，步骤失败时截图、记录日志后抛出异常"""
+    page = run.page
+    logger = run.logger
+    config = run.config
+    execute_config = run.execute_config
+    test_user = run.test_user
 
-async def take_screenshot(page, step_number):
-    """截取屏幕截图"""
-    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    filename = f"case_{{{{CASE_ID:03d}}}}_step_{{{{step_number:03d}}}}_{{{{timestamp}}}}.png"
-    screenshot_path = SCREENSHOT_DIR / filename
-    # 截图时设置较长的超时时间，避免因字体加载等原因导致超时
-    await page.screenshot(path=str(screenshot_path), timeout=10000)
-    return str(screenshot_path.relative_to(WORK_DIR))
+{steps_execution_code}
 
-# ==================== 主测试函数 ====================
+# ==================== 执行入口 ====================
 
-async def test_case_{case_id}():
-    """用例主函数"""
-    logger = ExecutionLogger(LOG_PATH)
-    logger.start_execution()
-    
-    config = load_config()
-    execute_config = config['execute_config']
-    
-    # 获取测试用户（如果配置了权限）
-    {user_loading_code}
-    
-    try:
-        async with async_playwright() as p:
-            # 启动浏览器
-            browser_type = execute_config.get('browser', 'chromium')
-            browser_args = {{
-                'headless': HEADLESS if not DEBUG else False,
-                'slow_mo': SLOW_MO
-            }}
-            
-            if browser_type == 'chromium':
-                browser = await p.chromium.launch(**browser_args)
-            elif browser_type == 'firefox':
-                browser = await p.firefox.launch(**browser_args)
-            elif browser_type == 'webkit':
-                browser = await p.webkit.launch(**browser_args)
-            else:
-                browser = await p.chromium.launch(**browser_args)
-            
-            # 创建页面
-            viewport = execute_config.get('viewport', {{'width': 1920, 'height': 1080}})
-            page = await browser.new_page(viewport=viewport)
-            
-            # 设置默认超时
-            default_timeout = execute_config.get('timeout', 30000)
-            page.set_default_timeout(default_timeout)
-            
-            try:
-                {steps_execution_code}
-                
-                # 所有步骤通过
-                logger.end_execution("通过")
-                print(f"✓ 用例执行成功: {{CASE_NAME}}")
-                sys.exit(0)
-                
-            except Exception as step_error:
-                # 步骤执行失败
-                error_msg = f"{{type(step_error).__name__}}: {{str(step_error)}}"
-                logger.end_execution("失败", error_msg)
-                
-                # 失败截图
-                if execute_config.get('auto_screenshot', True):
-                    try:
-                        screenshot_path = await take_screenshot(page, 999)
-                        logger.log_data["screenshots"].append(screenshot_path)
-                        logger._write_log()
-                    except:
-                        pass
-                
-                print(f"✗ 用例执行失败: {{CASE_NAME}}")
-                print(f"  错误信息: {{error_msg}}")
-                if DEBUG:
-                    traceback.print_exc()
-                sys.exit(1)
-            
-            finally:
-                await browser.close()
+async def run_case(browser, attempt=1):
+    """
+    在给定的浏览器中执行用例（浏览器由调用方管理，可被常驻的浏览器工作进程复用）
     
-    except Exception as e:
-        # 浏览器启动失败
-        error_msg = f"浏览器初始化失败: {{{{str(e)}}}}"
-        logger.end_execution("失败", error_msg)
-        print(f"✗ {{{{error_msg}}}}")
-        if DEBUG:
-            traceback.print_exc()
-        sys.exit(1)
+    Returns:
+        执行结果字典 {{'status': 'passed'/'failed', 'error': ...}}
+    """
+    return await runtime.run_case(browser, WORK_DIR, CASE, ROLE, LOG_PATH, steps, attempt)
 
-# ==================== 脚本入口 ====================
 
 if __name__ == "__main__":
-    print(f"开始执行用例: {{CASE_NAME}} (ID: {{CASE_ID}})")
-    asyncio.run(test_case_{case_id}())
+    print(f"开始执行用例: {{CASE['name']}} (ID: {{CASE['id']}})")
+    asyncio.run(runtime.run_standalone(WORK_DIR, CASE, LOG_PATH, run_case))
 '''
         
         # 填充模板变量
         kwargs['generated_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        kwargs['script_filename'] = f"case_{kwargs['case_id']:03d}_{kwargs['sequence']:03d}.py"
         
         return template.format(**kwargs)
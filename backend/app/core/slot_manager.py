@@ -0,0 +1,169 @@
+"""
+全局执行槽位管理
+本机所有测试单共享一个同时执行用例（浏览器）数的上限（settings.UI_TEST_MAX_BROWSERS），
+每个用例执行前领取一个槽位，执行完归还；槽位不足时排队，空出的槽位优先分给占用槽位最少的测试单。
+常驻浏览器（浏览器进程池的工作进程）和预登录的浏览器在存活期间同样各占一个槽位
+"""
+import asyncio
+import itertools
+import multiprocessing
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from app.settings import settings
+
+
+class SlotManager:
+    """
+    进程内执行槽位管理器
+
+    - 每个测试单另有自己的并发上限（max_workers），槽位管理器只负责全局上限
+    - 公平分配：有多个测试单在排队时，空出的槽位分给当前占用槽位最少的测试单，
+      占用相同时分给等待最久的请求，新开始的测试单不会被长时间占满槽位的测试单饿死
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.in_use = 0
+        self._held: Dict[int, int] = {}
+        self._limits: Dict[int, int] = {}
+        self._waiters: Dict[int, Deque[Tuple[int, asyncio.Future]]] = {}
+        self._watchers: Dict[int, Callable[[], None]] = {}
+        self._sequence = itertools.count()
+
+    def register(self, task_id: int, max_workers: int):
+        """登记使用槽位的测试单（max_workers 仅用于展示）"""
+        self._limits[task_id] = max_workers
+        self._held.setdefault(task_id, 0)
+        self._waiters.setdefault(task_id, deque())
+
+    def unregister(self, task_id: int):
+        """移除测试单：结束仍在排队的请求，归还未释放的槽位"""
+        self.abort(task_id)
+        self.in_use -= self._held.pop(task_id, 0)
+        self._limits.pop(task_id, None)
+        self._waiters.pop(task_id, None)
+        self._watchers.pop(task_id, None)
+        self._wake()
+
+    async def acquire(self, task_id: int) -> bool:
+        """
+        领取一个槽位
+
+        Returns:
+            是否领取成功，测试单被取消（abort）时返回 False
+        """
+        if self.in_use < self.capacity and not any(self._waiters.values()):
+            self._grant(task_id)
+            return True
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(task_id, deque()).append((next(self._sequence), future))
+        for other, callback in list(self._watchers.items()):
+            if other != task_id:
+                callback()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.result():
+                # 已分到槽位但等待方被取消，归还槽位
+                self.release(task_id)
+            else:
+                self._discard(task_id, future)
+            raise
+
+    def try_acquire(self, task_id: int) -> bool:
+        """不等待地领取一个槽位，没有空闲槽位或有请求在排队时返回 False"""
+        if self.in_use < self.capacity and not any(self._waiters.values()):
+            self._grant(task_id)
+            return True
+        return False
+
+    def should_yield(self, task_id: int, releasing: int = 0) -> bool:
+        """
+        是否应让出一个长期占用的槽位（常驻浏览器）
+
+        有测试单在排队且其占用比本测试单少 2 个以上时返回 True，让出后双方份额相差不超过 1，避免来回让出
+
+        Args:
+            releasing: 本测试单已决定让出、尚未归还的槽位数
+        """
+        held = self._held.get(task_id, 0) - releasing
+        return any(waiters and self._held.get(other, 0) + 1 < held
+                   for other, waiters in self._waiters.items() if other != task_id)
+
+    def watch(self, task_id: int, callback: Callable[[], None]):
+        """登记让出槽位的回调：其他测试单开始排队时调用（常驻浏览器据此结束超出份额的空闲进程）"""
+        self._watchers[task_id] = callback
+
+    def unwatch(self, task_id: int):
+        self._watchers.pop(task_id, None)
+
+    def release(self, task_id: int):
+        """归还一个槽位"""
+        if self._held.get(task_id, 0) > 0:
+            self._held[task_id] -= 1
+            self.in_use -= 1
+        self._wake()
+
+    def abort(self, task_id: int):
+        """取消测试单时结束其所有排队中的请求（acquire 返回 False）"""
+        for _, future in self._waiters.get(task_id) or ():
+            if not future.done():
+                future.set_result(False)
+        if task_id in self._waiters:
+            self._waiters[task_id] = deque()
+
+    def _grant(self, task_id: int):
+        self._held[task_id] = self._held.get(task_id, 0) + 1
+        self.in_use += 1
+
+    def _discard(self, task_id: int, future: asyncio.Future):
+        waiters = self._waiters.get(task_id)
+        if waiters:
+            self._waiters[task_id] = deque(item for item in waiters if item[1] is not future)
+
+    def _wake(self):
+        """把空出的槽位分给占用最少的测试单（相同时分给等待最久的请求）"""
+        while self.in_use < self.capacity:
+            candidates = [(self._held.get(task_id, 0), waiters[0][0], task_id)
+                          for task_id, waiters in self._waiters.items() if waiters]
+            if not candidates:
+                return
+            _, _, task_id = min(candidates)
+            _, future = self._waiters[task_id].popleft()
+            if future.done():
+                continue
+            self._grant(task_id)
+            future.set_result(True)
+
+    def waiting(self, task_id: int) -> int:
+        return len(self._waiters.get(task_id) or ())
+
+    def usage(self, task_id: Optional[int] = None) -> Dict:
+        """槽位使用情况；指定 task_id 时只返回该测试单的占用"""
+        if task_id is not None:
+            return {
+                'held': self._held.get(task_id, 0),
+                'waiting': self.waiting(task_id),
+                'max_workers': self._limits.get(task_id),
+                'capacity': self.capacity,
+                'in_use': self.in_use
+            }
+        return {
+            'capacity': self.capacity,
+            'in_use': self.in_use,
+            'tasks': [
+                {
+                    'task_id': task_id,
+                    'held': self._held.get(task_id, 0),
+                    'waiting': self.waiting(task_id),
+                    'max_workers': max_workers,
+                    # 一个槽位都没有分到、仍在排队的测试单
+                    'queued': self._held.get(task_id, 0) == 0 and self.waiting(task_id) > 0
+                }
+                for task_id, max_workers in self._limits.items()
+            ]
+        }
+
+
+slot_manager = SlotManager(settings.UI_TEST_MAX_BROWSERS or multiprocessing.cpu_count())
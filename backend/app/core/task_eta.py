@@ -0,0 +1,218 @@
+"""
+测试单执行时长预估
+执行前按用例历史耗时和并发数预估总时长；执行中结合已完成用例的实际耗时和吞吐量修正剩余时间
+"""
+import multiprocessing
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.core.case_history import CaseDurationHistory, simulate_makespan, DEFAULT_HISTORY_RUNS
+from app.models.ui_test import (
+    TestUITaskContent, TestUICasesSuitesRelation, TestUIReport, TestUIExecutionJournal, TaskContentType, TaskStatus
+)
+
+# 已完成用例耗时修正系数的先验权重（相当于多少个按历史耗时完成的用例）
+PRIOR_CASES = 3
+
+
+def resolve_max_workers(execute_config: Dict) -> int:
+    """解析并发数配置"""
+    max_workers = execute_config.get('max_workers', 4)
+    if max_workers == 'auto':
+        max_workers = multiprocessing.cpu_count()
+    return max(1, int(max_workers))
+
+
+def planned_workers(execute_config: Dict) -> int:
+    """执行时主流程的并发数（串行模式为 1）"""
+    if execute_config.get('parallel_mode', 'process') == 'serial':
+        return 1
+    return resolve_max_workers(execute_config)
+
+
+def load_history(execute_config: Dict) -> CaseDurationHistory:
+    """按执行配置（history_runs、default_case_duration）创建历史耗时估算"""
+    return CaseDurationHistory(
+        history_runs=int(execute_config.get('history_runs', DEFAULT_HISTORY_RUNS)),
+        default_duration=execute_config.get('default_case_duration')
+    )
+
+
+def end_pause(task):
+    """结束暂停（继续、取消或结束执行时调用）：本次暂停的时长计入累计暂停时长，不计入执行时长"""
+    if task.paused_time:
+        paused = (datetime.now() - task.paused_time.replace(tzinfo=None)).total_seconds()
+        task.paused_seconds = (task.paused_seconds or 0) + max(0, int(paused))
+        task.paused_time = None
+
+
+class TaskEta:
+    """
+    执行中的测试单剩余时间预估
+
+    每个用例完成时重新计算并缓存剩余时间，查询时只扣除缓存之后经过的时间：
+    - 历史预估：未开始的用例按历史耗时（乘以修正系数）依次派发到并发槽位，正在执行的用例占用槽位直到其预估剩余耗时结束；
+      修正系数为本次已完成用例的实际耗时与历史耗时之比，用于反映当前环境整体偏快或偏慢
+    - 吞吐预估：剩余用例数 / 本次执行以来的完成速度
+    两者按完成比例加权：刚开始时以历史预估为主，完成越多越依赖实际吞吐，
+    且不早于正在执行的用例的预估结束时间
+    """
+
+    def __init__(self, estimates: Dict[int, float], pending: Iterable[int], workers: int):
+        """
+        Args:
+            estimates: 测试单所有用例的历史估算耗时（秒）
+            pending: 本次待执行的用例ID（按派发顺序）
+            workers: 并发数
+        """
+        self.estimates = estimates
+        self.workers = max(1, workers)
+        self.pending: Dict[int, float] = {case_id: estimates.get(case_id, 0) for case_id in pending}
+        self.running: Dict[int, float] = {}
+        self.started = time.monotonic()
+        self.finished_cases = 0
+        self.actual_total = 0.0
+        self.estimated_total = 0.0
+        self.remaining = 0.0
+        self.updated = self.started
+        self._recompute()
+
+    def case_started(self, case_id: int):
+        self.pending.pop(case_id, None)
+        self.running[case_id] = time.monotonic()
+
+    def case_finished(self, case_id: int):
+        started = self.running.pop(case_id, None)
+        self.pending.pop(case_id, None)
+        if started is not None:
+            self.finished_cases += 1
+            self.actual_total += time.monotonic() - started
+            self.estimated_total += self.estimates.get(case_id, 0)
+        self._recompute()
+
+    def case_skipped(self, case_id: int):
+        """用例未执行（取消）"""
+        self.running.pop(case_id, None)
+        self.pending.pop(case_id, None)
+        self._recompute()
+
+    def add_cases(self, case_ids: Iterable[int], workers: int):
+        """失败重试轮次：重新加入待执行的用例，并发数改为重试阶段的并发数"""
+        for case_id in case_ids:
+            self.pending[case_id] = self.estimates.get(case_id, 0)
+        self.workers = max(1, workers)
+        self._recompute()
+
+    def set_workers(self, workers: int):
+        """并发数变化（自适应并发调整）"""
+        self.workers = max(1, workers)
+        self._recompute()
+
+    def _correction(self) -> float:
+        prior = PRIOR_CASES * sum(self.estimates.values()) / max(1, len(self.estimates))
+        if prior <= 0:
+            return 1.0
+        return (self.actual_total + prior) / (self.estimated_total + prior)
+
+    def _recompute(self):
+        now = time.monotonic()
+        correction = self._correction()
+        busy = [max(0.0, self.estimates.get(case_id, 0) * correction - (now - started))
+                for case_id, started in self.running.items()]
+        remaining = simulate_makespan((d * correction for d in self.pending.values()), self.workers, busy)
+
+        left = len(self.pending) + len(self.running)
+        elapsed = now - self.started
+        if self.finished_cases and elapsed > 0 and left:
+            finished_ratio = self.finished_cases / (self.finished_cases + left)
+            throughput_remaining = left / (self.finished_cases / elapsed)
+            remaining = (1 - finished_ratio) * remaining + finished_ratio * throughput_remaining
+
+        # 吞吐预估不区分用例长短，收尾阶段不能早于正在执行的用例的预估结束时间
+        self.remaining = max([remaining] + busy)
+        self.updated = now
+
+    def remaining_time(self) -> int:
+        """剩余时间（秒）"""
+        return int(max(0.0, self.remaining - (time.monotonic() - self.updated)))
+
+
+async def estimate_tasks(tasks: List, completed: Optional[Dict[int, Set[int]]] = None) -> Dict[int, Optional[int]]:
+    """
+    批量预估测试单的执行时长（秒），用于执行前评估并发数
+
+    按测试单内容展开用例，用例耗时取历史 p75（无历史的用例取默认估算），按各测试单的并发数模拟派发；
+    没有用例的测试单返回 None
+
+    Args:
+        completed: 各测试单已完成的用例ID，只预估其余用例
+    """
+    completed = completed or {}
+    if not tasks:
+        return {}
+    contents = await TestUITaskContent.filter(
+        test_task_id__in=[t.id for t in tasks]
+    ).order_by('sort_order').values('test_task_id', 'item_type', 'item_id')
+    suite_ids = {c['item_id'] for c in contents if c['item_type'] == TaskContentType.SUITE}
+    suite_cases: Dict[int, List[int]] = {}
+    if suite_ids:
+        relations = await TestUICasesSuitesRelation.filter(
+            test_suite_id__in=suite_ids
+        ).order_by('sort_order').values_list('test_suite_id', 'test_case_id')
+        for suite_id, case_id in relations:
+            suite_cases.setdefault(suite_id, []).append(case_id)
+
+    task_cases: Dict[int, Dict[int, None]] = {t.id: {} for t in tasks}
+    for content in contents:
+        case_ids = task_cases[content['test_task_id']]
+        if content['item_type'] == TaskContentType.SUITE:
+            case_ids.update(dict.fromkeys(suite_cases.get(content['item_id'], [])))
+        else:
+            case_ids[content['item_id']] = None
+
+    result = {}
+    all_case_ids = [case_id for case_ids in task_cases.values() for case_id in case_ids]
+    # 历史耗时只查询一次；测试单各自的 history_runs/default_case_duration 在内存中应用
+    history = await load_history({'history_runs': max(
+        [int((t.execute_config or {}).get('history_runs', DEFAULT_HISTORY_RUNS)) for t in tasks]
+    )}).load(all_case_ids)
+    for task in tasks:
+        case_ids = list(task_cases[task.id])
+        if not case_ids:
+            result[task.id] = None
+            continue
+        done = completed.get(task.id)
+        if done:
+            case_ids = [case_id for case_id in case_ids if case_id not in done]
+        execute_config = task.execute_config or {}
+        task_history = load_history(execute_config)
+        task_history.history = {case_id: history.history[case_id][:task_history.history_runs]
+                                for case_id in case_ids if case_id in history.history}
+        durations = list(task_history.estimates(case_ids).values())
+        if execute_config.get('schedule_policy') == 'longest_first':
+            durations.sort(reverse=True)
+        result[task.id] = int(simulate_makespan(durations, planned_workers(execute_config)))
+    return result
+
+
+async def estimate_remaining(tasks: List) -> Dict[int, Optional[int]]:
+    """
+    批量预估调度器不在运行的测试单的剩余执行时长（秒）
+
+    已暂停（调度器已退出）或中断的测试单按最近一次执行的执行日志簿扣除已完成的用例，
+    继续执行时只会执行其余用例；未执行的测试单为完整的执行前预估
+    """
+    started = [t.id for t in tasks if t.start_time and t.status in (TaskStatus.RUNNING, TaskStatus.PAUSED)]
+    completed: Dict[int, Set[int]] = {}
+    if started:
+        latest: Dict[int, int] = {}
+        for report_id, task_id in await TestUIReport.filter(
+            test_task_id__in=started
+        ).order_by('id').values_list('id', 'test_task_id'):
+            latest[task_id] = report_id
+        for task_id, case_id in await TestUIExecutionJournal.filter(
+            test_report_id__in=list(latest.values()) or [0]
+        ).values_list('test_task_id', 'case_id'):
+            completed.setdefault(task_id, set()).add(case_id)
+    return await estimate_tasks(tasks, completed)
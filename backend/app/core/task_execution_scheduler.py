@@ -2,11 +2,13 @@
 测试单执行调度器
 负责协调整个测试单的执行流程
 """
-import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import asyncio
+import itertools
+import json
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Awaitable, Tuple
 from decimal import Decimal
 
 from app.models.ui_test import (
@@ -14,16 +16,35 @@ from app.models.ui_test import (
     TestUIReport,
     TestUITaskContent,
     TestUICasesSuitesRelation,
+    TestUICaseExecutionRecord,
     TaskStatus,
     TaskContentType
 )
+from app.core import case_log, har_store
+from app.core.case_history import (
+    CaseDurationHistory, simulate_makespan, TIMEOUT_ERROR, TIMEOUT_FACTOR, TIMEOUT_FLOOR, TIMEOUT_MIN_SAMPLES
+)
+from app.core.task_eta import TaskEta, end_pause, load_history, resolve_max_workers
 from app.core.config_generator import ConfigGenerator
 from app.core.script_generator import ScriptGenerator
-from app.core.result_collector import ResultCollector
+from app.core.result_collector import ResultCollector, ResultStream
 from app.core.case_executor import CaseExecutor
+from app.core.browser_pool import BrowserWorkerPool
+from app.core.agent_queue import AgentDispatcher
+from app.core.auth_state_manager import AuthStateManager
+from app.core.execution_control import ExecutionControl, execution_registry
+from app.core.execution_journal import ExecutionJournal
+from app.core.slot_manager import slot_manager
+from app.core.adaptive_concurrency import AdaptiveConcurrency, max_adaptive_workers
+from app.core.affinity_sharding import Shard, ShardPlan
+from app.core.trace_retention import DEFAULT_TRACE_MAX_MB, TraceRetention
 from app.log import logger
 
 
+# 脚本清单文件（工作目录下），断点续跑时据此复用已生成的脚本
+MANIFEST_FILE = 'manifest.json'
+
+
 class TaskExecutionScheduler:
     """
     测试单执行调度器
@@ -35,7 +56,19 @@ class TaskExecutionScheduler:
         self.script_gen = ScriptGenerator()
         self.result_collector = ResultCollector()
         self.case_executor = CaseExecutor()
+        self.auth_manager = AuthStateManager()
         self.log_file_path = None  # 日志文件路径
+        self.control: Optional[ExecutionControl] = None  # 取消/暂停控制句柄
+        self.journal: Optional[ExecutionJournal] = None  # 执行日志簿（断点续跑）
+        self.results: Optional[ResultStream] = None  # 执行结果流式写入
+        self.work_dir: Optional[Path] = None
+        self.eta: Optional[TaskEta] = None  # 剩余时间预估
+        self.slot_task_id: Optional[int] = None  # 本机执行时占用全局执行槽位的测试单ID
+        self.slots_by_worker = False  # 槽位由常驻浏览器工作进程占用（进程池执行），派发用例时不再领取
+        self.concurrency: Optional[AdaptiveConcurrency] = None  # max_workers='auto' 时的自适应并发
+        self.timeout_events: List[Dict] = []  # 本次执行中超时的用例及其超时时间
+        self.traces: Optional[TraceRetention] = None  # 失败 trace 的存储上限
+        self.progress_executed = 0  # 已写入进度的完成用例数，进度只前进不回退
     
     def _add_log(self, message: str, level: str = "INFO"):
         """添加日志并写入文件"""
@@ -69,69 +102,48 @@ class TaskExecutionScheduler:
         
         return self.log_file_path
     
-    async def execute_task(self, task_id: int) -> Dict:
+    async def execute_task(self, task_id: int, resume: bool = False) -> Dict:
         """
         执行测试单
         
         Args:
             task_id: 测试单ID
+            resume: 是否断点续跑（复用上一次执行的工作目录、脚本和报告，只执行未完成的用例）
         
         Returns:
             执行结果摘要
         """
+        # 登记控制句柄，供取消/暂停接口通知本调度器
+        self.control = execution_registry.register(task_id)
         try:
             # 1. 查询测试单信息
             task = await TestUITask.get(id=task_id)
             
-            # 2. 创建工作目录
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            work_dir = Path('test_executions') / f'task_{task_id}_{timestamp}'
-            work_dir.mkdir(parents=True, exist_ok=True)
-            
-            logger.info(f"创建工作目录: {work_dir}")
-            
-            # 2.1 创建日志文件并保存路径
-            log_file_path = self._create_log_file(work_dir)
-            task.log_file_path = log_file_path
-            await task.save(update_fields=['log_file_path'])
-            
-            self._add_log(f"开始执行测试单: task_id={task_id}")
-            
-            # 3. 获取用例列表
-            case_ids = await self._expand_task_contents(task_id)
-            
-            self._add_log(f"测试单包含 {len(case_ids)} 个用例")
-            logger.info(f"测试单包含 {len(case_ids)} 个用例")
-            
-            # 4. 生成配置文件
-            config = await self.config_gen.generate_config(task, case_ids, work_dir)
-            self._add_log("生成配置文件完成")
-            
-            # 5. 生成脚本文件
-            scripts = []
-            for idx, case_id in enumerate(case_ids, 1):
-                script_info = await self.script_gen.generate_script(case_id, work_dir, idx)
-                scripts.append(script_info)
-            
-            self._add_log(f"生成 {len(scripts)} 个脚本文件")
-            logger.info(f"生成 {len(scripts)} 个脚本文件")
-            
-            # 6. 创建测试报告
-            report = await TestUIReport.create(
-                test_task_id=task_id,
-                execution_time=datetime.now(),
-                total_cases=len(case_ids),
-                report_data={
-                    'status': 'running',
-                    'task_name': task.name,
-                    'environment': task.environment,
-                    'start_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-            )
+            # 断点续跑时从检查点恢复，没有可用的检查点则重新开始
+            checkpoint = await self._load_checkpoint(task) if resume else None
+            if checkpoint:
+                work_dir, config, scripts, report, completed = checkpoint
+            else:
+                work_dir, config, scripts, report = await self._prepare_run(task)
+                completed = []
+            case_ids = [s['case_id'] for s in scripts]
+            self.work_dir = work_dir
+            self.journal = ExecutionJournal(work_dir, task_id, report.id)
+            self.results = ResultStream(self.result_collector, report.id, case_ids)
+            self.results.start()
+            if config['execute_config'].get('trace', 'off') != 'off':
+                self.traces = TraceRetention(work_dir, report.id,
+                                             config['execute_config'].get('trace_max_mb', DEFAULT_TRACE_MAX_MB))
             
-            # 7. 更新测试单状态
-            task.status = TaskStatus.RUNNING
-            task.start_time = datetime.now()
+            # 7. 更新测试单状态（准备阶段已被暂停时保持暂停状态）
+            # 准备期间暂停/继续接口可能已更新暂停时间
+            await task.refresh_from_db(fields=['paused_time', 'paused_seconds'])
+            task.status = TaskStatus.PAUSED if self.control.paused else TaskStatus.RUNNING
+            if not checkpoint or not task.start_time:
+                task.start_time = datetime.now()
+                # 重新开始执行时暂停时长从头累计（准备阶段已暂停的从开始执行时算起）
+                task.paused_seconds = 0
+                task.paused_time = task.start_time if self.control.paused else None
             task.total_cases = len(case_ids)
             await task.save()
             
@@ -139,14 +151,23 @@ class TaskExecutionScheduler:
             logger.info(f"开始执行测试单: task_id={task_id}, total_cases={len(case_ids)}")
             
             # 8. 执行测试用例
-            results = await self._execute_cases(scripts, config, work_dir, task, report)
+            results = await self._execute_cases(scripts, config, work_dir, task, report, completed)
             
-            # 9. 收集结果
-            self._add_log("开始收集执行结果...")
-            await self.result_collector.collect_results(work_dir, report.id)
+            # 9. 等待剩余的执行结果写入数据库（执行过程中每个用例完成时已实时写入）
+            await self.results.close()
+            self._add_log(f"执行结果已写入数据库，共 {self.results.written} 条用例执行记录")
+            self._summarize_waits(report)
+            self._summarize_blocking(report)
+            self._summarize_har(report)
+            self._summarize_screenshots(report)
+            await self._summarize_traces(report)
             
             # 10. 更新测试单和报告
-            await self._finalize_execution(task, report, results)
+            if self.control.cancelled:
+                self._add_log(f"测试单已取消，已完成 {len(results)}/{len(case_ids)} 个用例", "WARNING")
+                await self._finalize_execution(task, report, results, TaskStatus.CANCELLED)
+            else:
+                await self._finalize_execution(task, report, results)
             
             self._add_log(f"测试单执行完成! 总数={len(results)}, 通过={task.passed_cases}, 失败={task.failed_cases}")
             logger.info(f"测试单执行完成: task_id={task_id}")
@@ -173,6 +194,7 @@ class TaskExecutionScheduler:
                 task = await TestUITask.get(id=task_id)
                 task.status = TaskStatus.FAILED
                 task.end_time = datetime.now()
+                end_pause(task)
                 
                 # 更新执行统计（如果有的话）
                 if hasattr(task, 'executed_cases') and task.executed_cases is not None:
@@ -198,7 +220,7 @@ class TaskExecutionScheduler:
                 
                 duration = 0
                 if task.start_time and task.end_time:
-                    duration = int((task.end_time - task.start_time).total_seconds())
+                    duration = max(0, int((task.end_time - task.start_time).total_seconds()) - (task.paused_seconds or 0))
                 
                 if error_report:
                     # 更新现有报告
@@ -218,6 +240,7 @@ class TaskExecutionScheduler:
                     # 创建新报告
                     error_report = await TestUIReport.create(
                         test_task_id=task_id,
+                        product=task.product,
                         execution_time=datetime.now(),
                         total_cases=task.total_cases or 0,
                         passed_cases=task.passed_cases or 0,
@@ -236,6 +259,132 @@ class TaskExecutionScheduler:
             except Exception as inner_e:
                 logger.error(f"更新失败状态时出错: {inner_e}")
             raise
+        
+        finally:
+            if self.results:
+                await self.results.close()
+            if self.slot_task_id is not None:
+                self.control.remove_cancel_callback(self._abort_slots)
+                slot_manager.unregister(self.slot_task_id)
+            execution_registry.unregister(task_id, self.control)
+    
+    async def _prepare_run(self, task: TestUITask) -> Tuple[Path, Dict, List[Dict], TestUIReport]:
+        """准备一次新的执行：创建工作目录、生成配置和脚本、创建报告"""
+        task_id = task.id
+        
+        # 2. 创建工作目录
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        work_dir = Path('test_executions') / f'task_{task_id}_{timestamp}'
+        work_dir.mkdir(parents=True, exist_ok=True)
+        
+        logger.info(f"创建工作目录: {work_dir}")
+        
+        # 2.1 创建日志文件并保存路径
+        log_file_path = self._create_log_file(work_dir)
+        task.log_file_path = log_file_path
+        await task.save(update_fields=['log_file_path'])
+        
+        self._add_log(f"开始执行测试单: task_id={task_id}")
+        
+        # 3. 获取用例列表
+        case_ids = await self._expand_task_contents(task_id)
+        
+        self._add_log(f"测试单包含 {len(case_ids)} 个用例")
+        logger.info(f"测试单包含 {len(case_ids)} 个用例")
+        
+        # 4. 生成配置文件
+        config = await self.config_gen.generate_config(task, case_ids, work_dir)
+        self._add_log("生成配置文件完成")
+        
+        # 4.1 按角色预登录并缓存登录态（execute_config.auth_cache 启用时）
+        auth_states = await self._prelogin(task, config, work_dir)
+        if auth_states:
+            self.config_gen.write_config(config, work_dir)
+            self._add_log(f"登录态缓存完成，角色: {', '.join(auth_states.keys())}")
+        
+        # 4.2 HAR 录制与回放（execute_config.network_mode=record/replay）
+        har = har_store.prepare(config, task.environment, work_dir)
+        if har:
+            self.config_gen.write_config(config, work_dir)
+            self._add_log(har_store.describe(har, case_ids, task.environment))
+        
+        # 5. 批量生成脚本文件（runner=plan 时生成步骤计划）
+        if config['execute_config'].get('runner', 'script') == 'plan':
+            scripts = await self.script_gen.generate_plans(case_ids, work_dir)
+            file_kind = '步骤计划'
+        else:
+            scripts = await self.script_gen.generate_scripts(case_ids, work_dir)
+            file_kind = '脚本文件'
+        
+        # 5.1 保存脚本清单，供断点续跑时复用
+        with open(work_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(scripts, f, ensure_ascii=False, indent=2)
+        
+        self._add_log(f"生成 {len(scripts)} 个{file_kind}")
+        logger.info(f"生成 {len(scripts)} 个{file_kind}")
+        cache_summary = self.script_gen.cache.summary()
+        if cache_summary:
+            self._add_log(cache_summary)
+        
+        # 6. 创建测试报告
+        report = await TestUIReport.create(
+            test_task_id=task_id,
+            product=task.product,
+            execution_time=datetime.now(),
+            total_cases=len(case_ids),
+            report_data={
+                'status': 'running',
+                'task_name': task.name,
+                'environment': task.environment,
+                'start_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'work_dir': str(work_dir)
+            }
+        )
+        
+        return work_dir, config, scripts, report
+    
+    async def _load_checkpoint(self, task: TestUITask) -> Optional[Tuple[Path, Dict, List[Dict], TestUIReport, List[Dict]]]:
+        """
+        加载最近一次执行的检查点
+        
+        Returns:
+            (工作目录, 配置, 脚本清单, 报告, 已完成用例结果)，检查点不可用时返回 None
+        """
+        report = await TestUIReport.filter(test_task_id=task.id).order_by('-id').first()
+        work_dir_value = (report.report_data or {}).get('work_dir') if report else None
+        if not work_dir_value:
+            logger.info(f"测试单没有可续跑的执行记录，重新开始执行: task_id={task.id}")
+            return None
+        
+        work_dir = Path(work_dir_value)
+        manifest_path = work_dir / MANIFEST_FILE
+        config_path = work_dir / 'config.json'
+        if not manifest_path.exists() or not config_path.exists():
+            logger.warn(f"工作目录不完整，重新开始执行: {work_dir}")
+            return None
+        
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            scripts = json.load(f)
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        if not all(Path(s.get('plan_path') or s['script_path']).exists() for s in scripts):
+            logger.warn(f"脚本文件缺失，重新开始执行: {work_dir}")
+            return None
+        
+        # 续写原有的执行日志
+        self.log_file_path = str(work_dir / 'logs' / 'execution.log')
+        self._add_log(f"从检查点继续执行测试单: task_id={task.id}, 工作目录: {work_dir}")
+        
+        completed = await ExecutionJournal(work_dir, task.id, report.id).load()
+        scripted_ids = {s['case_id'] for s in scripts}
+        completed = [r for r in completed if r['case_id'] in scripted_ids]
+        self._add_log(f"已完成 {len(completed)}/{len(scripts)} 个用例，继续执行剩余用例")
+        
+        # 按日志文件重新生成已完成用例的执行记录，清理上次可能写入了一半的记录
+        await TestUICaseExecutionRecord.filter(test_report_id=report.id).delete()
+        await self.result_collector.collect_results(work_dir, report.id, {r['case_id'] for r in completed})
+        
+        return work_dir, config, scripts, report, completed
     
     async def _expand_task_contents(self, task_id: int) -> List[int]:
         """展开测试单内容为用例ID列表"""
@@ -269,140 +418,597 @@ class TaskExecutionScheduler:
     
     async def _execute_cases(self, scripts: List[Dict], config: Dict, 
                             work_dir: Path, task: TestUITask, 
-                            report: TestUIReport) -> List[Dict]:
-        """执行所有用例脚本"""
+                            report: TestUIReport,
+                            completed: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        执行所有用例脚本
+        
+        所有模式都在事件循环内以协程方式调度，不会阻塞 API：
+        - serial: 逐个执行，每个用例一个 asyncio 子进程
+        - process: 并发执行，每个用例一个 asyncio 子进程，并发数由信号量控制
+        - browser_pool: 并发执行，用例交给常驻浏览器工作进程池
+        - runner=plan: 步骤计划总是交给常驻浏览器工作进程池解释执行（串行模式时只有一个工作进程）
+        - agent: 用例写入分布式执行队列，由所有在线的执行代理领取执行，并发数为队列中同时执行的用例数上限
+        
+        主流程结束后进入失败重试阶段，见 _retry_failed
+        
+        Args:
+            completed: 断点续跑时已完成用例的结果，这些用例不再派发
+        """
         execute_config = config['execute_config']
         parallel_mode = execute_config.get('parallel_mode', 'process')
+        worker_timeout = execute_config.get('worker_timeout', 300)
+        
+        if parallel_mode == 'agent':
+            max_workers = self._resolve_max_workers(execute_config)
+            self._add_log(f"开始分布式执行，同时执行的用例数上限: {max_workers}")
+            return await self._run_with_agents(scripts, completed, max_workers, execute_config, work_dir, task, report)
+        
+        # 本机执行的用例占用全局执行槽位，多个测试单同时执行时共享浏览器数上限
+        self._use_slots(task, execute_config)
+        
+        if execute_config.get('max_workers') == 'auto' and parallel_mode != 'serial':
+            self.concurrency = AdaptiveConcurrency(max_adaptive_workers(slot_manager.capacity),
+                                                   notify=self._add_log, on_change=self._on_concurrency_change)
+            self._add_log(f"自适应并发: 初始并发数 {self.concurrency.limit}，上限 {self.concurrency.maximum}")
+        
+        if execute_config.get('runner', 'script') == 'plan':
+            max_workers = 1 if parallel_mode == 'serial' else self._resolve_max_workers(execute_config)
+            self._add_log(f"开始步骤计划执行，常驻执行进程数: {max_workers}")
+            return await self._run_with_pool(scripts, completed, max_workers, execute_config, work_dir, task, report)
         
         if parallel_mode == 'serial':
-            # 串行执行
-            return await self._execute_serial(scripts, work_dir, task, report)
-        else:
-            # 并发执行
-            return await self._execute_parallel(scripts, work_dir, task, report, execute_config)
-    
-    async def _execute_serial(self, scripts: List[Dict], work_dir: Path,
-                             task: TestUITask, report: TestUIReport) -> List[Dict]:
-        """串行执行用例脚本"""
-        results = []
+            self._add_log("开始串行执行")
+            runner = self._subprocess_runner(work_dir, worker_timeout)
+            return await self._run_stages(scripts, completed, runner, 1, execute_config, work_dir, task, report)
+        
+        max_workers = self._resolve_max_workers(execute_config)
         
-        for idx, script_info in enumerate(scripts, 1):
-            case_name = script_info['case_name']
-            self._add_log(f"正在执行用例 [{idx}/{len(scripts)}]: {case_name}")
-            logger.info(f"执行用例 {idx}/{len(scripts)}: {case_name}")
+        if parallel_mode == 'browser_pool':
+            # 常驻浏览器工作进程池执行
+            self._add_log(f"开始浏览器进程池执行，工作进程数: {max_workers}")
+            return await self._run_with_pool(scripts, completed, max_workers, execute_config, work_dir, task, report)
+        
+        self._add_log(f"开始并发执行，并发数: {max_workers}")
+        runner = self._subprocess_runner(work_dir, worker_timeout)
+        return await self._run_stages(scripts, completed, runner, max_workers, execute_config, work_dir, task, report)
+    
+    async def _run_with_pool(self, scripts: List[Dict], completed: Optional[List[Dict]], max_workers: int,
+                             execute_config: Dict, work_dir: Path, task: TestUITask,
+                             report: TestUIReport) -> List[Dict]:
+        """在常驻浏览器工作进程池中执行用例脚本或步骤计划"""
+        worker_timeout = execute_config.get('worker_timeout', 300)
+        # 常驻浏览器在存活期间各占一个全局执行槽位，用例派发时不再另外领取
+        pool = BrowserWorkerPool(max_workers, execute_config, slot_task_id=self.slot_task_id)
+        self.slots_by_worker = self.slot_task_id is not None
+        # 自适应并发时先按初始并发数启动浏览器，并发增加时再按需扩容
+        await pool.start(initial=self.concurrency.limit if self.concurrency else None)
+        self.control.add_cancel_callback(pool.terminate)
+        try:
+            async def pool_runner(script_info: Dict) -> Dict:
+                attempt = script_info.get('attempt', 1)
+                affinity = script_info.get('affinity')
+                timeout = script_info.get('timeout', worker_timeout)
+                if 'plan_path' in script_info:
+                    return await pool.run_plan(script_info['plan_path'], timeout=timeout, attempt=attempt,
+                                               affinity=affinity)
+                return await pool.run_case(script_info['script_path'], timeout=timeout, attempt=attempt,
+                                           affinity=affinity)
             
-            result = self.case_executor.execute_case_script(
-                script_path=script_info['script_path'],
-                work_dir=str(work_dir),
-                timeout=300
-            )
+            results = await self._run_stages(scripts, completed, pool_runner, max_workers,
+                                             execute_config, work_dir, task, report)
+            if pool.affinity_hits:
+                self._add_log(f"分片派发: {pool.affinity_hits} 个用例由上一次执行同一分片的浏览器工作进程执行")
+            return results
+        finally:
+            self.control.remove_cancel_callback(pool.terminate)
+            await pool.shutdown()
+    
+    async def _run_with_agents(self, scripts: List[Dict], completed: Optional[List[Dict]], max_workers: int,
+                               execute_config: Dict, work_dir: Path, task: TestUITask,
+                               report: TestUIReport) -> List[Dict]:
+        """分发到执行代理执行用例脚本或步骤计划"""
+        dispatcher = AgentDispatcher(task, report, work_dir, execute_config.get('worker_timeout', 300),
+                                     notify=self._add_log)
+        await dispatcher.start()
+        self.control.add_cancel_callback(dispatcher.cancel)
+        try:
+            return await self._run_stages(scripts, completed, dispatcher.run, max_workers,
+                                          execute_config, work_dir, task, report)
+        finally:
+            self.control.remove_cancel_callback(dispatcher.cancel)
+            await dispatcher.close()
+    
+    async def _run_stages(self, scripts: List[Dict], completed: Optional[List[Dict]],
+                          runner: Callable[[Dict], Awaitable[Dict]], max_workers: int,
+                          execute_config: Dict, work_dir: Path, task: TestUITask,
+                          report: TestUIReport) -> List[Dict]:
+        """主流程（跳过已完成的用例）+ 失败重试阶段"""
+        completed = completed or []
+        done_ids = {r['case_id'] for r in completed}
+        pending = [s for s in scripts if s['case_id'] not in done_ids]
+        
+        history = await load_history(execute_config).load([s['case_id'] for s in scripts])
+        estimates = history.estimates(s['case_id'] for s in scripts)
+        self._apply_timeouts(scripts, history, execute_config)
+        schedule = None
+        shards = None
+        schedule_policy = execute_config.get('schedule_policy', 'sort_order')
+        if schedule_policy == 'longest_first' and pending:
+            pending, schedule = self._order_longest_first(pending, max_workers, history, estimates)
+        elif schedule_policy == 'affinity' and pending and max_workers > 1:
+            shards = ShardPlan(pending, max_workers, estimates, notify=self._add_log)
+            self._add_log(shards.describe())
+        if self.concurrency:
+            self.concurrency.estimates = estimates
+        self.eta = self.control.eta = TaskEta(estimates, [s['case_id'] for s in pending],
+                                              self.concurrency.limit if self.concurrency else max_workers)
+        
+        started = time.monotonic()
+        results = completed + await self._dispatch(pending, runner, max_workers, task,
+                                                   completed_before=len(completed), limiter=self.concurrency,
+                                                   shards=shards)
+        if self.concurrency:
+            report.report_data = {**(report.report_data or {}), 'concurrency': self.concurrency.summary()}
+        if shards:
+            report.report_data = {**(report.report_data or {}), 'shards': shards.summary()}
+        if schedule and not self.control.cancelled:
+            schedule['actual_makespan'] = round(time.monotonic() - started, 1)
+            self._add_log(f"主流程执行完成，预估总时长 {schedule['predicted_makespan']:.0f} 秒，"
+                          f"实际 {schedule['actual_makespan']:.0f} 秒")
+            report.report_data = {**(report.report_data or {}), 'schedule': schedule}
+        results = await self._retry_failed(scripts, results, runner, execute_config, work_dir, task, report)
+        if self.timeout_events:
+            report.report_data = {**(report.report_data or {}), 'timeouts': self.timeout_events}
+        return results
+    
+    def _apply_timeouts(self, scripts: List[Dict], history: CaseDurationHistory, execute_config: Dict):
+        """
+        设置每个用例的超时时间（script_info['timeout']）及其依据（script_info['timeout_basis']）
+        
+        timeout_policy='adaptive'（默认）时，历史记录不少于 timeout_min_samples 次的用例取历史耗时 p99 × timeout_factor，
+        不低于 timeout_floor 秒、不超过 worker_timeout；其余用例以及 timeout_policy='fixed' 时使用 worker_timeout
+        """
+        worker_timeout = int(execute_config.get('worker_timeout', 300))
+        if execute_config.get('timeout_policy', 'adaptive') != 'adaptive':
+            for script_info in scripts:
+                script_info['timeout'], script_info['timeout_basis'] = worker_timeout, '固定超时 worker_timeout'
+            return
+        
+        min_samples = int(execute_config.get('timeout_min_samples', TIMEOUT_MIN_SAMPLES))
+        timeouts = history.timeouts(
+            (s['case_id'] for s in scripts), worker_timeout,
+            factor=float(execute_config.get('timeout_factor', TIMEOUT_FACTOR)),
+            floor=int(execute_config.get('timeout_floor', TIMEOUT_FLOOR)),
+            min_samples=min_samples
+        )
+        adaptive = []
+        for script_info in scripts:
+            script_info['timeout'], script_info['timeout_basis'] = timeouts[script_info['case_id']]
+            if len(history.history.get(script_info['case_id']) or []) >= min_samples:
+                adaptive.append(script_info['timeout'])
+        if adaptive:
+            self._add_log(f"自适应超时: {len(adaptive)} 个用例按历史耗时设置超时（{min(adaptive)}-{max(adaptive)} 秒），"
+                          f"{len(scripts) - len(adaptive)} 个用例历史记录不足 {min_samples} 次，使用 {worker_timeout} 秒")
+    
+    def _record_timeout(self, script_info: Dict, result: Dict):
+        """记录超时事件：超时时间和依据写入执行日志、用例执行记录和报告（report_data.timeouts）"""
+        timeout, basis = script_info.get('timeout', result.get('timeout')), script_info.get('timeout_basis')
+        result['error'] = f"{TIMEOUT_ERROR}（超时时间 {timeout} 秒，{basis}）" if basis else f"{TIMEOUT_ERROR}（{timeout} 秒）"
+        # 进程被结束时用例日志没有结束事件，补写后才会生成执行记录
+        case_log.close_case_log(self._case_log_path(self.work_dir, script_info), '失败', result['error'])
+        self.timeout_events.append({
+            'case_id': script_info['case_id'],
+            'case_name': script_info['case_name'],
+            'attempt': script_info.get('attempt', 1),
+            'timeout': timeout,
+            'basis': basis
+        })
+    
+    def _summarize_waits(self, report: TestUIReport):
+        """智能等待（wait_mode='smart'）节省的等待时间写入执行日志和报告（report_data.smart_wait）"""
+        stats = self.results.run_stats.get('smart_wait') or {}
+        if not stats.get('steps'):
+            return
+        budget, waited = stats['budget'] / 1000, stats['waited'] / 1000
+        self._add_log(f"智能等待: {stats['steps']} 次等待，固定等待共 {budget:.1f} 秒，"
+                      f"实际等待 {waited:.1f} 秒，节省 {budget - waited:.1f} 秒")
+        report.report_data = {**(report.report_data or {}), 'smart_wait': {
+            'steps': stats['steps'],
+            'budget_seconds': round(budget, 1),
+            'waited_seconds': round(waited, 1),
+            'saved_seconds': round(budget - waited, 1)
+        }}
+    
+    def _summarize_blocking(self, report: TestUIReport):
+        """按拦截规则（block_resources）被拦截的请求数写入执行日志和报告（report_data.blocked_requests）"""
+        stats = self.results.run_stats.get('blocked_requests')
+        if not stats:
+            return
+        total = sum(stats.values())
+        details = '，'.join(f"{profile} {count}" for profile, count in sorted(stats.items()))
+        self._add_log(f"请求拦截: 共拦截 {total} 个请求（{details}）")
+        report.report_data = {**(report.report_data or {}), 'blocked_requests': {'total': total, 'profiles': stats}}
+    
+    def _summarize_har(self, report: TestUIReport):
+        """HAR 回放和录制的用例数写入执行日志和报告（report_data.har）"""
+        stats = self.results.run_stats.get('har')
+        if not stats:
+            return
+        self._add_log(f"HAR: 回放 {stats.get('replayed', 0)} 个用例，录制 {stats.get('recorded', 0)} 个，"
+                      f"{stats.get('discarded', 0)} 个用例未通过，未保存录制结果")
+        report.report_data = {**(report.report_data or {}), 'har': stats}
+    
+    def _summarize_screenshots(self, report: TestUIReport):
+        """截图数量、大小和耗时写入执行日志和报告（report_data.screenshots）"""
+        stats = self.results.run_stats.get('screenshots')
+        if not stats:
+            return
+        self._add_log(f"截图: 保存 {stats.get('count', 0)} 张，共 {stats.get('bytes', 0) / 1024:.0f} KB，"
+                      f"截图耗时 {stats.get('capture_ms', 0) / 1000:.1f} 秒，内容重复未保存 {stats.get('deduped', 0)} 张")
+        report.report_data = {**(report.report_data or {}), 'screenshots': stats}
+    
+    async def _summarize_traces(self, report: TestUIReport):
+        """保留和因超出存储上限删除的 trace 写入执行日志和报告（report_data.traces）"""
+        if not self.traces:
+            return
+        # 删除 trace 时尚未写入数据库的执行记录，在全部写入后再清除链接
+        await self.traces.unlink_records()
+        summary = self.traces.summary()
+        if not summary['kept'] and not summary['evicted']:
+            return
+        self._add_log(f"失败 trace: 保留 {summary['kept']} 个（{summary['kept_bytes'] / 1024 / 1024:.1f} MB），"
+                      f"超出存储上限删除 {summary['evicted']} 个")
+        report.report_data = {**(report.report_data or {}), 'traces': summary}
+    
+    @staticmethod
+    def _timed_out(result: Dict) -> bool:
+        return str(result.get('error') or '').startswith(TIMEOUT_ERROR)
+    
+    def _order_longest_first(self, scripts: List[Dict], max_workers: int, history: CaseDurationHistory,
+                             estimates: Dict[int, float]) -> Tuple[List[Dict], Dict]:
+        """
+        按历史耗时最长优先（LPT）排序用例，避免耗时长的用例排在最后、其余并发槽位空等
+        
+        每个用例的耗时取最近 history_runs 次执行的 p75，没有历史记录的用例使用 default_case_duration
+        （未配置时取已知用例估算的中位数）
+        
+        Returns:
+            (排序后的脚本列表, 调度摘要 {policy, known_cases, predicted_makespan, sort_order_makespan})
+        """
+        # 稳定排序：耗时相同的用例保持原有顺序
+        ordered = sorted(scripts, key=lambda s: estimates[s['case_id']], reverse=True)
+        schedule = {
+            'policy': 'longest_first',
+            'known_cases': history.known_cases,
+            'predicted_makespan': round(simulate_makespan((estimates[s['case_id']] for s in ordered), max_workers), 1),
+            'sort_order_makespan': round(simulate_makespan((estimates[s['case_id']] for s in scripts), max_workers), 1)
+        }
+        self._add_log(f"按历史耗时最长优先派发: {len(scripts)} 个用例中 {history.known_cases} 个有历史记录，"
+                      f"预估总时长 {schedule['predicted_makespan']:.0f} 秒"
+                      f"（按原顺序预估 {schedule['sort_order_makespan']:.0f} 秒）")
+        return ordered, schedule
+    
+    async def _retry_failed(self, scripts: List[Dict], results: List[Dict],
+                            runner: Callable[[Dict], Awaitable[Dict]], execute_config: Dict,
+                            work_dir: Path, task: TestUITask, report: TestUIReport) -> List[Dict]:
+        """
+        失败重试阶段：主流程结束后只重新执行失败的用例
+        
+        - 每个用例最多重试 retry_count 次，每轮只包含上一轮仍失败的用例
+        - 使用独立的低并发通道（retry_workers，默认 1），减少资源争用引起的偶发失败
+        - 每轮开始前退避 retry_backoff * 2^(轮次-1) 秒
+        - 每次执行的日志都会归档到 logs/attempts/，最终结果以最后一次执行为准
+        
+        Returns:
+            每个用例的最终执行结果（顺序与 results 一致）
+        """
+        retry_count = int(execute_config.get('retry_count', 0) or 0)
+        retry_workers = max(1, int(execute_config.get('retry_workers', 1)))
+        retry_backoff = float(execute_config.get('retry_backoff', 2))
+        worker_timeout = int(execute_config.get('worker_timeout', 300))
+        
+        scripts_by_case = {s['case_id']: s for s in scripts}
+        final_results = {r['case_id']: r for r in results}
+        retried_cases = set()
+        retry_round = 0
+        
+        while not self.control.cancelled:
+            # 断点续跑时用例可能已重试过，按各自的执行次数计算剩余重试次数
+            failed = []
+            for case_id, r in final_results.items():
+                if r.get('status') == 'passed' or r.get('attempt', 1) > retry_count:
+                    continue
+                retry = dict(scripts_by_case[case_id], attempt=r.get('attempt', 1) + 1)
+                # 按历史耗时超时的用例重试时放宽到 worker_timeout，偶发的慢执行不会被反复判定为超时
+                if self._timed_out(r) and retry.get('timeout', worker_timeout) < worker_timeout:
+                    retry.update(timeout=worker_timeout, timeout_basis='上一次执行超时，重试使用 worker_timeout')
+                failed.append(retry)
+            if not failed:
+                break
             
-            status = result.get('status', 'unknown')
-            if status == 'passed':
-                self._add_log(f"✅ 用例 {case_name} 执行成功")
-            else:
-                error = result.get('error', '未知错误')
-                self._add_log(f"❌ 用例 {case_name} 执行失败: {error}", "ERROR")
+            retry_round += 1
+            delay = retry_backoff * 2 ** (retry_round - 1)
+            self._add_log(f"第 {retry_round} 轮失败重试: {len(failed)} 个用例，{delay:g} 秒后开始")
+            await self.control.sleep(delay)
+            if self.control.cancelled:
+                break
             
-            results.append(result)
+            # 归档前等待上一次执行的日志写入数据库
+            if self.results:
+                await self.results.flush()
+            for script_info in failed:
+                self._archive_case_log(work_dir, script_info)
+                retried_cases.add(script_info['case_id'])
             
-            # 更新进度
-            await self._update_progress(task, idx, len(scripts))
+            if self.eta:
+                self.eta.add_cases([s['case_id'] for s in failed], retry_workers)
+            retry_results = await self._dispatch(failed, runner, retry_workers, task,
+                                                 on_finished=self._on_retry_finished)
+            for result in retry_results:
+                final_results[result['case_id']] = result
         
-        return results
+        if retried_cases:
+            recovered = sum(1 for case_id in retried_cases if final_results[case_id].get('status') == 'passed')
+            self._add_log(f"失败重试完成: 重试 {len(retried_cases)} 个用例，其中 {recovered} 个重试后通过")
+            report.report_data = {
+                **(report.report_data or {}),
+                'retry': {
+                    'retry_count': retry_count,
+                    'retried_cases': len(retried_cases),
+                    'recovered_cases': recovered
+                }
+            }
+        
+        return [final_results[r['case_id']] for r in results]
+    
+    @staticmethod
+    def _case_log_path(work_dir: Path, script_info: Dict) -> Path:
+        """用例执行日志路径（与脚本/步骤计划同名）"""
+        return work_dir / 'logs' / f"case_{script_info['case_id']:03d}_{script_info['sequence']:03d}{case_log.LOG_SUFFIX}"
+    
+    def _archive_case_log(self, work_dir: Path, script_info: Dict):
+        """将用例上一次执行的日志移动到 logs/attempts/，为重试腾出位置；未执行完的日志直接丢弃"""
+        log_path = self._case_log_path(work_dir, script_info)
+        log_name = log_path.stem
+        if not log_path.exists():
+            return
+        log_data = case_log.load_case_log(log_path) or {}
+        if not (log_data.get('execution_info') or {}).get('end_time'):
+            log_path.unlink()
+            return
+        archive_dir = work_dir / 'logs' / 'attempts'
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        log_path.replace(archive_dir / f"{log_name}_attempt{log_data.get('attempt', 1)}{case_log.LOG_SUFFIX}")
+    
+    def _resolve_max_workers(self, execute_config: Dict) -> int:
+        """解析并发数配置（本机执行时不超过全局执行槽位数，自适应并发时为其上限）"""
+        if self.concurrency:
+            return self.concurrency.maximum
+        max_workers = resolve_max_workers(execute_config)
+        if self.slot_task_id is not None:
+            max_workers = min(max_workers, slot_manager.capacity)
+        return max_workers
     
-    async def _execute_parallel(self, scripts: List[Dict], work_dir: Path,
-                               task: TestUITask, report: TestUIReport,
-                               execute_config: Dict) -> List[Dict]:
-        """并发执行用例脚本"""
-        max_workers = execute_config.get('max_workers', 4)
-        if max_workers == 'auto':
-            max_workers = multiprocessing.cpu_count()
+    def _use_slots(self, task: TestUITask, execute_config: Dict):
+        """登记到全局执行槽位管理器，此后派发的每个用例先领取槽位"""
+        requested = resolve_max_workers(execute_config)
+        slot_manager.register(task.id, requested)
+        self.slot_task_id = task.id
+        self.control.add_cancel_callback(self._abort_slots)
+        if requested > slot_manager.capacity:
+            self._add_log(f"并发数 {requested} 超过本机执行槽位数 {slot_manager.capacity}，按 {slot_manager.capacity} 执行", "WARNING")
+        if slot_manager.in_use >= slot_manager.capacity:
+            self._add_log(f"本机执行槽位已被其他测试单占满（{slot_manager.in_use}/{slot_manager.capacity}），排队等待", "WARNING")
+    
+    async def _prelogin(self, task: TestUITask, config: Dict, work_dir: Path) -> Dict:
+        """按角色预登录；预登录启动的浏览器与用例一样占用一个全局执行槽位"""
+        execute_config = config['execute_config']
+        if not (execute_config.get('auth_cache') or {}).get('enabled'):
+            return {}
+        slot_manager.register(task.id, resolve_max_workers(execute_config))
         
-        self._add_log(f"开始并发执行，并发数: {max_workers}")
+        async def abort():
+            slot_manager.abort(task.id)
         
-        worker_timeout = execute_config.get('worker_timeout', 300)
+        self.control.add_cancel_callback(abort)
+        try:
+            if not await slot_manager.acquire(task.id):
+                return {}
+            try:
+                return await self.auth_manager.prepare(config, work_dir)
+            finally:
+                slot_manager.release(task.id)
+        finally:
+            self.control.remove_cancel_callback(abort)
+            if self.slot_task_id is None:
+                slot_manager.unregister(task.id)
+    
+    async def _abort_slots(self):
+        slot_manager.abort(self.slot_task_id)
+    
+    def _on_concurrency_change(self, limit: int):
+        if self.eta:
+            self.eta.set_workers(limit)
+    
+    def _subprocess_runner(self, work_dir: Path, timeout: int) -> Callable[[Dict], Awaitable[Dict]]:
+        """构建基于 asyncio 子进程的用例执行函数"""
+        async def runner(script_info: Dict) -> Dict:
+            return await self.case_executor.execute_case_script_async(
+                script_path=script_info['script_path'],
+                work_dir=str(work_dir),
+                timeout=script_info.get('timeout', timeout),
+                attempt=script_info.get('attempt', 1),
+                control=self.control
+            )
+        return runner
+    
+    async def _dispatch(self, scripts: List[Dict], runner: Callable[[Dict], Awaitable[Dict]],
+                        max_workers: int, task: TestUITask,
+                        on_finished: Optional[Callable[..., Awaitable[None]]] = None,
+                        completed_before: int = 0,
+                        limiter: Optional[AdaptiveConcurrency] = None,
+                        shards: Optional[ShardPlan] = None) -> List[Dict]:
+        """
+        并发调度用例
         
+        Args:
+            scripts: 脚本信息列表（按调度顺序）
+            runner: 执行单个用例的协程函数，返回执行结果字典
+            max_workers: 最大并发数
+            task: 测试单对象
+            on_finished: 单个用例完成后的回调，默认为 _on_case_finished
+            completed_before: 断点续跑时已完成的用例数，计入进度
+            limiter: 自适应并发限制器，传入时代替 max_workers 控制并发
+            shards: 分片派发计划，传入时每个执行通道依次领取自己分片的用例（空闲时窃取其他通道的用例），
+                不再按 scripts 的顺序派发
+        
+        Returns:
+            执行结果列表（按完成顺序）
+        """
+        semaphore = limiter or asyncio.Semaphore(max_workers)
+        total = completed_before + len(scripts)
         results = []
+        on_finished = on_finished or self._on_case_finished
+        case_slots = self.slot_task_id is not None and not self.slots_by_worker
         
-        # 使用进程池并发执行
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_script = {}
-            for script_info in scripts:
-                future = executor.submit(
-                    self.case_executor.execute_case_script,
-                    script_path=script_info['script_path'],
-                    work_dir=str(work_dir),
-                    timeout=worker_timeout
-                )
-                future_to_script[future] = script_info
-            
-            # 收集结果
-            completed = 0
-            for future in as_completed(future_to_script):
-                script_info = future_to_script[future]
-                case_name = script_info['case_name']
+        async def run_one(idx: int, script_info: Dict, shard: Optional[Shard] = None):
+            idx += completed_before
+            async with semaphore:
+                # 暂停时在此等待（已派发的用例继续执行完），取消后不再派发
+                if self.control and not await self.control.wait_until_runnable():
+                    if self.eta:
+                        self.eta.case_skipped(script_info['case_id'])
+                    return
+                # 领取全局执行槽位，测试单被取消时不再等待
+                if case_slots and not await slot_manager.acquire(self.slot_task_id):
+                    if self.eta:
+                        self.eta.case_skipped(script_info['case_id'])
+                    return
+                if self.eta:
+                    self.eta.case_started(script_info['case_id'])
+                if shard:
+                    shards.case_started(shard)
+                self._add_log(f"正在执行用例 [{idx}/{total}]: {script_info['case_name']}")
+                case_started = time.monotonic()
                 try:
-                    result = future.result(timeout=worker_timeout)
-                    results.append(result)
-                    completed += 1
-                    
-                    status = result.get('status', 'unknown')
-                    if status == 'passed':
-                        self._add_log(f"✅ 用例 {case_name} 执行成功 [{completed}/{len(scripts)}]")
-                    else:
-                        error = result.get('error', '未知错误')
-                        self._add_log(f"❌ 用例 {case_name} 执行失败: {error} [{completed}/{len(scripts)}]", "ERROR")
-                    
-                    logger.info(f"用例执行完成 {completed}/{len(scripts)}: {case_name}")
-                    
-                    # 更新进度
-                    await self._update_progress(task, completed, len(scripts))
-                    
+                    result = await runner(dict(script_info, affinity=shard.key) if shard else script_info)
                 except Exception as e:
-                    self._add_log(f"❌ 用例 {case_name} 执行异常: {str(e)}", "ERROR")
-                    logger.error(f"用例执行异常: {case_name}, {e}")
-                    results.append({
-                        'case_id': script_info['case_id'],
-                        'status': 'failed',
-                        'error': str(e)
-                    })
+                    logger.error(f"用例执行异常: {script_info['case_name']}, {e}")
+                    result = {'status': 'failed', 'error': str(e)}
+                finally:
+                    if case_slots:
+                        slot_manager.release(self.slot_task_id)
+                if shard:
+                    shards.case_finished(shard, time.monotonic() - case_started)
+                if limiter and not (self.control and self.control.cancelled):
+                    await limiter.record(script_info['case_id'], time.monotonic() - case_started)
+            if self.control and self.control.cancelled and result.get('status') != 'passed':
+                # 被取消操作中断的用例不计入结果
+                self._add_log(f"⏹ 用例 {script_info['case_name']} 已取消")
+                if self.eta:
+                    self.eta.case_skipped(script_info['case_id'])
+                return
+            if self.eta:
+                self.eta.case_finished(script_info['case_id'])
+            result['case_id'] = script_info['case_id']
+            result['attempt'] = script_info.get('attempt', 1)
+            if self._timed_out(result):
+                self._record_timeout(script_info, result)
+            results.append(result)
+            # 在等待写入日志簿之前取完成数，并发完成的用例各自得到不同的序号
+            completed = completed_before + len(results)
+            if self.journal:
+                await self.journal.record(script_info, result)
+            if self.results:
+                self.results.submit(self._case_log_path(self.work_dir, script_info))
+            if self.traces and result.get('status') != 'passed':
+                await self.traces.enforce()
+            await on_finished(script_info, result, completed, total, task)
         
+        if shards:
+            sequence = itertools.count(1)
+            
+            async def run_lane(lane: int):
+                # 执行通道：上一个用例执行完再领取下一个，分片内的用例在同一通道上依次执行
+                while True:
+                    item = shards.next(lane)
+                    if item is None:
+                        return
+                    script_info, shard = item
+                    await run_one(next(sequence), script_info, shard)
+            
+            await asyncio.gather(*[run_lane(lane) for lane in range(len(shards.lanes))])
+        else:
+            await asyncio.gather(*[run_one(idx, s) for idx, s in enumerate(scripts, 1)])
         return results
     
+    async def _on_case_finished(self, script_info: Dict, result: Dict, completed: int,
+                                total: int, task: TestUITask):
+        """单个用例执行完成后的处理：记录日志、更新进度"""
+        case_name = script_info['case_name']
+        status = result.get('status', 'unknown')
+        if status == 'passed':
+            self._add_log(f"✅ 用例 {case_name} 执行成功 [{completed}/{total}]")
+        else:
+            error = result.get('error', '未知错误')
+            self._add_log(f"❌ 用例 {case_name} 执行失败: {error} [{completed}/{total}]", "ERROR")
+        
+        logger.info(f"用例执行完成 {completed}/{total}: {case_name}")
+        
+        # 更新进度
+        await self._update_progress(task, completed, total)
+    
+    async def _on_retry_finished(self, script_info: Dict, result: Dict, completed: int,
+                                 total: int, task: TestUITask):
+        """重试用例执行完成后的处理：只记录日志，不再推进整体进度"""
+        case_name = script_info['case_name']
+        attempt = script_info.get('attempt', 1)
+        if result.get('status') == 'passed':
+            self._add_log(f"🔁 用例 {case_name} 第 {attempt} 次执行成功 [{completed}/{total}]")
+        else:
+            error = result.get('error', '未知错误')
+            self._add_log(f"🔁 用例 {case_name} 第 {attempt} 次执行失败: {error} [{completed}/{total}]", "ERROR")
+    
     async def _update_progress(self, task: TestUITask, executed: int, total: int):
-        """更新测试单执行进度"""
+        """更新测试单执行进度（并发完成的用例回调顺序不定，较小的完成数不再覆盖已写入的进度）"""
+        if executed < self.progress_executed:
+            return
+        self.progress_executed = executed
         try:
             task.executed_cases = executed
             task.progress = Decimal(str((executed / total * 100) if total > 0 else 0))
-            await task.save()
+            await task.save(update_fields=['executed_cases', 'progress'])
         except Exception as e:
             logger.error(f"更新进度失败: {e}")
     
-    async def _finalize_execution(self, task: TestUITask, report: TestUIReport, results: List[Dict]):
-        """完成执行，更新最终状态"""
+    async def _finalize_execution(self, task: TestUITask, report: TestUIReport, results: List[Dict],
+                                  status: TaskStatus = TaskStatus.COMPLETED):
+        """完成执行，更新最终状态（取消时保留实际进度，未执行的用例计为跳过）"""
         try:
             # 统计结果
             passed_count = sum(1 for r in results if r.get('status') == 'passed')
             failed_count = sum(1 for r in results if r.get('status') == 'failed')
             
             # 更新测试单
-            task.status = TaskStatus.COMPLETED
+            await task.refresh_from_db(fields=['paused_time', 'paused_seconds'])
+            task.status = status
             task.end_time = datetime.now()
+            end_pause(task)
             task.passed_cases = passed_count
             task.failed_cases = failed_count
-            task.progress = Decimal('100.0')
+            if status == TaskStatus.COMPLETED:
+                task.progress = Decimal('100.0')
             await task.save()
             
             # 更新报告
             duration = 0
             if task.start_time and task.end_time:
-                duration = int((task.end_time - task.start_time).total_seconds())
+                duration = max(0, int((task.end_time - task.start_time).total_seconds()) - (task.paused_seconds or 0))
             
             report.passed_cases = passed_count
             report.failed_cases = failed_count
-            report.skipped_cases = 0
+            report.skipped_cases = max(0, (report.total_cases or 0) - len(results))
             report.execution_duration = duration
             report.pass_rate = Decimal(str((passed_count / len(results) * 100) if len(results) > 0 else 0))
             await report.save()
@@ -0,0 +1,75 @@
+"""
+失败用例 trace 的存储上限
+execute_config.trace 启用时，用例脚本只保存失败用例的 Playwright trace（工作目录/traces/），
+每个测试单的 trace 总大小不超过 trace_max_mb，超出时按修改时间从最早的开始删除，
+并清除对应用例执行记录的 trace_path
+"""
+from pathlib import Path
+from typing import List, Set
+
+from app.models.ui_test import TestUICaseExecutionRecord
+from app.log import logger
+
+
+# 每个测试单的 trace 总大小上限（MB）
+DEFAULT_TRACE_MAX_MB = 200
+
+TRACE_MODES = ('off', 'on_failure', 'on_retry')
+
+
+class TraceRetention:
+    """按测试单限制 trace 的存储大小，超出时删除最早的 trace"""
+
+    def __init__(self, work_dir: Path, report_id: int, max_mb: float = DEFAULT_TRACE_MAX_MB):
+        self.work_dir = work_dir
+        self.trace_dir = work_dir / 'traces'
+        self.report_id = report_id
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.evicted: Set[str] = set()
+        self.evicted_bytes = 0
+
+    async def enforce(self) -> List[str]:
+        """
+        删除超出上限的最早的 trace，并清除已写入的执行记录中的链接
+
+        Returns:
+            本次删除的 trace（相对工作目录的路径）
+        """
+        if not self.trace_dir.is_dir():
+            return []
+        traces = sorted(
+            ((path, path.stat()) for path in self.trace_dir.glob('*.zip')),
+            key=lambda item: item[1].st_mtime
+        )
+        total = sum(stat.st_size for _, stat in traces)
+        removed = []
+        for path, stat in traces:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+            self.evicted_bytes += stat.st_size
+            removed.append(str(path.relative_to(self.work_dir)))
+        if removed:
+            self.evicted.update(removed)
+            logger.info(f"trace 超过存储上限 {self.max_bytes / 1024 / 1024:g} MB，删除最早的 {len(removed)} 个")
+            await self.unlink_records(removed)
+        return removed
+
+    async def unlink_records(self, paths=None):
+        """清除执行记录中已删除的 trace 链接（默认为全部已删除的 trace）"""
+        paths = list(self.evicted if paths is None else paths)
+        if paths:
+            await TestUICaseExecutionRecord.filter(
+                test_report_id=self.report_id, trace_path__in=paths
+            ).update(trace_path=None)
+
+    def summary(self) -> dict:
+        traces = list(self.trace_dir.glob('*.zip')) if self.trace_dir.is_dir() else []
+        return {
+            'kept': len(traces),
+            'kept_bytes': sum(path.stat().st_size for path in traces),
+            'evicted': len(self.evicted),
+            'evicted_bytes': self.evicted_bytes,
+            'max_bytes': self.max_bytes
+        }
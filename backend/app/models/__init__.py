@@ -11,7 +11,8 @@ from .ui_test import (
     TestUICase, TestUICasePermission, TestUIStep, TestUICaseSuite,
     TestUICasesSuitesRelation, TestUITask, TestUITaskContent,
     TestUIReport, TestUICaseExecutionRecord, TestUICaseStepExecutionRecord,
-    TestProduct
+    TestUIExecutionJournal, TestProduct, LeaseStatus, TestUIAgent, TestUICaseLease,
+    QueueAction, QueueStatus, TestUIExecutionQueue
 )
 
 __all__ = [
@@ -27,5 +28,6 @@ __all__ = [
     'TestUICase', 'TestUICasePermission', 'TestUIStep', 'TestUICaseSuite',
     'TestUICasesSuitesRelation', 'TestUITask', 'TestUITaskContent',
     'TestUIReport', 'TestUICaseExecutionRecord', 'TestUICaseStepExecutionRecord',
-    'TestProduct'
+    'TestUIExecutionJournal', 'TestProduct', 'LeaseStatus', 'TestUIAgent', 'TestUICaseLease',
+    'QueueAction', 'QueueStatus', 'TestUIExecutionQueue'
 ]
\ No newline at end of file
@@ -13,7 +13,9 @@ __all__ = [
     'TestProduct', 'TestCommonUser', 'TestUIElement', 'TestUIElementPermission',
     'TestUICase', 'TestUICasePermission', 'TestUIStep', 'TestUICaseSuite',
     'TestUICasesSuitesRelation', 'TestUITask', 'TestUITaskContent',
-    'TestUIReport', 'TestUICaseExecutionRecord', 'TestUICaseStepExecutionRecord'
+    'TestUIReport', 'TestUICaseExecutionRecord', 'TestUICaseStepExecutionRecord',
+    'TestUIExecutionJournal', 'LeaseStatus', 'TestUIAgent', 'TestUICaseLease',
+    'QueueAction', 'QueueStatus', 'TestUIExecutionQueue'
 ]
 
 
@@ -96,6 +98,29 @@ class ProductStatus(str, Enum):
     DISABLED = "禁用"
 
 
+class LeaseStatus(str, Enum):
+    """分布式执行队列中用例的状态"""
+    PENDING = "pending"      # 等待执行代理领取
+    LEASED = "leased"        # 已被执行代理领取，租约到期前需续租
+    DONE = "done"            # 已回传执行结果
+    CANCELLED = "cancelled"  # 测试单已取消
+
+
+class QueueAction(str, Enum):
+    """执行队列中的执行方式"""
+    EXECUTE = "execute"  # 从头执行
+    RESUME = "resume"    # 从检查点继续执行
+
+
+class QueueStatus(str, Enum):
+    """执行队列状态"""
+    QUEUED = "queued"            # 等待调度
+    RUNNING = "running"          # 正在由某个服务进程执行
+    FINISHED = "finished"        # 执行结束（完成、已取消或执行失败）
+    INTERRUPTED = "interrupted"  # 服务重启时测试单处于暂停状态，需要手动继续
+    CANCELLED = "cancelled"      # 开始执行前已取消
+
+
 # ==================== 模型定义 ====================
 
 class TestProduct(BaseModel, TimestampMixin):
@@ -293,6 +318,8 @@ class TestUITask(BaseModel, TimestampMixin):
     created_by = fields.CharField(max_length=50, description="创建人")
     start_time = fields.DatetimeField(null=True, description="开始时间")
     end_time = fields.DatetimeField(null=True, description="结束时间")
+    paused_time = fields.DatetimeField(null=True, description="本次暂停开始时间")
+    paused_seconds = fields.IntField(default=0, description="累计暂停时长（秒），不计入执行时长")
     log_file_path = fields.CharField(max_length=500, null=True, description="日志文件路径")
     
     # 统计字段
@@ -381,6 +408,8 @@ class TestUICaseExecutionRecord(BaseModel, TimestampMixin):
     duration = fields.IntField(default=0, description="耗时(秒)")
     error_message = fields.TextField(null=True, description="错误信息")
     screenshot_path = fields.CharField(max_length=500, null=True, description="截图路径")
+    trace_path = fields.CharField(max_length=500, null=True, description="失败 trace 路径（相对工作目录）")
+    attempt = fields.IntField(default=1, description="第几次执行（失败重试时递增）")
 
     # 反向关联
     step_executions: fields.ReverseRelation["TestUICaseStepExecutionRecord"]
@@ -421,3 +450,110 @@ class TestUICaseStepExecutionRecord(BaseModel, TimestampMixin):
         table = "test_ui_case_step_execution_records"
         table_description = "用例步骤执行记录表"
         abstract = False
+
+
+class TestUIExecutionJournal(BaseModel, TimestampMixin):
+    """执行日志簿表（记录每个执行完成的用例，用于断点续跑）"""
+    test_task = fields.ForeignKeyField(
+        "models.TestUITask",
+        related_name="execution_journals",
+        on_delete=fields.CASCADE,
+        index=True,
+        description="测试单ID"
+    )
+    test_report = fields.ForeignKeyField(
+        "models.TestUIReport",
+        related_name="execution_journals",
+        on_delete=fields.CASCADE,
+        index=True,
+        description="测试报告ID"
+    )
+    case_id = fields.IntField(description="用例ID")
+    sequence = fields.IntField(description="脚本序号")
+    status = fields.CharField(max_length=20, description="执行结果：passed/failed")
+    attempt = fields.IntField(default=1, description="第几次执行")
+    error_message = fields.TextField(null=True, description="错误信息")
+    finished_time = fields.DatetimeField(description="完成时间")
+
+    class Meta(BaseModel.Meta):
+        table = "test_ui_execution_journals"
+        table_description = "执行日志簿表"
+        abstract = False
+
+
+class TestUIAgent(BaseModel, TimestampMixin):
+    """执行代理表（独立部署的用例执行进程，python -m app.agent）"""
+    name = fields.CharField(max_length=100, unique=True, description="代理名称")
+    hostname = fields.CharField(max_length=200, null=True, description="主机名")
+    capacity = fields.IntField(default=1, description="同时执行的用例数")
+    running_cases = fields.IntField(default=0, description="正在执行的用例数")
+    last_heartbeat = fields.DatetimeField(null=True, description="最近一次心跳时间")
+
+    class Meta(BaseModel.Meta):
+        table = "test_ui_agents"
+        table_description = "执行代理表"
+        abstract = False
+
+
+class TestUICaseLease(BaseModel, TimestampMixin):
+    """分布式执行队列表（每行一次用例执行，由执行代理领取并在租约内回传结果）"""
+    test_task = fields.ForeignKeyField(
+        "models.TestUITask",
+        related_name="case_leases",
+        on_delete=fields.CASCADE,
+        index=True,
+        description="测试单ID"
+    )
+    test_report = fields.ForeignKeyField(
+        "models.TestUIReport",
+        related_name="case_leases",
+        on_delete=fields.CASCADE,
+        index=True,
+        description="测试报告ID"
+    )
+    case_id = fields.IntField(description="用例ID")
+    sequence = fields.IntField(description="脚本序号")
+    attempt = fields.IntField(default=1, description="第几次执行")
+    payload = fields.JSONField(description="执行参数（工作目录、脚本或步骤计划路径、超时时间）")
+    status = fields.CharEnumField(LeaseStatus, default=LeaseStatus.PENDING, index=True, description="队列状态")
+    agent = fields.ForeignKeyField(
+        "models.TestUIAgent",
+        related_name="leases",
+        on_delete=fields.SET_NULL,
+        null=True,
+        description="领取的执行代理"
+    )
+    lease_token = fields.CharField(max_length=64, null=True, description="租约令牌（每次领取重新生成）")
+    lease_expires_at = fields.DatetimeField(null=True, index=True, description="租约到期时间")
+    lease_count = fields.IntField(default=0, description="被领取的次数")
+    result = fields.JSONField(null=True, description="执行结果 {status, error}")
+    finished_time = fields.DatetimeField(null=True, description="完成时间")
+
+    class Meta(BaseModel.Meta):
+        table = "test_ui_case_leases"
+        table_description = "分布式执行队列表"
+        abstract = False
+
+
+class TestUIExecutionQueue(BaseModel, TimestampMixin):
+    """测试单执行队列表（执行、继续执行、重新执行请求持久化，服务重启后恢复）"""
+    test_task = fields.ForeignKeyField(
+        "models.TestUITask",
+        related_name="execution_queue",
+        on_delete=fields.CASCADE,
+        index=True,
+        description="测试单ID"
+    )
+    action = fields.CharEnumField(QueueAction, default=QueueAction.EXECUTE, description="执行方式")
+    status = fields.CharEnumField(QueueStatus, default=QueueStatus.QUEUED, index=True, description="队列状态")
+    owner = fields.CharField(max_length=200, null=True, description="执行该请求的服务进程（主机名:进程号）")
+    heartbeat_time = fields.DatetimeField(null=True, description="执行进程最近一次心跳时间")
+    recovered_count = fields.IntField(default=0, description="服务重启后被恢复执行的次数")
+    started_time = fields.DatetimeField(null=True, description="开始执行时间")
+    finished_time = fields.DatetimeField(null=True, description="结束时间")
+    error_message = fields.TextField(null=True, description="错误信息")
+
+    class Meta(BaseModel.Meta):
+        table = "test_ui_execution_queue"
+        table_description = "测试单执行队列表"
+        abstract = False
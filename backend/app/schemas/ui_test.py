@@ -357,10 +357,27 @@ class CaseReorderSchema(BaseModel):
 class ExecuteConfigSchema(BaseModel):
     """执行配置Schema"""
     browser: str = Field(default="chromium", description="浏览器类型")
+    runner: str = Field(default="script", description="用例执行方式：script 生成脚本 / plan 步骤计划")
     timeout: int = Field(default=30000, description="超时时间(毫秒)")
     continue_on_failure: bool = Field(default=True, description="失败后是否继续")
     retry_count: int = Field(default=2, ge=0, le=5, description="失败重试次数")
+    retry_workers: int = Field(default=1, ge=1, description="失败重试阶段的并发数")
+    retry_backoff: float = Field(default=2, ge=0, description="失败重试退避基数(秒)，每轮翻倍")
+    schedule_policy: str = Field(default="sort_order", description="用例派发顺序：sort_order 按测试单顺序 / longest_first 按历史耗时最长优先 / affinity 按角色和模块分片")
+    history_runs: int = Field(default=10, ge=1, description="longest_first 时参与耗时估算的最近执行次数")
+    default_case_duration: Optional[int] = Field(default=None, ge=1, description="没有历史记录的用例的估算耗时(秒)")
+    timeout_policy: str = Field(default="adaptive", description="用例超时：adaptive 按历史耗时 p99 × timeout_factor / fixed 固定为 worker_timeout")
+    timeout_factor: float = Field(default=3, gt=1, description="自适应超时的倍数")
+    timeout_floor: int = Field(default=30, ge=1, description="自适应超时的下限(秒)，上限为 worker_timeout")
     auto_screenshot: bool = Field(default=True, description="失败时自动截图")
+    trace: str = Field(default="off", description="失败 trace：off / on_failure 每次执行都记录，只保留失败的 / on_retry 只在失败重试时记录")
+    trace_max_mb: float = Field(default=200, gt=0, description="每个测试单的 trace 总大小上限(MB)，超出时删除最早的")
+    screenshot: Optional[Dict[str, Any]] = Field(default=None, description="截图：format(jpeg/webp/png)、quality、full_page、timeout(毫秒)")
+    wait_mode: str = Field(default="fixed", description="步骤等待方式：fixed 固定等待 wait_time / smart 条件等待，wait_time 为上限")
+    network_mode: str = Field(default="live", description="网络模式：live 访问被测环境 / record 录制 HAR / replay 回放 HAR（没有 HAR 的用例录制）")
+    har_url: Optional[str] = Field(default=None, description="录制和回放的请求 URL 通配符，默认为 api_host 下的全部请求")
+    har_refresh: Any = Field(default=None, description="需要重新录制 HAR 的用例ID列表，true 表示全部重新录制")
+    block_resources: Optional[Dict[str, Any]] = Field(default=None, description="请求拦截：profiles(media/fonts/third_party)、patterns、allowed_domains、opt_out{规则: [用例ID]}")
 
 
 class TaskContentSchema(BaseModel):
@@ -436,6 +453,8 @@ class CaseExecutionRecordSchema(BaseModel):
     duration: int
     error_message: Optional[str] = None
     screenshot_path: Optional[str] = None
+    trace_path: Optional[str] = None
+    attempt: int = 1
 
 
 class TestReportResponseSchema(BaseResponseSchema):
@@ -480,6 +499,7 @@ class ExecutionHistorySchema(BaseModel):
     duration: int
     error_message: Optional[str] = None
     screenshot_path: Optional[str] = None
+    trace_path: Optional[str] = None
 
 
 class ExecutionTrendData(BaseModel):
@@ -487,3 +507,32 @@ class ExecutionTrendData(BaseModel):
     pass_rate_trend: List[Dict[str, Any]] = []
     avg_duration_trend: List[Dict[str, Any]] = []
     failure_reasons: Dict[str, int] = {}
+
+
+# ==================== 执行代理 Schema ====================
+
+class AgentRegisterSchema(BaseModel):
+    """执行代理注册请求"""
+    name: str = Field(..., min_length=1, max_length=100, description="代理名称")
+    hostname: Optional[str] = Field(None, max_length=200, description="主机名")
+    capacity: int = Field(default=1, ge=1, description="同时执行的用例数")
+
+
+class AgentHeartbeatSchema(BaseModel):
+    """执行代理心跳请求"""
+    lease_ids: List[int] = Field(default=[], description="正在执行的租约ID列表")
+
+
+class AgentLeaseSchema(BaseModel):
+    """执行代理领取用例请求"""
+    max_cases: int = Field(default=1, ge=0, description="最多领取的用例数")
+
+
+class AgentCompleteSchema(BaseModel):
+    """执行代理回传结果请求"""
+    lease_token: str = Field(..., description="租约令牌")
+    status: str = Field(..., description="执行结果：passed/failed")
+    error: Optional[str] = Field(None, description="错误信息")
+    log: Optional[str] = Field(None, description="用例执行日志（JSONL）")
+    screenshots: Dict[str, str] = Field(default={}, description="截图 {工作目录相对路径: base64 内容}")
+    har: Optional[str] = Field(None, description="用例通过时录制的 HAR（network_mode=record/replay）")
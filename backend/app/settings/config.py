@@ -28,6 +28,10 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv('SECRET_KEY', 'test-galaxy-secret-key-fixed-20241106-do-not-share-in-production')
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 day
+    # 执行代理（python -m app.agent）调用代理接口时使用的共享令牌，为空时代理接口需要用户登录 Token
+    AGENT_TOKEN: str = os.getenv('AGENT_TOKEN', '')
+    # 本机同时执行用例（浏览器）数的全局上限，所有测试单共享；0 表示按 CPU 核数
+    UI_TEST_MAX_BROWSERS: int = int(os.getenv('UI_TEST_MAX_BROWSERS', '0'))
     
     # 根据操作系统选择数据库配置
     def get_db_config(self):
@@ -0,0 +1,118 @@
+"""
+基准测试：浏览器进程池 vs 进程模式
+
+生成一批只访问本地 data URL 的用例脚本，分别用
+parallel_mode='process'（每个用例一个 python 子进程 + 一次浏览器启动）和
+parallel_mode='browser_pool'（常驻浏览器工作进程 + 每用例一个 BrowserContext）执行，
+对比每分钟可执行的用例数。不依赖数据库。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_browser_pool --cases 40 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from app.core.browser_pool import BrowserWorkerPool
+from app.core.case_executor import CaseExecutor
+from app.core.script_generator import ScriptGenerator
+
+PAGE_URL = 'data:text/html,<title>bench</title><input id=name><button id=ok>OK</button>'
+
+
+def _bench_steps():
+    """构造不依赖元素表的步骤（navigate + execute_script）"""
+    return [
+        SimpleNamespace(element_id=None, action='navigate', input_data=PAGE_URL,
+                        wait_time=0, description='打开页面'),
+        SimpleNamespace(element_id=None, action='execute_script',
+                        input_data="document.querySelector('#name').value = 'bench'",
+                        wait_time=0, description='填写输入框'),
+        SimpleNamespace(element_id=None, action='execute_script',
+                        input_data="document.querySelector('#ok').click()",
+                        wait_time=0, description='点击按钮'),
+    ]
+
+
+async def prepare_work_dir(work_dir: Path, cases: int) -> list:
+    """写入 config.json 和用例脚本"""
+    config = {
+        'task_info': {'task_id': 0, 'task_name': 'benchmark'},
+        'execute_config': {'browser': 'chromium', 'headless': True, 'timeout': 30000,
+                           'auto_screenshot': False},
+        'test_users': {},
+        'environment_variables': {}
+    }
+    work_dir.mkdir(parents=True, exist_ok=True)
+    (work_dir / 'config.json').write_text(json.dumps(config), encoding='utf-8')
+
+    generator = ScriptGenerator()
+    steps_code = await generator._generate_steps_code(_bench_steps())
+    user_loading_code = generator._generate_user_loading_code([])
+
+    scripts = []
+    for sequence in range(1, cases + 1):
+        content = generator._render_template(
+            case_id=sequence, case_name=f'bench_{sequence}', priority='中', module='bench',
+            user_loading_code=user_loading_code,
+            steps_execution_code=steps_code
+        )
+        script_path = work_dir / 'scripts' / f'case_{sequence:03d}_{sequence:03d}.py'
+        script_path.parent.mkdir(parents=True, exist_ok=True)
+        script_path.write_text(content, encoding='utf-8')
+        scripts.append(str(script_path))
+    return scripts
+
+
+async def run_process_mode(scripts: list, work_dir: Path, workers: int) -> list:
+    executor = CaseExecutor()
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(script_path: str):
+        async with semaphore:
+            return await executor.execute_case_script_async(script_path, str(work_dir), timeout=300)
+
+    return await asyncio.gather(*[run(s) for s in scripts])
+
+
+async def run_browser_pool_mode(scripts: list, workers: int) -> list:
+    pool = BrowserWorkerPool(workers, {'browser': 'chromium', 'headless': True})
+    await pool.start()
+    try:
+        return await asyncio.gather(*[pool.run_case(s, timeout=300) for s in scripts])
+    finally:
+        await pool.shutdown()
+
+
+def report(name: str, results: list, elapsed: float):
+    passed = sum(1 for r in results if r.get('status') == 'passed')
+    rate = len(results) / elapsed * 60 if elapsed > 0 else 0
+    print(f"{name:<14} cases={len(results):<5} passed={passed:<5} "
+          f"elapsed={elapsed:8.2f}s  cases/min={rate:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='browser_pool vs process 模式基准测试')
+    parser.add_argument('--cases', type=int, default=40, help='用例数量')
+    parser.add_argument('--workers', type=int, default=4, help='并发数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_browser_pool_') as tmp:
+        work_dir = Path(tmp)
+        scripts = asyncio.run(prepare_work_dir(work_dir, args.cases))
+
+        start = time.perf_counter()
+        results = asyncio.run(run_process_mode(scripts, work_dir, args.workers))
+        report('process', results, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results = asyncio.run(run_browser_pool_mode(scripts, args.workers))
+        report('browser_pool', results, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+基准测试：整文件重写 vs JSONL 追加写入用例执行日志
+
+模拟 N 个用例各执行 S 个步骤时执行日志的写入：原有方式每记录一个步骤就用 json.dump(indent=2)
+重写整个日志文件（写入量随步骤数平方增长），JSONL 方式每个事件只追加一行。
+对比总耗时和写入的字节数，并校验 JSONL 日志可被 case_log 正确汇总。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_case_log --cases 200 --steps 100
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app.core import case_log
+
+NOW = '2026-01-01 00:00:00'
+
+
+def step_event(number: int) -> dict:
+    return {'step_number': number, 'action': 'click', 'description': f'步骤 {number}',
+            'start_time': NOW, 'end_time': NOW, 'duration': 10, 'status': '通过',
+            'error_message': None, 'screenshot_path': None}
+
+
+def write_rewrite(log_path: Path, case_id: int, steps: int) -> int:
+    """原有方式：每次记录都重写整个 JSON 文件"""
+    written = 0
+    log_data = {
+        'case_info': {'case_id': case_id, 'case_name': 'bench', 'priority': '中', 'module': 'bench'},
+        'execution_info': {'start_time': NOW, 'end_time': None, 'duration': 0, 'status': '执行中',
+                           'error_message': None},
+        'steps': [], 'attempt': 1, 'retry_count': 0, 'screenshots': []
+    }
+
+    def flush():
+        nonlocal written
+        content = json.dumps(log_data, ensure_ascii=False, indent=2)
+        with open(log_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        written += len(content.encode('utf-8'))
+
+    flush()
+    for number in range(1, steps + 1):
+        log_data['steps'].append(step_event(number))
+        flush()
+    log_data['execution_info'].update(end_time=NOW, duration=1, status='通过')
+    flush()
+    return written
+
+
+def write_jsonl(log_path: Path, case_id: int, steps: int) -> int:
+    """JSONL 方式：每个事件追加一行"""
+    written = 0
+
+    def append(event, mode='a'):
+        nonlocal written
+        line = json.dumps(event, ensure_ascii=False) + '\n'
+        with open(log_path, mode, encoding='utf-8') as f:
+            f.write(line)
+        written += len(line.encode('utf-8'))
+
+    append({'event': case_log.EVENT_CASE_START, 'time': NOW, 'attempt': 1, 'retry_count': 0,
+            'case_info': {'case_id': case_id, 'case_name': 'bench', 'priority': '中', 'module': 'bench'}}, mode='w')
+    for number in range(1, steps + 1):
+        append({'event': case_log.EVENT_STEP, **step_event(number)})
+    append({'event': case_log.EVENT_CASE_END, 'time': NOW, 'duration': 1, 'status': '通过', 'error_message': None})
+    return written
+
+
+def bench(cases: int, steps: int):
+    with tempfile.TemporaryDirectory(prefix='bench_case_log_') as tmp:
+        for name, writer, suffix in (('rewrite', write_rewrite, '.json'), ('jsonl', write_jsonl, case_log.LOG_SUFFIX)):
+            start = time.perf_counter()
+            written = sum(writer(Path(tmp) / f'case_{case_id:03d}{suffix}', case_id, steps)
+                          for case_id in range(1, cases + 1))
+            elapsed = time.perf_counter() - start
+            print(f"{name:<8} cases={cases:<6} steps/case={steps:<5} "
+                  f"bytes_written={written / 1024 / 1024:9.1f}MB elapsed={elapsed:7.2f}s")
+
+        summary = case_log.load_case_log(Path(tmp) / f'case_001{case_log.LOG_SUFFIX}')
+        assert len(summary['steps']) == steps and summary['execution_info']['end_time'] == NOW
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用例执行日志写入基准测试')
+    parser.add_argument('--cases', type=int, default=200, help='用例数量')
+    parser.add_argument('--steps', type=int, default=100, help='每个用例的步骤数')
+    args = parser.parse_args()
+    bench(args.cases, args.steps)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+基准测试：逐步骤查询写入 vs 批量写入执行结果
+
+在内存 SQLite 中构造 N 个用例（每个用例 S 个步骤）及对应的执行日志文件，分别用
+逐步骤查询步骤定义并逐条 create 的原有方式，和 ResultCollector.collect_results
+（一次加载步骤定义 + 事务内分批 bulk_create）写入执行记录，对比耗时和数据库查询次数。
+
+SQLite 内存库没有网络往返，可用 --query-latency-ms 为每次查询模拟 MySQL 的往返延迟。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_result_ingestion --cases 1000 --steps 30 --query-latency-ms 0.5
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from tortoise import Tortoise
+
+from benchmarks.query_counter import QueryCounter
+from app.core import case_log
+from app.core.result_collector import ResultCollector
+from app.models.ui_test import (
+    TestUICase,
+    TestUICaseExecutionRecord,
+    TestUICaseStepExecutionRecord,
+    TestUIReport,
+    TestUIStep,
+    TestUITask
+)
+
+
+async def prepare_data(cases: int, steps: int, work_dir: Path) -> int:
+    """构造用例、步骤和执行日志，返回报告ID"""
+    await Tortoise.init(db_url='sqlite://:memory:', modules={'models': ['app.models']})
+    await Tortoise.generate_schemas()
+
+    await TestUICase.bulk_create([
+        TestUICase(name=f'bench_{i}', product='bench', module='bench', created_by='bench')
+        for i in range(cases)
+    ])
+    case_ids = [case.id for case in await TestUICase.all().order_by('id')]
+    await TestUIStep.bulk_create([
+        TestUIStep(test_case_id=case_id, step_number=number, sort_order=number, action='click',
+                   input_data=f'value_{number}', description=f'步骤 {number}')
+        for case_id in case_ids
+        for number in range(1, steps + 1)
+    ], batch_size=1000)
+
+    task = await TestUITask.create(name='bench', product='bench', environment='bench',
+                                   execute_config={}, created_by='bench')
+    report = await TestUIReport.create(test_task_id=task.id, product='bench',
+                                       execution_time=datetime.now(), total_cases=cases, report_data={})
+
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    logs_dir = work_dir / 'logs'
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    for sequence, case_id in enumerate(case_ids, 1):
+        events = [
+            {'event': 'case_start', 'time': now, 'attempt': 1, 'retry_count': 0,
+             'case_info': {'case_id': case_id, 'case_name': f'bench_{sequence}', 'priority': '中', 'module': 'bench'}},
+            *(
+                {'event': 'step', 'step_number': number, 'action': 'click', 'description': f'步骤 {number}',
+                 'start_time': now, 'end_time': now, 'duration': 10, 'status': '通过',
+                 'error_message': None, 'screenshot_path': None}
+                for number in range(1, steps + 1)
+            ),
+            {'event': 'case_end', 'time': now, 'duration': 1, 'status': '通过', 'error_message': None}
+        ]
+        with open(logs_dir / f'case_{case_id:03d}_{sequence:03d}{case_log.LOG_SUFFIX}', 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(event, ensure_ascii=False) + '\n' for event in events)
+    return report.id
+
+
+async def legacy_collect(work_dir: Path, report_id: int):
+    """原有写入方式：每个步骤先查询步骤定义，再逐条创建执行记录"""
+    for log_file in (work_dir / 'logs').glob(f'case_*{case_log.LOG_SUFFIX}'):
+        log_data = case_log.load_case_log(log_file)
+        case_info = log_data['case_info']
+        execution_info = log_data['execution_info']
+        case_record = await TestUICaseExecutionRecord.create(
+            test_case_id=case_info['case_id'],
+            test_report_id=report_id,
+            status=execution_info['status'],
+            start_time=datetime.strptime(execution_info['start_time'], '%Y-%m-%d %H:%M:%S'),
+            end_time=datetime.strptime(execution_info['end_time'], '%Y-%m-%d %H:%M:%S'),
+            duration=execution_info['duration'],
+            error_message=execution_info.get('error_message'),
+            attempt=log_data.get('attempt', 1)
+        )
+        for step_data in log_data['steps']:
+            step_def = await TestUIStep.filter(
+                test_case_id=case_info['case_id'],
+                step_number=step_data['step_number']
+            ).first()
+            await TestUICaseStepExecutionRecord.create(
+                case_execution_record_id=case_record.id,
+                step_number=step_data['step_number'],
+                action=step_data['action'],
+                description=step_data.get('description'),
+                element_id=step_def.element_id if step_def else None,
+                input_data=step_def.input_data if step_def else None,
+                status=step_data['status'],
+                start_time=datetime.strptime(step_data['start_time'], '%Y-%m-%d %H:%M:%S'),
+                end_time=datetime.strptime(step_data['end_time'], '%Y-%m-%d %H:%M:%S'),
+                duration=step_data['duration'],
+                error_message=step_data.get('error_message'),
+                screenshot_path=step_data.get('screenshot_path')
+            )
+
+
+async def bulk_collect(work_dir: Path, report_id: int):
+    await ResultCollector().collect_results(work_dir, report_id)
+
+
+async def bench(cases: int, steps: int, latency_ms: float):
+    with tempfile.TemporaryDirectory(prefix='bench_result_ingestion_') as tmp:
+        work_dir = Path(tmp)
+        counter = QueryCounter(latency_ms / 1000)
+        try:
+            report_id = await prepare_data(cases, steps, work_dir)
+            counter.install()
+            for name, collect in (('per_step', legacy_collect), ('bulk', bulk_collect)):
+                await TestUICaseStepExecutionRecord.all().delete()
+                await TestUICaseExecutionRecord.all().delete()
+
+                counter.count = 0
+                start = time.perf_counter()
+                await collect(work_dir, report_id)
+                elapsed = time.perf_counter() - start
+                queries = counter.count
+
+                case_records = await TestUICaseExecutionRecord.all().count()
+                step_records = await TestUICaseStepExecutionRecord.all().count()
+                print(f"{name:<10} case_records={case_records:<6} step_records={step_records:<7} "
+                      f"queries={queries:<7} elapsed={elapsed:8.2f}s")
+        finally:
+            counter.uninstall()
+            await Tortoise.close_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='执行结果写入基准测试')
+    parser.add_argument('--cases', type=int, default=1000, help='用例数量')
+    parser.add_argument('--steps', type=int, default=30, help='每个用例的步骤数')
+    parser.add_argument('--query-latency-ms', type=float, default=0.0, help='每次查询模拟的往返延迟（毫秒）')
+    args = parser.parse_args()
+
+    # 屏蔽 ORM 的逐条 SQL 调试日志，避免日志输出本身影响计时
+    for name in ('tortoise', 'aiosqlite'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    asyncio.run(bench(args.cases, args.steps, args.query_latency_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+基准测试：逐用例生成脚本 vs 批量预取生成脚本
+
+在内存 SQLite 中构造 N 个用例（每个用例 S 个步骤，每个步骤引用一个元素），分别用
+ScriptGenerator.generate_script 逐个生成（调度器原来的方式）和
+ScriptGenerator.generate_scripts 批量生成，以及 runner=plan 时的 generate_plans 生成步骤计划，
+对比生成全部脚本的耗时（即大测试单中第一个用例开始执行前的等待时间）和数据库查询次数。
+
+SQLite 内存库没有网络往返，可用 --query-latency-ms 为每次查询模拟 MySQL 的往返延迟。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.bench_script_generation --cases 1000 --steps 20 --query-latency-ms 0.5
+"""
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from tortoise import Tortoise
+
+from benchmarks.query_counter import QueryCounter
+from app.core.script_cache import ScriptCache
+from app.core.script_generator import ScriptGenerator
+from app.models.ui_test import TestUICase, TestUICasePermission, TestUIElement, TestUIStep
+
+ACTIONS = ['navigate', 'click', 'type', 'wait', 'assert_text']
+
+
+async def prepare_data(cases: int, steps: int) -> list:
+    """构造用例、步骤、元素和权限数据"""
+    await Tortoise.init(db_url='sqlite://:memory:', modules={'models': ['app.models']})
+    await Tortoise.generate_schemas()
+
+    elements = [
+        TestUIElement(name=f'element_{i}', selector_type='ID', selector_value=f'el_{i}',
+                      page='bench', product='bench', module='bench', created_by='bench')
+        for i in range(steps)
+    ]
+    await TestUIElement.bulk_create(elements)
+    elements = await TestUIElement.all().order_by('id')
+
+    await TestUICase.bulk_create([
+        TestUICase(name=f'bench_{i}', product='bench', module=f'module_{i % 10}', created_by='bench')
+        for i in range(cases)
+    ])
+    case_ids = [case.id for case in await TestUICase.all().order_by('id')]
+
+    step_objects = []
+    for case_id in case_ids:
+        for number in range(1, steps + 1):
+            action = 'navigate' if number == 1 else ACTIONS[number % len(ACTIONS)]
+            step_objects.append(TestUIStep(
+                test_case_id=case_id, step_number=number, sort_order=number, action=action,
+                element_id=None if action == 'navigate' else elements[number - 1].id,
+                input_data='{{host}}/bench' if action == 'navigate' else f'value_{number}',
+                wait_time=0, description=f'步骤 {number}'
+            ))
+    await TestUIStep.bulk_create(step_objects, batch_size=1000)
+
+    await TestUICasePermission.bulk_create([
+        TestUICasePermission(test_case_id=case_id, role_name='admin')
+        for case_id in case_ids[::2]
+    ])
+    return case_ids
+
+
+async def run_per_case(generator: ScriptGenerator, case_ids: list, work_dir: Path) -> list:
+    return [
+        await generator.generate_script(case_id, work_dir, sequence)
+        for sequence, case_id in enumerate(case_ids, 1)
+    ]
+
+
+async def run_batch(generator: ScriptGenerator, case_ids: list, work_dir: Path) -> list:
+    return await generator.generate_scripts(case_ids, work_dir)
+
+
+async def run_plans(generator: ScriptGenerator, case_ids: list, work_dir: Path) -> list:
+    return await generator.generate_plans(case_ids, work_dir)
+
+
+async def bench(cases: int, steps: int, latency_ms: float):
+    counter = QueryCounter(latency_ms / 1000)
+    try:
+        case_ids = await prepare_data(cases, steps)
+        counter.install()
+        with tempfile.TemporaryDirectory(prefix='bench_script_generation_') as tmp:
+            for name, runner in (('per_case', run_per_case), ('batch', run_batch), ('plan', run_plans)):
+                generator = ScriptGenerator()
+                # 每种方式使用独立的空缓存，保证都完整渲染一遍模板
+                generator.cache = ScriptCache(Path(tmp) / name / 'cache')
+                work_dir = Path(tmp) / name / 'work'
+
+                counter.count = 0
+                start = time.perf_counter()
+                scripts = await runner(generator, case_ids, work_dir)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<10} cases={len(scripts):<6} steps/case={steps:<4} "
+                      f"queries={counter.count:<7} time_to_first_case={elapsed:8.2f}s")
+    finally:
+        counter.uninstall()
+        await Tortoise.close_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='逐用例 vs 批量预取生成脚本基准测试')
+    parser.add_argument('--cases', type=int, default=1000, help='用例数量')
+    parser.add_argument('--steps', type=int, default=20, help='每个用例的步骤数')
+    parser.add_argument('--query-latency-ms', type=float, default=0.0, help='每次查询模拟的往返延迟（毫秒）')
+    args = parser.parse_args()
+
+    # 屏蔽 ORM 的逐条 SQL 调试日志，避免日志输出本身影响计时
+    for name in ('tortoise', 'aiosqlite'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    asyncio.run(bench(args.cases, args.steps, args.query_latency_ms))
+
+
+if __name__ == '__main__':
+    main()
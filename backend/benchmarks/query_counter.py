@@ -0,0 +1,58 @@
+"""
+基准测试公共工具：统计数据库查询次数
+"""
+import asyncio
+
+from tortoise import connections
+
+
+class QueryCounter:
+    """
+    包装数据库连接的查询方法，统计查询次数并可模拟网络延迟
+
+    事务连接是连接类的子类，各自实现了查询方法，因此子类也一并包装
+    """
+
+    METHODS = ('execute_query', 'execute_query_dict', 'execute_insert', 'execute_many')
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.count = 0
+        self._originals = []
+
+    def install(self):
+        for client_class in self._client_classes(type(connections.get('default'))):
+            for name in self.METHODS:
+                if name in vars(client_class):
+                    original = vars(client_class)[name]
+                    self._originals.append((client_class, name, original))
+                    setattr(client_class, name, self._wrap(original))
+
+    def uninstall(self):
+        for client_class, name, original in self._originals:
+            setattr(client_class, name, original)
+        self._originals = []
+
+    @classmethod
+    def _client_classes(cls, client_class):
+        yield client_class
+        for subclass in client_class.__subclasses__():
+            yield from cls._client_classes(subclass)
+
+    def _wrap(self, original):
+        counter = self
+
+        async def wrapper(client, *args, **kwargs):
+            # 事务连接的方法可能调用父类方法，只统计最外层调用
+            if getattr(client, '_bench_counting', False):
+                return await original(client, *args, **kwargs)
+            counter.count += 1
+            if counter.latency:
+                await asyncio.sleep(counter.latency)
+            client._bench_counting = True
+            try:
+                return await original(client, *args, **kwargs)
+            finally:
+                client._bench_counting = False
+
+        return wrapper
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- 用例执行记录增加执行次数字段，记录失败重试的每一次执行
+        ALTER TABLE `test_ui_case_execution_records` ADD COLUMN `attempt` INT NOT NULL DEFAULT 1 COMMENT '第几次执行（失败重试时递增）';
+        """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- 回滚：删除执行次数字段
+        ALTER TABLE `test_ui_case_execution_records` DROP COLUMN `attempt`;
+        """
@@ -0,0 +1,33 @@
+"""
+数据库迁移脚本：添加执行日志簿表（断点续跑）
+创建时间：2026-10-18
+"""
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `test_ui_execution_journals` (
+            `id` BIGINT NOT NULL PRIMARY KEY AUTO_INCREMENT COMMENT '主键ID',
+            `test_task_id` BIGINT NOT NULL COMMENT '测试单ID',
+            `test_report_id` BIGINT NOT NULL COMMENT '测试报告ID',
+            `case_id` INT NOT NULL COMMENT '用例ID',
+            `sequence` INT NOT NULL COMMENT '脚本序号',
+            `status` VARCHAR(20) NOT NULL COMMENT '执行结果：passed/failed',
+            `attempt` INT NOT NULL DEFAULT 1 COMMENT '第几次执行',
+            `error_message` TEXT COMMENT '错误信息',
+            `finished_time` DATETIME(6) NOT NULL COMMENT '完成时间',
+            `created_time` DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) COMMENT '创建时间',
+            `updated_time` DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6) COMMENT '更新时间',
+            CONSTRAINT `fk_journal_task` FOREIGN KEY (`test_task_id`) REFERENCES `test_ui_tasks` (`id`) ON DELETE CASCADE,
+            CONSTRAINT `fk_journal_report` FOREIGN KEY (`test_report_id`) REFERENCES `test_ui_reports` (`id`) ON DELETE CASCADE,
+            INDEX `idx_test_ui_execution_journals_task` (`test_task_id`),
+            INDEX `idx_test_ui_execution_journals_report` (`test_report_id`)
+        ) CHARACTER SET utf8mb4 COMMENT='执行日志簿表';
+        """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `test_ui_execution_journals`;
+        """
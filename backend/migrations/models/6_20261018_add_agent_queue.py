@@ -0,0 +1,53 @@
+"""
+数据库迁移脚本：添加执行代理表和分布式执行队列表
+创建时间：2026-10-18
+"""
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `test_ui_agents` (
+            `id` BIGINT NOT NULL PRIMARY KEY AUTO_INCREMENT COMMENT '主键ID',
+            `name` VARCHAR(100) NOT NULL UNIQUE COMMENT '代理名称',
+            `hostname` VARCHAR(200) COMMENT '主机名',
+            `capacity` INT NOT NULL DEFAULT 1 COMMENT '同时执行的用例数',
+            `running_cases` INT NOT NULL DEFAULT 0 COMMENT '正在执行的用例数',
+            `last_heartbeat` DATETIME(6) COMMENT '最近一次心跳时间',
+            `created_time` DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) COMMENT '创建时间',
+            `updated_time` DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6) COMMENT '更新时间'
+        ) CHARACTER SET utf8mb4 COMMENT='执行代理表';
+
+        CREATE TABLE IF NOT EXISTS `test_ui_case_leases` (
+            `id` BIGINT NOT NULL PRIMARY KEY AUTO_INCREMENT COMMENT '主键ID',
+            `test_task_id` BIGINT NOT NULL COMMENT '测试单ID',
+            `test_report_id` BIGINT NOT NULL COMMENT '测试报告ID',
+            `case_id` INT NOT NULL COMMENT '用例ID',
+            `sequence` INT NOT NULL COMMENT '脚本序号',
+            `attempt` INT NOT NULL DEFAULT 1 COMMENT '第几次执行',
+            `payload` JSON NOT NULL COMMENT '执行参数（工作目录、脚本或步骤计划路径、超时时间）',
+            `status` VARCHAR(9) NOT NULL DEFAULT 'pending' COMMENT '队列状态',
+            `agent_id` BIGINT COMMENT '领取的执行代理',
+            `lease_token` VARCHAR(64) COMMENT '租约令牌（每次领取重新生成）',
+            `lease_expires_at` DATETIME(6) COMMENT '租约到期时间',
+            `lease_count` INT NOT NULL DEFAULT 0 COMMENT '被领取的次数',
+            `result` JSON COMMENT '执行结果 {status, error}',
+            `finished_time` DATETIME(6) COMMENT '完成时间',
+            `created_time` DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) COMMENT '创建时间',
+            `updated_time` DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6) COMMENT '更新时间',
+            CONSTRAINT `fk_lease_task` FOREIGN KEY (`test_task_id`) REFERENCES `test_ui_tasks` (`id`) ON DELETE CASCADE,
+            CONSTRAINT `fk_lease_report` FOREIGN KEY (`test_report_id`) REFERENCES `test_ui_reports` (`id`) ON DELETE CASCADE,
+            CONSTRAINT `fk_lease_agent` FOREIGN KEY (`agent_id`) REFERENCES `test_ui_agents` (`id`) ON DELETE SET NULL,
+            INDEX `idx_test_ui_case_leases_task` (`test_task_id`),
+            INDEX `idx_test_ui_case_leases_report` (`test_report_id`),
+            INDEX `idx_test_ui_case_leases_status` (`status`),
+            INDEX `idx_test_ui_case_leases_expires` (`lease_expires_at`)
+        ) CHARACTER SET utf8mb4 COMMENT='分布式执行队列表';
+        """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `test_ui_case_leases`;
+        DROP TABLE IF EXISTS `test_ui_agents`;
+        """
@@ -0,0 +1,33 @@
+"""
+数据库迁移脚本：添加测试单执行队列表
+创建时间：2026-10-18
+"""
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `test_ui_execution_queue` (
+            `id` BIGINT NOT NULL PRIMARY KEY AUTO_INCREMENT COMMENT '主键ID',
+            `test_task_id` BIGINT NOT NULL COMMENT '测试单ID',
+            `action` VARCHAR(7) NOT NULL DEFAULT 'execute' COMMENT '执行方式',
+            `status` VARCHAR(11) NOT NULL DEFAULT 'queued' COMMENT '队列状态',
+            `owner` VARCHAR(200) COMMENT '执行该请求的服务进程（主机名:进程号）',
+            `heartbeat_time` DATETIME(6) COMMENT '执行进程最近一次心跳时间',
+            `recovered_count` INT NOT NULL DEFAULT 0 COMMENT '服务重启后被恢复执行的次数',
+            `started_time` DATETIME(6) COMMENT '开始执行时间',
+            `finished_time` DATETIME(6) COMMENT '结束时间',
+            `error_message` LONGTEXT COMMENT '错误信息',
+            `created_time` DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) COMMENT '创建时间',
+            `updated_time` DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6) COMMENT '更新时间',
+            CONSTRAINT `fk_execution_queue_task` FOREIGN KEY (`test_task_id`) REFERENCES `test_ui_tasks` (`id`) ON DELETE CASCADE,
+            INDEX `idx_test_ui_execution_queue_task` (`test_task_id`),
+            INDEX `idx_test_ui_execution_queue_status` (`status`)
+        ) CHARACTER SET utf8mb4 COMMENT='测试单执行队列表';
+        """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `test_ui_execution_queue`;
+        """
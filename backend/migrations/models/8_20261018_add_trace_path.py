@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- 用例执行记录增加失败 trace 路径字段
+        ALTER TABLE `test_ui_case_execution_records` ADD COLUMN `trace_path` VARCHAR(500) COMMENT '失败 trace 路径（相对工作目录）';
+        """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- 回滚：删除失败 trace 路径字段
+        ALTER TABLE `test_ui_case_execution_records` DROP COLUMN `trace_path`;
+        """
@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- 测试单增加暂停时间字段（暂停期间不计入执行时长）
+        ALTER TABLE `test_ui_tasks` ADD COLUMN `paused_time` DATETIME(6) COMMENT '本次暂停开始时间';
+        ALTER TABLE `test_ui_tasks` ADD COLUMN `paused_seconds` INT NOT NULL DEFAULT 0 COMMENT '累计暂停时长（秒），不计入执行时长';
+        """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- 回滚：删除暂停时间字段
+        ALTER TABLE `test_ui_tasks` DROP COLUMN `paused_time`;
+        ALTER TABLE `test_ui_tasks` DROP COLUMN `paused_seconds`;
+        """